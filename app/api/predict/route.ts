@@ -41,7 +41,23 @@ interface PredictionResponse {
   clinical_insights: string[]
 }
 
-async function loadThyroidDataset() {
+// Python prediction server (scripts/prediction_server.py) holding the trained hybrid model
+const PREDICT_SERVICE_URL = process.env.THYRONET_PREDICT_URL
+
+let datasetPromise: Promise<any[]> | null = null
+
+function loadThyroidDataset() {
+  // Fetch and parse the CSV once per server process instead of on every request
+  if (!datasetPromise) {
+    datasetPromise = fetchThyroidDataset().then((data) => {
+      if (data.length === 0) datasetPromise = null
+      return data
+    })
+  }
+  return datasetPromise
+}
+
+async function fetchThyroidDataset() {
   try {
     const response = await fetch(
       "https://hebbkx1anhila5yf.public.blob.vercel-storage.com/annthyroid_unsupervised_anomaly_detection%20%281%29-sjO68MzKaASs0l6gSA10YZXwFeJh45.csv",
@@ -265,6 +281,41 @@ async function predictWithRealData(data: PredictionRequest): Promise<PredictionR
   }
 }
 
+// Forwards to the Python prediction service; null means it is unavailable and the caller should fall back
+async function forwardToPredictService(data: PredictionRequest): Promise<NextResponse | null> {
+  let response: Response
+  try {
+    response = await fetch(`${PREDICT_SERVICE_URL!.replace(/\/$/, "")}/predict`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(data),
+    })
+  } catch (error) {
+    console.error("[v0] Prediction service unreachable, falling back to in-process model:", error)
+    return null
+  }
+
+  if (response.status >= 500) {
+    console.error(`[v0] Prediction service returned ${response.status}, falling back to in-process model`)
+    return null
+  }
+
+  const contentType = response.headers.get("content-type") ?? ""
+  if (!contentType.includes("application/json")) {
+    const body = await response.text()
+    return NextResponse.json(
+      { error: `Prediction service returned ${response.status} ${contentType || "without a content type"}: ${body.slice(0, 200)}` },
+      { status: 502 },
+    )
+  }
+
+  try {
+    return NextResponse.json(await response.json(), { status: response.status })
+  } catch (error) {
+    return NextResponse.json({ error: `Prediction service returned invalid JSON: ${error}` }, { status: 502 })
+  }
+}
+
 export async function POST(request: NextRequest) {
   try {
     const data: PredictionRequest = await request.json()
@@ -276,6 +327,13 @@ export async function POST(request: NextRequest) {
       }
     }
 
+    if (PREDICT_SERVICE_URL) {
+      const forwarded = await forwardToPredictService(data)
+      if (forwarded) {
+        return forwarded
+      }
+    }
+
     console.log("[v0] Processing prediction with real dataset...")
 
     const prediction = await predictWithRealData(data)
@@ -0,0 +1,157 @@
+"""
+Class Balancing for ThyroNet-XAI
+Balances the training set using integer index arrays instead of DataFrame
+concat/resample copies. Every strategy first builds a plan (row indices,
+plus interpolation pairs for SMOTE), which is then materialized with a
+single gather or streamed in chunks.
+
+Strategies:
+    oversample   - random minority oversampling with replacement (STEP 4 default)
+    smote        - SMOTE-style interpolation between minority neighbours, vectorized
+    class_weight - no resampling; balanced per-row sample weights instead
+"""
+
+import os
+
+import numpy as np
+from sklearn.utils import resample
+
+BALANCING_STRATEGIES = ('oversample', 'smote', 'class_weight')
+DEFAULT_BALANCING = os.environ.get("THYRONET_BALANCING", "oversample")
+
+
+def oversample_indices(y, random_state=42):
+    """Row indices that balance the classes by resampling the minority class with replacement
+
+    Yields the same rows, in the same order, as resampling the minority
+    DataFrame with sklearn.utils.resample and concatenating it after the
+    majority class.
+    """
+    majority = np.flatnonzero(y == 0)
+    minority = np.flatnonzero(y == 1)
+    if len(minority) == 0 and len(majority):
+        raise ValueError("Cannot balance classes: the training set has no minority (label 1) rows")
+    upsampled = resample(minority, replace=True, n_samples=len(majority), random_state=random_state)
+    return np.concatenate([majority, upsampled])
+
+
+def balanced_sample_weight(y):
+    """Per-row weights n_samples / (n_classes * class_count), as class_weight='balanced'"""
+    y = np.asarray(y)
+    classes, inverse, counts = np.unique(y, return_inverse=True, return_counts=True)
+    return (len(y) / (len(classes) * counts))[inverse]
+
+
+def balancing_plan(X, y, strategy=DEFAULT_BALANCING, k_neighbors=5, random_state=42):
+    """Describe the balanced training set without materializing it
+
+    Returns a dict with 'indices' (rows of X taken as-is), optional SMOTE
+    interpolation arrays 'base', 'neighbor' and 'gap' (synthetic row
+    X[base] + gap * (X[neighbor] - X[base]), labelled 1) and optional
+    'sample_weight' over the resulting rows.
+    """
+    if strategy not in BALANCING_STRATEGIES:
+        raise ValueError(f"strategy must be one of {BALANCING_STRATEGIES}, got {strategy!r}")
+    y = np.asarray(y)
+    plan = {'indices': None, 'base': None, 'neighbor': None, 'gap': None, 'sample_weight': None}
+
+    if strategy == 'oversample':
+        plan['indices'] = oversample_indices(y, random_state)
+    elif strategy == 'class_weight':
+        plan['indices'] = np.arange(len(y))
+        plan['sample_weight'] = balanced_sample_weight(y)
+    else:
+        from neighbor_index import NeighborIndex
+
+        minority = np.flatnonzero(y == 1)
+        n_synthetic = max(0, int((y == 0).sum()) - len(minority))
+        plan['indices'] = np.arange(len(y))
+        if n_synthetic == 0:
+            return plan
+        if len(minority) < 2:
+            # Interpolation needs a second minority row to move towards; oversampling
+            # repeats a single row and raises a clear error for none
+            if len(minority):
+                print("⚠️  SMOTE needs at least 2 minority rows; oversampling the single one instead")
+            return balancing_plan(X, y, 'oversample', k_neighbors, random_state)
+
+        rng = np.random.RandomState(random_state)
+        k = min(k_neighbors, len(minority) - 1)
+
+        # Neighbours among minority rows only; column 0 is the row itself
+        _, neighbors = NeighborIndex(method='kd_tree').fit(X[minority]).query(X[minority], k + 1)
+        base = rng.randint(0, len(minority), n_synthetic)
+        picked = neighbors[base, rng.randint(1, k + 1, n_synthetic)]
+
+        plan['base'] = minority[base]
+        plan['neighbor'] = minority[picked]
+        plan['gap'] = rng.uniform(size=n_synthetic)
+    return plan
+
+
+def _n_rows(plan):
+    return len(plan['indices']) + (0 if plan['base'] is None else len(plan['base']))
+
+
+def _gather(X, y, plan, rows, out=None):
+    """Materialize the planned rows `rows` (positions in the balanced set) into `out`"""
+    n_real = len(plan['indices'])
+    real = rows[rows < n_real]
+    synthetic = rows[rows >= n_real] - n_real
+
+    if out is None:
+        # Interpolated rows need a floating dtype; float32 features stay float32
+        floating = np.issubdtype(X.dtype, np.floating)
+        dtype = np.float64 if len(synthetic) and not floating else X.dtype
+        out = np.empty((len(rows), X.shape[1]), dtype=dtype)
+    y_out = np.empty(len(rows), dtype=np.asarray(y).dtype)
+
+    source_rows = plan['indices'][real]
+    np.take(X, source_rows, axis=0, out=out[:len(real)])
+    y_out[:len(real)] = np.take(y, source_rows)
+
+    if len(synthetic):
+        base = np.take(X, plan['base'][synthetic], axis=0)
+        step = np.take(X, plan['neighbor'][synthetic], axis=0) - base
+        np.multiply(step, plan['gap'][synthetic, None], out=step)
+        np.add(base, step, out=out[len(real):])
+        y_out[len(real):] = 1
+
+    weights = None
+    if plan['sample_weight'] is not None:
+        weights = plan['sample_weight'][np.concatenate([real, synthetic + n_real])]
+    return out, y_out, weights
+
+
+def balance(X, y, strategy=DEFAULT_BALANCING, k_neighbors=5, random_state=42):
+    """Return (X_res, y_res, sample_weight) for the chosen strategy
+
+    'class_weight' returns X and y themselves (no copy); the resampling
+    strategies allocate the balanced training set once.
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    plan = balancing_plan(X, y, strategy, k_neighbors, random_state)
+    if strategy == 'class_weight':
+        return X, y, plan['sample_weight']
+
+    X_res, y_res, sample_weight = _gather(X, y, plan, np.arange(_n_rows(plan)))
+    return X_res, y_res, sample_weight
+
+
+def iter_balanced_chunks(X, y, chunk_size=65536, strategy=DEFAULT_BALANCING, k_neighbors=5,
+                         shuffle=True, random_state=42):
+    """Yield (X_chunk, y_chunk, weight_chunk) over the balanced set without materializing it
+
+    Works with memory-mapped X (see data_loader.load_arrays); only one chunk
+    of rows is resident at a time. Rows within a chunk are gathered in
+    source order for locality, so shuffle again if the consumer needs it.
+    """
+    y = np.asarray(y)
+    plan = balancing_plan(X, y, strategy, k_neighbors, random_state)
+    n_rows = _n_rows(plan)
+    order = np.random.RandomState(random_state).permutation(n_rows) if shuffle else np.arange(n_rows)
+
+    for start in range(0, n_rows, chunk_size):
+        rows = np.sort(order[start:start + chunk_size])
+        yield _gather(X, y, plan, rows)
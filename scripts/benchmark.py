@@ -0,0 +1,232 @@
+"""
+Throughput Benchmarks for ThyroNet-XAI
+Runs the training pipeline stages of thyronet_xai_analysis.py on synthetic
+annthyroid-shaped data (synthetic_data.py) at one or more sizes, then
+measures end-to-end scoring of raw records with HybridScorer and the NumPy
+DNN: single-row latency percentiles and batch rows/sec. Every stage and
+every model's fit/predict is recorded with its wall/CPU time and peak RSS.
+Results of one invocation go to a JSON (full detail) and a CSV file named
+after the git commit, and two result files can be compared with --compare.
+The out-of-fold cache is disabled so every run measures real work.
+
+Usage:
+    python scripts/benchmark.py --rows 10000 100000 1000000
+    python scripts/benchmark.py --compare benchmarks/bench-a.json benchmarks/bench-b.json
+"""
+
+import argparse
+import contextlib
+import csv
+import functools
+import io
+import json
+import os
+import time
+
+import numpy as np
+
+BENCHMARK_FORMAT_VERSION = 1
+DEFAULT_BENCHMARK_DIR = os.environ.get(
+    "THYRONET_BENCHMARK_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"),
+)
+DEFAULT_ROWS = (10_000, 100_000)
+DEFAULT_STAGES = ('split_data', 'balance_classes', 'select_features', 'scale_features', 'fit_models',
+                  'evaluate_hybrid', 'analyze_performance', 'tune_hybrid')
+LATENCY_CALLS = 200
+CSV_FIELDS = ['n_rows', 'stage', 'wall_seconds', 'cpu_seconds', 'worker_cpu_seconds', 'peak_rss_mb',
+              'rows_per_second']
+
+
+def _quiet(stage):
+    """The stage with its progress output swallowed"""
+    @functools.wraps(stage)
+    def run_quietly(**kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return stage(**kwargs)
+    return run_quietly
+
+
+def _generate_stage(n_rows, separation, random_state):
+    from data_loader import clean_dataframe
+    from schema import TARGET_COLUMN, apply_schema
+    from synthetic_data import synthetic_annthyroid
+
+    def generate_data():
+        df = apply_schema(clean_dataframe(synthetic_annthyroid(n_rows, separation, random_state=random_state)))
+        return {'X': df.drop(columns=TARGET_COLUMN), 'y': df[TARGET_COLUMN]}
+    return generate_data
+
+
+def score_records(var_thresh, selector, scaler, rf, dnn, X_test, n_calls=LATENCY_CALLS):
+    """Single-row latency and batch throughput of HybridScorer on raw test records"""
+    from hybrid_scorer import HybridScorer
+    from numpy_dnn import NumpyDNN
+    from schema import FEATURE_DTYPE
+
+    scorer = HybridScorer.from_fitted(var_thresh, selector, scaler, rf, NumpyDNN.from_keras(dnn),
+                                      feature_names=X_test.columns)
+    X_raw = X_test.to_numpy(dtype=FEATURE_DTYPE)
+    scorer.score(X_raw[:1])
+
+    latencies = np.empty(n_calls)
+    for i in range(n_calls):
+        row = X_raw[i % len(X_raw)][None, :]
+        start = time.perf_counter()
+        scorer.score(row)
+        latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scorer.score(X_raw)
+    batch_seconds = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {'scoring': {
+        'single_row_ms_p50': float(p50),
+        'single_row_ms_p95': float(p95),
+        'single_row_ms_p99': float(p99),
+        'batch_rows': int(len(X_raw)),
+        'batch_seconds': batch_seconds,
+        'rows_per_second': len(X_raw) / batch_seconds,
+    }}
+
+
+def benchmark_size(n_rows, stage_names=DEFAULT_STAGES, separation=1.0, random_state=42, verbose=False):
+    """Run the selected pipeline stages plus scoring on n_rows synthetic rows; returns the size's results"""
+    import thyronet_xai_analysis as pipeline
+    from instrumentation import PipelineRun
+    from reporting import FigureReporter
+
+    stages = [_generate_stage(n_rows, separation, random_state)]
+    stages += [stage for stage in pipeline.STAGES if stage.__name__ in stage_names]
+    if 'fit_models' in stage_names:
+        stages.append(score_records)
+    if not verbose:
+        stages = [_quiet(stage) for stage in stages]
+
+    reporter = FigureReporter(enabled=False)
+    run = PipelineRun(f"bench-{n_rows}", state={'reporter': reporter})
+    pipeline.run_stages(run, stages)
+    reporter.close()
+
+    report = run.report()
+    return {
+        'n_rows': n_rows,
+        'total_wall_seconds': report['total_wall_seconds'],
+        'peak_rss_mb': report['peak_rss_mb'],
+        'stages': run.records,
+        'scoring': run.state.get('scoring'),
+    }, report
+
+
+def _csv_rows(results):
+    for size in results['sizes']:
+        for record in size['stages']:
+            row = {field: record.get(field) for field in CSV_FIELDS}
+            row['n_rows'] = size['n_rows']
+            row['rows_per_second'] = size['n_rows'] / record['wall_seconds'] if record['wall_seconds'] else None
+            yield row
+
+
+def write_results(results, directory=DEFAULT_BENCHMARK_DIR):
+    """Write bench-<commit>-<run>.json and .csv; returns both paths"""
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"bench-{results['git_commit'] or 'worktree'}-{results['run_id']}")
+    with open(f"{base}.json", 'w') as f:
+        json.dump(results, f, indent=2)
+    with open(f"{base}.csv", 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(_csv_rows(results))
+    return f"{base}.json", f"{base}.csv"
+
+
+def compare_results(baseline_path, candidate_path):
+    """DataFrame of wall seconds per (n_rows, stage) and scoring metric for two result files"""
+    import pandas as pd
+
+    frames = []
+    for label, path in (('baseline', baseline_path), ('candidate', candidate_path)):
+        with open(path) as f:
+            results = json.load(f)
+        rows = [{'n_rows': row['n_rows'], 'metric': row['stage'], label: row['wall_seconds']}
+                for row in _csv_rows(results)]
+        for size in results['sizes']:
+            for metric, value in (size.get('scoring') or {}).items():
+                rows.append({'n_rows': size['n_rows'], 'metric': f"scoring/{metric}", label: value})
+        frames.append(pd.DataFrame(rows).set_index(['n_rows', 'metric']))
+
+    table = frames[0].join(frames[1], how='outer')
+    table['ratio'] = table['candidate'] / table['baseline']
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ThyroNet-XAI training and scoring on synthetic data")
+    parser.add_argument('--rows', type=int, nargs='+', default=list(DEFAULT_ROWS),
+                        help="dataset sizes to benchmark (e.g. 10000 100000 1000000 10000000)")
+    parser.add_argument('--stages', nargs='+', default=list(DEFAULT_STAGES),
+                        help="pipeline stages to run ('all' for every stage after load_data)")
+    parser.add_argument('--separation', type=float, default=1.0,
+                        help="how far anomalies' lab values are shifted (0: labels are pure noise)")
+    parser.add_argument('--dnn-epochs', type=int, help="cap DNN epochs (THYRONET_DNN_EPOCHS)")
+    parser.add_argument('--bootstrap', type=int, help="bootstrap resamples (THYRONET_BOOTSTRAP)")
+    parser.add_argument('--output-dir', default=DEFAULT_BENCHMARK_DIR)
+    parser.add_argument('--verbose', action='store_true', help="show each stage's progress output")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help="compare two result JSON files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        print(compare_results(*args.compare).round(4).to_string())
+        return
+
+    # Settings are read when the pipeline modules are imported
+    os.environ['THYRONET_CV_CACHE_DIR'] = ''
+    if args.dnn_epochs is not None:
+        os.environ['THYRONET_DNN_EPOCHS'] = str(args.dnn_epochs)
+    if args.bootstrap is not None:
+        os.environ['THYRONET_BOOTSTRAP'] = str(args.bootstrap)
+
+    import thyronet_xai_analysis as pipeline
+
+    stage_names = [stage.__name__ for stage in pipeline.STAGES if stage.__name__ != 'load_data']
+    if args.stages != ['all']:
+        unknown = sorted(set(args.stages) - set(stage_names))
+        if unknown:
+            parser.error(f"unknown stages {unknown}; choose from {stage_names}")
+        stage_names = args.stages
+
+    sizes, report = [], None
+    for n_rows in args.rows:
+        print(f"🏁 Benchmarking {n_rows:,} rows ({', '.join(stage_names)})")
+        size, report = benchmark_size(n_rows, stage_names, args.separation, verbose=args.verbose)
+        sizes.append(size)
+        for record in size['stages']:
+            print(f"   {record['stage']:<36} {record['wall_seconds']:9.3f}s")
+        if size['scoring']:
+            scoring = size['scoring']
+            print(f"   scoring: {scoring['single_row_ms_p50']:.2f} ms/row p50, "
+                  f"{scoring['single_row_ms_p99']:.2f} ms p99, {scoring['rows_per_second']:,.0f} rows/s batch")
+
+    results = {
+        'format_version': BENCHMARK_FORMAT_VERSION,
+        'run_id': time.strftime('%Y%m%d-%H%M%S', time.gmtime()),
+        'git_commit': report['git_commit'],
+        'host': report['host'],
+        'platform': report['platform'],
+        'python': report['python'],
+        'cpu_count': report['cpu_count'],
+        'settings': {
+            'stages': stage_names,
+            'separation': args.separation,
+            'dnn_epochs': os.environ.get('THYRONET_DNN_EPOCHS'),
+            'bootstrap': os.environ.get('THYRONET_BOOTSTRAP'),
+        },
+        'sizes': sizes,
+    }
+    json_path, csv_path = write_results(results, args.output_dir)
+    print(f"📈 Benchmark results written to {json_path} and {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
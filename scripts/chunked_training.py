@@ -0,0 +1,391 @@
+"""
+Out-of-core Training for ThyroNet-XAI
+Trains the hybrid from a labelled CSV (or the cached annthyroid arrays)
+streamed in chunks, for registries larger than memory. At no point is more
+than one chunk held in memory, plus fixed-capacity samples:
+
+    1. statistics pass: per-class running moments and min/max of every
+       feature (incremental_training.RunningStats) yield the variance
+       filter, the ANOVA F ranking and the MinMaxScaler ranges in one pass
+    2. spool pass: each chunk's training rows are reduced to the k scaled
+       selected features and appended to a float32 spool file on disk;
+       later passes memory-map the spool instead of re-parsing the CSV
+    3. Random Forest: a sub-forest is grown on each block of spooled rows,
+       balanced like the in-memory pipeline, and the sub-forests are merged
+       into one forest of about rf_n_estimators trees
+    4. DNN: trained from a generator over the spool, one chunk at a time,
+       with balanced class weights from the statistics pass
+
+Each chunk's rows are split into train/test by a draw seeded with the chunk
+number, so every pass sees the same split. Evaluation, DNN validation, the
+SHAP background, the replay buffer and the similar-patient index use
+fixed-capacity uniform reservoir samples; the drift reference is built from
+the similar-patient sample. The bundle keeps the default
+0.5/0.5 hybrid rule; re-tune it with hybrid_optimizer.py.
+
+Usage:
+    python scripts/chunked_training.py registry.csv --chunk-size 100000
+"""
+
+import argparse
+import math
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats as scipy_stats
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_selection import SelectKBest, VarianceThreshold, f_classif
+from sklearn.preprocessing import MinMaxScaler
+
+from balancing import BALANCING_STRATEGIES, DEFAULT_BALANCING, balance
+from data_loader import clean_dataframe
+from drift_monitor import build_reference
+from incremental_training import DEFAULT_REPLAY_SIZE, RunningStats
+from schema import FEATURE_COLUMNS, FEATURE_DTYPE, LABEL_DTYPE, TARGET_COLUMN, apply_schema
+
+DEFAULT_CHUNK_SIZE = int(os.environ.get("THYRONET_CHUNK_SIZE", 100_000))
+DEFAULT_SPOOL_DIR = os.environ.get("THYRONET_SPOOL_DIR") or None
+TEST_FRACTION = 0.2
+VALIDATION_FRACTION = 0.1  # of the training rows, held out of DNN training for early stopping
+TEST_ROWS = 200_000
+VALIDATION_ROWS = 50_000
+REGISTRY_ROWS = 100_000
+BACKGROUND_ROWS = 100
+
+TRAIN, VALIDATION, TEST = 0, 1, 2
+
+
+def iter_csv_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, delimiter=';'):
+    """(X, y) per chunk of a labelled annthyroid-format CSV, validated against the schema"""
+    for chunk in pd.read_csv(path, delimiter=delimiter, chunksize=chunk_size):
+        df = apply_schema(clean_dataframe(chunk))
+        if TARGET_COLUMN not in df.columns:
+            raise ValueError(f"{path} has no {TARGET_COLUMN} column")
+        yield df[FEATURE_COLUMNS].to_numpy(dtype=FEATURE_DTYPE), df[TARGET_COLUMN].to_numpy()
+
+
+def iter_array_chunks(X, y, chunk_size=DEFAULT_CHUNK_SIZE):
+    """(X, y) slices of (memory-mapped) arrays, copied one chunk at a time"""
+    for start in range(0, len(y), chunk_size):
+        yield (np.asarray(X[start:start + chunk_size], dtype=FEATURE_DTYPE),
+               np.asarray(y[start:start + chunk_size]).astype(LABEL_DTYPE))
+
+
+def row_roles(n_rows, chunk_index, random_state=42):
+    """TRAIN/VALIDATION/TEST per row of a chunk, identical on every pass over the data"""
+    draw = np.random.default_rng([random_state, chunk_index]).random(n_rows)
+    roles = np.full(n_rows, TRAIN, dtype=np.int8)
+    roles[draw < TEST_FRACTION + (1 - TEST_FRACTION) * VALIDATION_FRACTION] = VALIDATION
+    roles[draw < TEST_FRACTION] = TEST
+    return roles
+
+
+class Reservoir:
+    """Uniform random sample of at most `capacity` rows of a stream
+
+    Every row gets a random key and the rows with the smallest keys are
+    kept, which is a uniform sample without replacement of everything seen.
+    With per_class=True each class keeps up to capacity // 2 rows, as
+    incremental_training.replay_sample.
+    """
+
+    def __init__(self, capacity, per_class=False, random_state=42):
+        self.capacity = capacity
+        self.per_class = per_class
+        self.rng = np.random.default_rng(random_state)
+        self.X = self.y = self.keys = None
+        self.seen = np.zeros(2, dtype=np.int64)
+
+    def update(self, X, y):
+        y = np.asarray(y).astype(LABEL_DTYPE)
+        self.seen += np.bincount(y, minlength=2)
+        keys = self.rng.random(len(y))
+        if self.X is not None:
+            X, y, keys = np.concatenate([self.X, X]), np.concatenate([self.y, y]), np.concatenate([self.keys, keys])
+
+        if self.per_class:
+            keep = np.concatenate([rows[np.argsort(keys[rows])[:self.capacity // 2]]
+                                   for rows in (np.flatnonzero(y == label) for label in (0, 1))])
+        else:
+            keep = np.argsort(keys)[:self.capacity]
+        keep = np.sort(keep)
+        self.X, self.y, self.keys = X[keep], y[keep], keys[keep]
+        return self
+
+
+def preprocessing_from_stats(stats, k=10):
+    """(VarianceThreshold, SelectKBest, MinMaxScaler, selected columns) fitted from running statistics
+
+    Equivalent to fitting them on the oversampled training rows:
+    VarianceThreshold(0) drops features whose min equals their max, the
+    ANOVA F weights both classes equally (as after balancing) and the
+    scaler ranges are the per-feature min/max.
+    """
+    n_features = len(stats.minimum)
+    var_thresh = VarianceThreshold(threshold=0)
+    var_thresh.variances_ = np.minimum(np.maximum(stats.variances(), 0), stats.maximum - stats.minimum)
+    var_thresh.n_features_in_ = n_features
+    kept = var_thresh.get_support()
+
+    f_scores = np.nan_to_num(stats.anova_f()[kept], nan=0.0)
+    selector = SelectKBest(score_func=f_classif, k=min(k, int(kept.sum())))
+    selector.scores_ = f_scores
+    selector.pvalues_ = scipy_stats.f.sf(f_scores, 1, 2 * stats.count.max() - 2)
+    selector.n_features_in_ = int(kept.sum())
+    columns = np.flatnonzero(kept)[selector.get_support()]
+
+    scaler = MinMaxScaler().partial_fit(np.vstack([stats.minimum[columns], stats.maximum[columns]]))
+    scaler.n_samples_seen_ = int(stats.count.sum())
+    return var_thresh, selector, scaler, columns
+
+
+class Spool:
+    """Append-only on-disk float32 features and uint8 labels/roles, memory-mapped for reading"""
+
+    def __init__(self, directory, n_features):
+        self.directory = directory
+        self.n_features = n_features
+        self.n_rows = 0
+        self._files = {name: open(os.path.join(directory, f"{name}.bin"), 'wb') for name in ('X', 'y', 'role')}
+
+    def append(self, X, y, roles):
+        self._files['X'].write(np.ascontiguousarray(X, dtype=FEATURE_DTYPE).tobytes())
+        self._files['y'].write(np.asarray(y, dtype=LABEL_DTYPE).tobytes())
+        self._files['role'].write(np.asarray(roles, dtype=np.int8).tobytes())
+        self.n_rows += len(y)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        shape = {'X': (self.n_rows, self.n_features), 'y': (self.n_rows,), 'role': (self.n_rows,)}
+        dtype = {'X': FEATURE_DTYPE, 'y': LABEL_DTYPE, 'role': np.int8}
+        self.arrays = {name: np.memmap(os.path.join(self.directory, f"{name}.bin"), dtype=dtype[name],
+                                       mode='r', shape=shape[name])
+                       for name in shape}
+        return self
+
+    def chunks(self, chunk_size, role=None):
+        """(X, y) chunks read back from disk, optionally only the rows with `role`"""
+        X, y, roles = self.arrays['X'], self.arrays['y'], self.arrays['role']
+        for start in range(0, self.n_rows, chunk_size):
+            stop = start + chunk_size
+            X_chunk, y_chunk = np.asarray(X[start:stop]), np.asarray(y[start:stop])
+            if role is not None:
+                rows = np.asarray(roles[start:stop]) == role
+                X_chunk, y_chunk = X_chunk[rows], y_chunk[rows]
+            yield X_chunk, y_chunk
+
+
+def _blocks_with_both_classes(chunks, min_rows):
+    """Concatenate chunks into blocks of at least min_rows rows that contain both classes
+
+    A trailing remainder is merged into the last block, so no rows are lost.
+    """
+    ready, parts = None, []
+    for X, y in chunks:
+        parts.append((X, y))
+        n_rows = sum(len(part_y) for _, part_y in parts)
+        labels = np.concatenate([part_y for _, part_y in parts])
+        if n_rows >= min_rows and labels.min() != labels.max():
+            if ready is not None:
+                yield ready
+            ready = (np.concatenate([p[0] for p in parts]), labels)
+            parts = []
+    if parts:
+        tail = (np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]))
+        ready = tail if ready is None else (np.concatenate([ready[0], tail[0]]), np.concatenate([ready[1], tail[1]]))
+    if ready is not None:
+        yield ready
+
+
+def fit_forest_from_blocks(blocks, n_estimators=100, n_blocks=1, balancing=DEFAULT_BALANCING, random_state=42):
+    """Grow a sub-forest on each balanced (X, y) block and merge them into one RandomForestClassifier"""
+    trees_per_block = max(1, math.ceil(n_estimators / max(n_blocks, 1)))
+    forest = None
+    for i, (X, y) in enumerate(blocks):
+        X_res, y_res, sample_weight = balance(X, y, balancing, random_state=random_state + i)
+        sub_forest = RandomForestClassifier(n_estimators=trees_per_block, random_state=random_state + i, n_jobs=-1)
+        sub_forest.fit(X_res, y_res, sample_weight=sample_weight)
+        if forest is None:
+            forest = sub_forest
+        else:
+            forest.estimators_ += sub_forest.estimators_
+    if forest is None:
+        raise ValueError("No training block contains both classes")
+    forest.n_estimators = len(forest.estimators_)
+    return forest
+
+
+def _class_weights(counts):
+    """Balanced per-class weights n / (2 * n_class), as balancing.balanced_sample_weight"""
+    counts = np.asarray(counts, dtype=np.float64)
+    return counts.sum() / (2 * np.maximum(counts, 1))
+
+
+def train_out_of_core(chunks, hyperparams=None, chunk_size=DEFAULT_CHUNK_SIZE, epochs=None,
+                      balancing=DEFAULT_BALANCING, spool_dir=DEFAULT_SPOOL_DIR, random_state=42):
+    """Fit preprocessing, RF and DNN from `chunks` (a callable returning a fresh (X, y) chunk iterator)
+
+    Returns a dict with the fitted objects, reservoir samples, running
+    statistics and test-set metrics, ready for model_bundle.save_bundle.
+    """
+    from dnn_training import DEFAULT_EPOCHS, train_dnn_streaming
+    from metrics_engine import evaluate_models
+    from training_orchestrator import resolve_hyperparams
+
+    params = resolve_hyperparams(hyperparams)
+    timings = {}
+
+    # 1. Statistics pass over the training rows; a test sample is set aside on the way
+    start = time.perf_counter()
+    stats = None
+    test = Reservoir(TEST_ROWS, random_state=random_state)
+    for i, (X, y) in enumerate(chunks()):
+        roles = row_roles(len(y), i, random_state)
+        train = roles != TEST
+        stats = RunningStats.from_data(X[train], y[train]) if stats is None else stats.update(X[train], y[train])
+        test.update(X[~train], y[~train])
+    var_thresh, selector, scaler, columns = preprocessing_from_stats(stats, params['k'])
+    timings['statistics'] = time.perf_counter() - start
+    print(f"📊 Statistics pass: {int(stats.count.sum()):,} training rows "
+          f"({int(stats.count[1]):,} anomalies) in {timings['statistics']:.1f}s")
+
+    directory = spool_dir or tempfile.mkdtemp(prefix='thyronet-spool-')
+    os.makedirs(directory, exist_ok=True)
+    try:
+        # 2. Spool pass: scaled selected features to disk, plus fixed-size samples
+        start = time.perf_counter()
+        spool = Spool(directory, len(columns))
+        validation = Reservoir(VALIDATION_ROWS, random_state=random_state + 1)
+        registry = Reservoir(REGISTRY_ROWS, random_state=random_state + 2)
+        replay = Reservoir(DEFAULT_REPLAY_SIZE, per_class=True, random_state=random_state + 3)
+        for i, (X, y) in enumerate(chunks()):
+            roles = row_roles(len(y), i, random_state)
+            train = roles != TEST
+            X_scaled = scaler.transform(X[train][:, columns]).astype(FEATURE_DTYPE)
+            spool.append(X_scaled, y[train], roles[train])
+            validation.update(X_scaled[roles[train] == VALIDATION], y[train][roles[train] == VALIDATION])
+            registry.update(X[train][:, columns], y[train])
+            replay.update(X[train], y[train])
+        spool.close()
+        timings['spool'] = time.perf_counter() - start
+        print(f"💾 Spooled {spool.n_rows:,} x {len(columns)} scaled rows to {directory} "
+              f"in {timings['spool']:.1f}s")
+
+        # 3. Random Forest from per-block sub-forests
+        start = time.perf_counter()
+        n_blocks = max(1, spool.n_rows // chunk_size)
+        rf = fit_forest_from_blocks(_blocks_with_both_classes(spool.chunks(chunk_size), chunk_size),
+                                    params['rf_n_estimators'], n_blocks, balancing, random_state)
+        timings['random_forest'] = time.perf_counter() - start
+        print(f"🌲 Random Forest: {rf.n_estimators} trees from sub-forests in {timings['random_forest']:.1f}s")
+
+        # 4. DNN from a generator over the spool, balanced by class weights
+        start = time.perf_counter()
+        n_dnn_rows = int((spool.arrays['role'] == TRAIN).sum())
+        train_counts = stats.count - validation.seen
+        weights = _class_weights(train_counts).astype(np.float32)
+
+        def dnn_chunks():
+            for X, y in spool.chunks(chunk_size, role=TRAIN):
+                yield X, y, weights[y]
+
+        dnn, history = train_dnn_streaming(
+            dnn_chunks, n_dnn_rows, len(columns),
+            validation=(validation.X, validation.y, weights[validation.y]),
+            epochs=epochs or DEFAULT_EPOCHS, verbose=2, random_state=random_state,
+            hidden_units=params['dnn_hidden_units'], dropout=params['dnn_dropout'])
+        timings['dnn'] = time.perf_counter() - start
+    finally:
+        if spool_dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    # The registry sample (raw selected features) serves the neighbour index, SHAP and drift monitoring
+    registry_scaled = scaler.transform(registry.X).astype(FEATURE_DTYPE)
+    feature_names = [FEATURE_COLUMNS[j] for j in columns]
+
+    # Evaluate on the held-out sample
+    X_test = scaler.transform(test.X[:, columns]).astype(FEATURE_DTYPE)
+    rf_probs = rf.predict_proba(X_test)[:, 1]
+    dnn_probs = dnn.predict(X_test, verbose=0).flatten()
+    performance_df, _ = evaluate_models(test.y, {'Random Forest': rf_probs, 'DNN': dnn_probs,
+                                                 'Hybrid (RF+DNN)': (rf_probs + dnn_probs) / 2})
+    print(f"\n📈 Held-out sample ({len(test.y):,} of {int(test.seen.sum()):,} test rows):")
+    print(performance_df.round(4).to_string(index=False))
+
+    hybrid_metrics = performance_df.set_index('Model').loc['Hybrid (RF+DNN)']
+    return {
+        'var_thresh': var_thresh, 'selector': selector, 'scaler': scaler, 'columns': columns,
+        'rf': rf, 'dnn': dnn, 'history': history, 'running_stats': stats,
+        'replay': {'X': replay.X, 'y': replay.y, 'seen': replay.seen},
+        'registry': (registry_scaled, registry.y),
+        'background': registry_scaled[:BACKGROUND_ROWS],
+        'drift_reference': build_reference(registry.X, feature_names),
+        'metrics': {metric: float(value) for metric, value in hybrid_metrics.items()},
+        'performance': performance_df, 'timings': timings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train ThyroNet-XAI out of core from a chunked dataset")
+    parser.add_argument('input', nargs='?',
+                        help="labelled annthyroid-format CSV (default: the cached annthyroid arrays)")
+    parser.add_argument('--delimiter', default=';')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="rows per chunk (also THYRONET_CHUNK_SIZE)")
+    parser.add_argument('--epochs', type=int, help="DNN epochs (default: THYRONET_DNN_EPOCHS)")
+    parser.add_argument('--balancing', choices=BALANCING_STRATEGIES, default=DEFAULT_BALANCING,
+                        help="balancing of each Random Forest block")
+    parser.add_argument('--spool-dir', default=DEFAULT_SPOOL_DIR,
+                        help="keep the scaled-feature spool here (default: a temporary directory)")
+    parser.add_argument('--hyperparams', default=os.environ.get("THYRONET_HYPERPARAMS"),
+                        help="JSON of tuned hyperparameters from hyperparameter_search.py")
+    parser.add_argument('--no-save', action='store_true', help="do not write a model bundle")
+    args = parser.parse_args()
+
+    from hyperparameter_search import load_hyperparams
+
+    if args.input:
+        def chunks():
+            return iter_csv_chunks(args.input, args.chunk_size, args.delimiter)
+        source = args.input
+    else:
+        from data_loader import load_arrays
+        X, y, _ = load_arrays(mmap=True)
+
+        def chunks():
+            return iter_array_chunks(X, y, args.chunk_size)
+        source = "cached annthyroid arrays"
+
+    print(f"🧱 Out-of-core training from {source} in chunks of {args.chunk_size:,} rows")
+    start = time.perf_counter()
+    result = train_out_of_core(chunks, load_hyperparams(args.hyperparams), args.chunk_size, args.epochs,
+                               args.balancing, args.spool_dir)
+    print(f"⏱️  Trained in {time.perf_counter() - start:.1f}s "
+          f"({', '.join(f'{stage} {seconds:.1f}s' for stage, seconds in result['timings'].items())})")
+
+    if not args.no_save:
+        from model_bundle import save_bundle
+        from neighbor_index import NeighborIndex
+
+        feature_names = list(FEATURE_COLUMNS)
+        bundle_path = save_bundle(
+            result['var_thresh'], result['selector'], result['scaler'], result['rf'], result['dnn'],
+            feature_names=feature_names,
+            selected_features=[feature_names[j] for j in result['columns']],
+            metrics=result['metrics'],
+            neighbor_index=NeighborIndex(method='kd_tree').fit(*result['registry']),
+            background=result['background'],
+            running_stats=result['running_stats'].to_dict(),
+            replay=result['replay'],
+            drift_reference=result['drift_reference'],
+        )
+        print(f"✅ Model bundle saved to {bundle_path}")
+
+
+if __name__ == "__main__":
+    main()
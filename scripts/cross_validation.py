@@ -0,0 +1,175 @@
+"""
+Stratified Cross-Validation for ThyroNet-XAI
+Runs (repeated) stratified k-fold over the full
+balance -> VarianceThreshold -> SelectKBest -> MinMaxScaler -> model chain.
+Each fold's preprocessing is fitted on that fold's training rows only,
+computed once and shared by every model; folds run in parallel workers.
+
+Usage:
+    python scripts/cross_validation.py --folds 5 --repeats 2 --workers 4
+"""
+
+import argparse
+import copy
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from joblib import Memory
+from sklearn.feature_selection import SelectKBest, VarianceThreshold, f_classif
+from sklearn.model_selection import RepeatedStratifiedKFold
+from sklearn.preprocessing import MinMaxScaler
+
+from balancing import BALANCING_STRATEGIES, DEFAULT_BALANCING, balance
+from metrics_engine import METRIC_NAMES, evaluate_models
+from schema import FEATURE_DTYPE
+from training_orchestrator import build_default_models, effective_workers, fit_and_predict
+
+HYBRID_NAME = 'Hybrid (RF+DNN)'
+
+DEFAULT_CV_CACHE_DIR = os.environ.get(
+    "THYRONET_CV_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "thyronet", "cv")
+)
+
+
+def make_folds(y, n_splits=5, n_repeats=1, random_state=42):
+    """Deterministic list of (fold_id, train_idx, test_idx) stratified splits"""
+    splitter = RepeatedStratifiedKFold(n_splits=n_splits, n_repeats=n_repeats,
+                                       random_state=random_state)
+    dummy = np.zeros(len(y))
+    return [(fold_id, train_idx, test_idx)
+            for fold_id, (train_idx, test_idx) in enumerate(splitter.split(dummy, y))]
+
+
+def prepare_fold(X, y, train_idx, test_idx, k=10, random_state=42, balancing=DEFAULT_BALANCING):
+    """Fit the preprocessing chain on one fold's training rows and transform both sides"""
+    X_train_res, y_train_res, sample_weight = balance(X[train_idx], y[train_idx], balancing,
+                                                      random_state=random_state)
+
+    var_thresh = VarianceThreshold(threshold=0)
+    X_train_var = var_thresh.fit_transform(X_train_res)
+    selector = SelectKBest(score_func=f_classif, k=min(k, X_train_var.shape[1]))
+    X_train_selected = selector.fit_transform(X_train_var, y_train_res)
+    scaler = MinMaxScaler()
+    X_train_scaled = scaler.fit_transform(X_train_selected)
+
+    X_test_scaled = scaler.transform(selector.transform(var_thresh.transform(X[test_idx])))
+    kept = np.flatnonzero(var_thresh.get_support())[selector.get_support()]
+
+    return {
+        'X_train': X_train_scaled,
+        'y_train': y_train_res,
+        'sample_weight': sample_weight,
+        'X_test': X_test_scaled,
+        'y_test': y[test_idx],
+        'selected_columns': kept,
+    }
+
+
+def run_fold(fold_id, X, y, train_idx, test_idx, models, k, random_state, balancing, n_threads,
+             cache_dir):
+    """Preprocess one fold (memoized) and evaluate every model plus the hybrid on it"""
+    prepare = Memory(cache_dir, verbose=0).cache(prepare_fold) if cache_dir else prepare_fold
+    fold = prepare(X, y, train_idx, test_idx, k, random_state, balancing)
+
+    probabilities = {}
+    for name, model in models.items():
+        _, result = fit_and_predict(name, copy.deepcopy(model), fold['X_train'], fold['y_train'],
+                                    fold['X_test'], n_threads, fold['sample_weight'])
+        probabilities[name] = result['probabilities']
+
+    if 'Random Forest' in probabilities and 'DNN' in probabilities:
+        probabilities[HYBRID_NAME] = (probabilities['Random Forest'] + probabilities['DNN']) / 2
+
+    # All models of the fold are scored together from one sort per model
+    performance_df, _ = evaluate_models(fold['y_test'], probabilities)
+    performance_df.insert(0, 'Fold', fold_id)
+    return performance_df.to_dict('records'), probabilities
+
+
+def cross_validate(X, y, models=None, n_splits=5, n_repeats=1, k=10, random_state=42,
+                   balancing=DEFAULT_BALANCING, max_workers=None, cache_dir=DEFAULT_CV_CACHE_DIR,
+                   return_oof=False):
+    """Evaluate all models over stratified folds; returns (per-fold DataFrame, mean/std summary)
+
+    With return_oof=True a third element maps each model to its out-of-fold
+    probabilities for every row of X, averaged over repeats.
+    """
+    X = np.ascontiguousarray(X, dtype=FEATURE_DTYPE)
+    y = np.asarray(y).astype(int)
+    models = models or build_default_models(int(len(y) * (1 - 1 / n_splits)))
+    folds = make_folds(y, n_splits, n_repeats, random_state)
+
+    max_workers = effective_workers(max_workers, len(folds))
+    n_threads = max(1, (os.cpu_count() or 1) // max_workers)
+    args = [(fold_id, X, y, train_idx, test_idx, models, k, random_state, balancing, n_threads,
+             cache_dir)
+            for fold_id, train_idx, test_idx in folds]
+
+    if max_workers == 1:
+        results = [run_fold(*fold_args) for fold_args in args]
+    else:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            results = list(executor.map(run_fold, *zip(*args)))
+
+    rows = [row for fold_rows, _ in results for row in fold_rows]
+    fold_df = pd.DataFrame(rows)
+    model_order = list(dict.fromkeys(fold_df['Model']))
+    summary = fold_df.groupby('Model', sort=False)[METRIC_NAMES].agg(['mean', 'std']).loc[model_order]
+    if not return_oof:
+        return fold_df, summary
+
+    oof = {name: np.zeros(len(y)) for name in model_order}
+    for (_, _, test_idx), (_, probabilities) in zip(folds, results):
+        for name, values in probabilities.items():
+            oof[name][test_idx] += values / n_repeats
+    return fold_df, summary, oof
+
+
+def save_oof(path, y, oof):
+    """Store out-of-fold probabilities as an .npz keyed by model name, plus the labels"""
+    np.savez(path, y=np.asarray(y), models=np.array(list(oof)), probabilities=np.vstack(list(oof.values())))
+
+
+def load_oof(path):
+    """Inverse of save_oof: returns (y, {model_name: probabilities})"""
+    with np.load(path) as data:
+        return data['y'], dict(zip(data['models'].tolist(), data['probabilities']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validate the ThyroNet-XAI models")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--k', type=int, default=10, help="features kept by SelectKBest")
+    parser.add_argument('--balancing', choices=BALANCING_STRATEGIES, default=DEFAULT_BALANCING)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-dir', default=DEFAULT_CV_CACHE_DIR,
+                        help="memoize fold preprocessing here ('' to disable)")
+    parser.add_argument('--output', help="write per-fold metrics to this CSV")
+    parser.add_argument('--oof-output', help="write out-of-fold probabilities to this .npz "
+                                             "(input for hybrid_optimizer.py)")
+    args = parser.parse_args()
+
+    from data_loader import load_arrays
+
+    X, y, feature_names = load_arrays()
+    print(f"🔄 {args.repeats}x{args.folds}-fold stratified CV on {X.shape[0]} rows")
+
+    fold_df, summary, oof = cross_validate(X, y, n_splits=args.folds, n_repeats=args.repeats, k=args.k,
+                                           balancing=args.balancing, max_workers=args.workers,
+                                           cache_dir=args.cache_dir or None, return_oof=True)
+    if args.output:
+        fold_df.to_csv(args.output, index=False)
+    if args.oof_output:
+        save_oof(args.oof_output, y, oof)
+
+    print("\nCross-validated Model Performance (mean ± std):")
+    print(summary.round(4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,92 @@
 """
 Data Exploration Script for Thyroid Cancer Dataset
-Provides detailed analysis of the dataset structure and characteristics
+Provides detailed analysis of the dataset structure and characteristics,
+streaming the CSV in chunks so extracts larger than memory can be profiled;
+each chunk is parsed with the compact schema dtypes and validated against
+the annthyroid schema (schema.py), as in training and inference
 """
 
+import argparse
+
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from data_loader import TARGET_COLUMN, fetch_csv
+from data_profiler import DEFAULT_CHUNK_SIZE, high_correlation_pairs, profile_csv
+from reporting import DEFAULT_REPORT_DIR, PLOTS_ENABLED, FigureReporter
+from reporting import plot_correlation_heatmap, plot_target_distribution
 
-def explore_thyroid_data():
-    """Comprehensive data exploration for thyroid dataset"""
+def explore_thyroid_data(plots=PLOTS_ENABLED, report_dir=DEFAULT_REPORT_DIR, csv_path=None,
+                         delimiter=';', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Comprehensive data exploration for thyroid dataset, streamed in chunks"""
     
     print("🔍 ThyroNet-XAI: Data Exploration")
     print("=" * 50)
     
-    # Load data
-    data_url = "https://hebbkx1anhila5yf.public.blob.vercel-storage.com/annthyroid_unsupervised_anomaly_detection%20%281%29-sjO68MzKaASs0l6gSA10YZXwFeJh45.csv"
-    
+    # Profile the cached CSV (or any extract) chunk by chunk; nothing holds the full table
     try:
-        df = pd.read_csv(data_url, delimiter=';')
-        print("✅ Data loaded successfully from URL")
+        csv_path = csv_path or fetch_csv()
+        profile = profile_csv(csv_path, delimiter=delimiter, chunk_size=chunk_size)
+        print(f"✅ Data profiled from {csv_path}")
     except Exception as e:
         print(f"❌ Error loading data: {e}")
         return
     
+    reporter = FigureReporter(report_dir, enabled=plots)
+    
     # Basic dataset information
+    columns = profile.columns + [c for c in [TARGET_COLUMN] if c not in profile.columns]
     print(f"\n📊 Dataset Overview:")
-    print(f"Shape: {df.shape}")
-    print(f"Columns: {df.columns.tolist()}")
-    print(f"Memory usage: {df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+    print(f"Shape: ({profile.n_rows}, {len(columns)})")
+    print(f"Columns: {columns}")
+    print(f"Memory usage: {profile.memory_bytes / 1024**2:.2f} MB")
     
     # Data types and missing values
     print(f"\n📋 Data Quality:")
-    print(f"Missing values: {df.isnull().sum().sum()}")
-    print(f"Duplicate rows: {df.duplicated().sum()}")
+    print(f"Missing values: {profile.null_counts.sum()}")
+    print(f"Duplicate rows: {profile.duplicate_rows()}")
     
     # Statistical summary
     print(f"\n📈 Statistical Summary:")
-    print(df.describe())
+    print(profile.summary())
     
     # Target variable analysis
-    if 'Outlier_label' in df.columns:
+    if profile.target_counts:
         print(f"\n🎯 Target Variable Analysis:")
-        target_counts = df['Outlier_label'].value_counts()
+        target_counts = pd.Series(profile.target_counts, name='count').sort_values(ascending=False)
+        target_counts.index.name = TARGET_COLUMN
         print(target_counts)
         
         # Visualize target distribution
-        plt.figure(figsize=(12, 4))
-        
-        plt.subplot(1, 2, 1)
-        target_counts.plot(kind='bar', color=['#3498db', '#e74c3c'])
-        plt.title('Target Variable Distribution')
-        plt.xlabel('Class')
-        plt.ylabel('Count')
-        plt.xticks(rotation=0)
-        
-        plt.subplot(1, 2, 2)
-        target_counts.plot(kind='pie', autopct='%1.1f%%', colors=['#3498db', '#e74c3c'])
-        plt.title('Target Variable Percentage')
-        plt.ylabel('')
-        
-        plt.tight_layout()
-        plt.show()
+        reporter.submit('target_distribution', plot_target_distribution, target_counts)
     
     # Feature correlation analysis
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) > 1:
+    if len(profile.columns) > 1:
         print(f"\n🔗 Correlation Analysis:")
-        correlation_matrix = df[numeric_cols].corr()
+        correlation_matrix = profile.correlation()
         
-        plt.figure(figsize=(12, 10))
-        sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0,
-                   square=True, fmt='.2f')
-        plt.title('Feature Correlation Matrix')
-        plt.tight_layout()
-        plt.show()
+        reporter.submit('correlation_matrix', plot_correlation_heatmap, correlation_matrix)
         
         # High correlation pairs
-        high_corr_pairs = []
-        for i in range(len(correlation_matrix.columns)):
-            for j in range(i+1, len(correlation_matrix.columns)):
-                corr_val = correlation_matrix.iloc[i, j]
-                if abs(corr_val) > 0.7:
-                    high_corr_pairs.append((
-                        correlation_matrix.columns[i],
-                        correlation_matrix.columns[j],
-                        corr_val
-                    ))
+        high_corr_pairs = high_correlation_pairs(correlation_matrix, threshold=0.7)
         
         if high_corr_pairs:
             print(f"\n⚠️  High Correlation Pairs (|r| > 0.7):")
             for feat1, feat2, corr in high_corr_pairs:
                 print(f"   {feat1} ↔ {feat2}: {corr:.3f}")
     
+    for name, paths in reporter.close().items():
+        print(f"🖼️  {name}: {', '.join(paths)}")
     print(f"\n✅ Data exploration complete!")
 
+def main():
+    parser = argparse.ArgumentParser(description="Explore the thyroid dataset")
+    parser.add_argument('--no-plots', action='store_true', help="skip figure rendering (also THYRONET_NO_PLOTS=1)")
+    parser.add_argument('--report-dir', default=DEFAULT_REPORT_DIR, help="directory for PNG/SVG figures")
+    parser.add_argument('--file', help="profile this CSV instead of the cached dataset")
+    parser.add_argument('--delimiter', default=';')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="rows read per chunk")
+    args = parser.parse_args()
+    explore_thyroid_data(plots=PLOTS_ENABLED and not args.no_plots, report_dir=args.report_dir,
+                         csv_path=args.file, delimiter=args.delimiter, chunk_size=args.chunk_size)
+
 if __name__ == "__main__":
-    explore_thyroid_data()
+    main()
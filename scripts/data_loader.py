@@ -0,0 +1,212 @@
+"""
+Dataset Loading for ThyroNet-XAI
+Fetches the annthyroid CSV once, keeps a checksummed local copy and converts it
+to a memory-mapped binary cache that later runs load without re-parsing.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from schema import (COLUMN_DTYPES, FEATURE_DTYPE, LABEL_MAPPING, SCHEMA_VERSION, TARGET_COLUMN,
+                    apply_schema)
+
+DATA_URL = "https://hebbkx1anhila5yf.public.blob.vercel-storage.com/annthyroid_unsupervised_anomaly_detection%20%281%29-sjO68MzKaASs0l6gSA10YZXwFeJh45.csv"
+DEFAULT_CACHE_DIR = os.environ.get(
+    "THYRONET_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "thyronet")
+)
+
+CSV_FILENAME = "annthyroid.csv"
+MANIFEST_FILENAME = "manifest.json"
+FEATURES_FILENAME = "features.npy"
+LABELS_FILENAME = "labels.npy"
+COLUMNS_FILENAME = "columns.json"
+
+
+class DatasetUnavailableError(RuntimeError):
+    """Raised when the dataset is neither cached locally nor fetchable"""
+
+
+def is_offline():
+    """Whether THYRONET_OFFLINE forbids any network access"""
+    return os.environ.get("THYRONET_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Compute the SHA-256 digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, payload):
+    # Write atomically so an interrupted run never leaves a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _verified_csv(cache_dir):
+    """Return the cached CSV path if it exists and matches its manifest checksum"""
+    manifest = _read_manifest(cache_dir)
+    csv_path = os.path.join(cache_dir, CSV_FILENAME)
+    if manifest is None or not os.path.exists(csv_path):
+        return None
+    if file_sha256(csv_path) != manifest.get('sha256'):
+        print(f"⚠️  Checksum mismatch for cached dataset {csv_path}")
+        return None
+    return csv_path
+
+
+def import_csv(source_path, cache_dir=DEFAULT_CACHE_DIR, source=None):
+    """Seed the cache from a CSV already on disk (e.g. copied onto an air-gapped node)"""
+    os.makedirs(cache_dir, exist_ok=True)
+    csv_path = os.path.join(cache_dir, CSV_FILENAME)
+    tmp_path = f"{csv_path}.tmp"
+    shutil.copyfile(source_path, tmp_path)
+    os.replace(tmp_path, csv_path)
+
+    _write_json(os.path.join(cache_dir, MANIFEST_FILENAME), {
+        'source': source or os.path.abspath(source_path),
+        'sha256': file_sha256(csv_path),
+        'fetched_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    })
+    return csv_path
+
+
+def fetch_csv(url=DATA_URL, cache_dir=DEFAULT_CACHE_DIR, offline=None, refresh=False):
+    """Return a local, checksum-verified copy of the dataset CSV, downloading it at most once"""
+    offline = is_offline() if offline is None else offline
+
+    csv_path = None if refresh else _verified_csv(cache_dir)
+    if csv_path is not None:
+        return csv_path
+
+    if offline:
+        raise DatasetUnavailableError(
+            f"No verified dataset in {cache_dir} and offline mode forbids downloading it"
+        )
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.download')
+    try:
+        with os.fdopen(fd, 'wb') as out, urllib.request.urlopen(url, timeout=60) as response:
+            shutil.copyfileobj(response, out)
+        csv_path = import_csv(tmp_path, cache_dir, source=url)
+    except OSError as e:
+        raise DatasetUnavailableError(f"Could not download dataset: {e}") from e
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    print(f"✅ Dataset downloaded to {csv_path}")
+    return csv_path
+
+
+def clean_dataframe(df):
+    """Drop stray delimiter columns, strip names and encode the target label"""
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed|^;$', regex=True)]
+    df.columns = df.columns.str.strip()
+    if TARGET_COLUMN in df.columns and not pd.api.types.is_numeric_dtype(df[TARGET_COLUMN]):
+        df[TARGET_COLUMN] = df[TARGET_COLUMN].map(LABEL_MAPPING)
+    return df
+
+
+def build_binary_cache(csv_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Parse the CSV once, validate it against the schema and store float32 features/uint8 labels"""
+    df = apply_schema(clean_dataframe(pd.read_csv(csv_path, delimiter=';')))
+    feature_names = [c for c in df.columns if c != TARGET_COLUMN]
+
+    features = np.ascontiguousarray(df[feature_names].to_numpy(dtype=FEATURE_DTYPE))
+    labels = df[TARGET_COLUMN].to_numpy()
+
+    np.save(os.path.join(cache_dir, FEATURES_FILENAME), features)
+    np.save(os.path.join(cache_dir, LABELS_FILENAME), labels)
+    # Written last: its source checksum marks the arrays as complete and current
+    _write_json(os.path.join(cache_dir, COLUMNS_FILENAME), {
+        'features': feature_names,
+        'target': TARGET_COLUMN,
+        'schema_version': SCHEMA_VERSION,
+        'source_sha256': file_sha256(csv_path),
+    })
+    print(f"✅ Binary cache built in {cache_dir}")
+
+
+def _binary_cache_is_current(cache_dir):
+    manifest = _read_manifest(cache_dir)
+    columns_path = os.path.join(cache_dir, COLUMNS_FILENAME)
+    if manifest is None or not os.path.exists(columns_path):
+        return False
+    with open(columns_path) as f:
+        columns = json.load(f)
+    return (columns.get('source_sha256') == manifest.get('sha256')
+            and columns.get('schema_version') == SCHEMA_VERSION
+            and os.path.exists(os.path.join(cache_dir, FEATURES_FILENAME))
+            and os.path.exists(os.path.join(cache_dir, LABELS_FILENAME)))
+
+
+def load_arrays(cache_dir=DEFAULT_CACHE_DIR, offline=None, mmap=True):
+    """Load (features, labels, feature_names), memory-mapping the binary cache when possible"""
+    if not _binary_cache_is_current(cache_dir):
+        csv_path = fetch_csv(cache_dir=cache_dir, offline=offline)
+        build_binary_cache(csv_path, cache_dir)
+
+    with open(os.path.join(cache_dir, COLUMNS_FILENAME)) as f:
+        columns = json.load(f)
+
+    mmap_mode = 'r' if mmap else None
+    features = np.load(os.path.join(cache_dir, FEATURES_FILENAME), mmap_mode=mmap_mode)
+    labels = np.load(os.path.join(cache_dir, LABELS_FILENAME), mmap_mode=mmap_mode)
+    return features, labels, columns['features']
+
+
+def load_dataframe(cache_dir=DEFAULT_CACHE_DIR, offline=None):
+    """Load the cleaned dataset as a DataFrame with compact schema dtypes and an encoded Outlier_label"""
+    features, labels, feature_names = load_arrays(cache_dir, offline=offline)
+    df = pd.DataFrame({
+        name: features[:, j].astype(COLUMN_DTYPES.get(name, FEATURE_DTYPE))
+        for j, name in enumerate(feature_names)
+    })
+    df[TARGET_COLUMN] = np.asarray(labels)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare the local ThyroNet-XAI dataset cache")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--from-file', help="seed the cache from a local CSV instead of downloading")
+    parser.add_argument('--refresh', action='store_true', help="re-download even if a verified copy exists")
+    parser.add_argument('--offline', action='store_true', help="never touch the network")
+    args = parser.parse_args()
+
+    if args.from_file:
+        csv_path = import_csv(args.from_file, args.cache_dir)
+    else:
+        csv_path = fetch_csv(cache_dir=args.cache_dir, offline=args.offline or None, refresh=args.refresh)
+    build_binary_cache(csv_path, args.cache_dir)
+
+    features, labels, feature_names = load_arrays(args.cache_dir, offline=True)
+    print(f"Cached {features.shape[0]} rows x {len(feature_names)} features in {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Streaming Dataset Profiler for ThyroNet-XAI
+Profiles a CSV chunk by chunk so registry extracts larger than memory can
+be explored. Per-column count/mean/variance/min/max and the co-moment
+matrix (hence covariance and correlation) are merged across chunks with
+the parallel update of Chan et al.; nulls, label counts and 64-bit row
+hashes for duplicate detection are accumulated alongside. Only the hashes
+grow with the data (8 bytes per row). Chunks are parsed with the compact
+schema dtypes and validated with schema.apply_schema, so bad extracts fail
+while profiling instead of being silently coerced.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_loader import TARGET_COLUMN, clean_dataframe
+from schema import COLUMN_DTYPES, FEATURE_COLUMNS, SchemaError, apply_schema
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+class StreamingProfile:
+    """Mergeable running statistics over numeric columns
+
+    Column statistics skip nulls per column; the covariance uses rows that
+    are complete across all numeric columns.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        n_cols = len(self.columns)
+        self.n_rows = 0
+        self.null_counts = np.zeros(n_cols, dtype=np.int64)
+        self.counts = np.zeros(n_cols, dtype=np.int64)
+        self.means = np.zeros(n_cols)
+        self.m2 = np.zeros(n_cols)
+        self.mins = np.full(n_cols, np.inf)
+        self.maxs = np.full(n_cols, -np.inf)
+        self.n_complete = 0
+        self.complete_means = np.zeros(n_cols)
+        self.comoment = np.zeros((n_cols, n_cols))
+        self.target_counts = {}
+        self.memory_bytes = 0
+        self._row_hashes = []
+
+    def update(self, chunk):
+        """Fold one cleaned DataFrame chunk into the running statistics"""
+        values = chunk[self.columns].to_numpy(dtype=np.float64)
+        missing = np.isnan(values)
+        self.n_rows += len(values)
+        self.null_counts += missing.sum(axis=0)
+        self.memory_bytes += int(chunk.memory_usage(deep=True).sum())
+        self._row_hashes.append(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+
+        if TARGET_COLUMN in chunk.columns:
+            for label, count in chunk[TARGET_COLUMN].value_counts(dropna=False).items():
+                self.target_counts[label] = self.target_counts.get(label, 0) + int(count)
+
+        # Per-column moments over non-null values
+        n_b = (~missing).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(n_b > 0, np.nansum(values, axis=0) / n_b, 0.0)
+        m2_b = np.nansum((values - mean_b) ** 2, axis=0)
+        n_a, n = self.counts, self.counts + n_b
+        delta = mean_b - self.means
+        safe_n = np.maximum(n, 1)
+        self.means = self.means + delta * n_b / safe_n
+        self.m2 = self.m2 + m2_b + delta ** 2 * n_a * n_b / safe_n
+        self.counts = n
+        if len(values):
+            self.mins = np.fmin(self.mins, np.nanmin(np.where(missing, np.inf, values), axis=0))
+            self.maxs = np.fmax(self.maxs, np.nanmax(np.where(missing, -np.inf, values), axis=0))
+
+        # Co-moments over complete rows
+        complete = values[~missing.any(axis=1)]
+        if len(complete):
+            n_b = len(complete)
+            mean_b = complete.mean(axis=0)
+            centered = complete - mean_b
+            n_a, n = self.n_complete, self.n_complete + n_b
+            delta = mean_b - self.complete_means
+            self.comoment += centered.T @ centered + np.outer(delta, delta) * n_a * n_b / n
+            self.complete_means += delta * n_b / n
+            self.n_complete = n
+        return self
+
+    @property
+    def variances(self):
+        """Sample variance per column (ddof=1, as pandas)"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.counts > 1, self.m2 / (self.counts - 1), np.nan)
+
+    def covariance(self):
+        return pd.DataFrame(self.comoment / max(self.n_complete - 1, 1),
+                            index=self.columns, columns=self.columns)
+
+    def correlation(self):
+        comoment = self.comoment
+        scale = np.sqrt(np.diag(comoment))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = comoment / np.outer(scale, scale)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def duplicate_rows(self):
+        """Rows identical to an earlier row (by 64-bit row hash)"""
+        if not self._row_hashes:
+            return 0
+        hashes = np.concatenate(self._row_hashes)
+        return int(len(hashes) - len(np.unique(hashes)))
+
+    def summary(self):
+        """describe()-style table: count, mean, std, min, max per column"""
+        return pd.DataFrame({
+            'count': self.counts,
+            'mean': self.means,
+            'std': np.sqrt(self.variances),
+            'min': np.where(self.counts > 0, self.mins, np.nan),
+            'max': np.where(self.counts > 0, self.maxs, np.nan),
+        }, index=self.columns).T
+
+
+def high_correlation_pairs(correlation_matrix, threshold=0.7):
+    """(feature_a, feature_b, r) for every pair above |threshold|, from the upper triangle"""
+    corr = correlation_matrix.to_numpy()
+    mask = np.triu(np.abs(corr) > threshold, k=1)
+    rows, cols = np.nonzero(mask)
+    names = correlation_matrix.columns
+    return [(names[i], names[j], corr[i, j]) for i, j in zip(rows, cols)]
+
+
+def profile_csv(path, delimiter=';', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a CSV through StreamingProfile, one schema-validated chunk at a time
+
+    The schema's feature columns are profiled; the label is only counted.
+    Raises ValueError for a file without data rows.
+    """
+    # The label is parsed as text ('n'/'o') and encoded by apply_schema
+    dtypes = {name: dtype for name, dtype in COLUMN_DTYPES.items() if name != TARGET_COLUMN}
+    profile = StreamingProfile(FEATURE_COLUMNS)
+    try:
+        chunks = pd.read_csv(path, delimiter=delimiter, chunksize=chunk_size, dtype=dtypes)
+    except pd.errors.EmptyDataError:
+        raise ValueError(f"{path} is empty") from None
+    while True:
+        try:
+            chunk = next(chunks, None)
+        except ValueError as e:
+            raise SchemaError(f"{path} does not match the annthyroid schema: {e}") from e
+        if chunk is None:
+            break
+        profile.update(apply_schema(clean_dataframe(chunk)))
+    if profile.n_rows == 0:
+        raise ValueError(f"{path} has no data rows")
+    return profile
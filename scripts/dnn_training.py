@@ -0,0 +1,261 @@
+"""
+DNN Training Engine for ThyroNet-XAI
+Fits the ThyroNet DNN from a tf.data pipeline instead of raw NumPy arrays:
+
+    - validation rows are held out by stratified split over *distinct* rows,
+      so copies made by oversampling never straddle train and validation
+      and the validation set keeps the real class ratio
+    - training batches are shuffled per epoch, gathered in one op per batch
+      and prefetched while the previous step runs
+    - the batch size is picked from the training-set size (largest size
+      that still gives enough steps per epoch) with a square-root
+      learning-rate scaling from the 32-row baseline
+    - optional XLA compilation and mixed precision
+    - per-epoch rows/sec is recorded alongside the Keras history
+    - an existing network can be fine-tuned through the same pipeline
+      (see incremental_training.py)
+    - train_dnn_streaming fits from a chunk generator instead, for
+      training sets that do not fit in memory (see chunked_training.py)
+
+Settings: THYRONET_DNN_EPOCHS (maximum epochs, default 50),
+THYRONET_DNN_BATCH_SIZE ("auto" or a number),
+THYRONET_DNN_XLA=1, THYRONET_DNN_PRECISION (float32, mixed_bfloat16).
+"""
+
+import math
+import os
+import time
+
+import numpy as np
+
+from schema import FEATURE_DTYPE
+
+DEFAULT_EPOCHS = int(os.environ.get("THYRONET_DNN_EPOCHS", 50))
+DEFAULT_BATCH_SIZE = os.environ.get("THYRONET_DNN_BATCH_SIZE", "auto")
+DEFAULT_XLA = os.environ.get("THYRONET_DNN_XLA", "").lower() in ("1", "true", "yes")
+DEFAULT_PRECISION = os.environ.get("THYRONET_DNN_PRECISION", "float32")
+PRECISIONS = ('float32', 'mixed_bfloat16', 'mixed_float16')
+
+BATCH_CANDIDATES = (32, 64, 128, 256, 512, 1024, 2048)
+MIN_STEPS_PER_EPOCH = 50
+BASE_BATCH_SIZE = 32
+BASE_LEARNING_RATE = 1e-3
+
+
+def resolve_batch_size(batch_size, n_rows, min_steps=MIN_STEPS_PER_EPOCH):
+    """The requested batch size, or for 'auto' the largest candidate giving min_steps steps per epoch"""
+    if batch_size not in (None, 'auto'):
+        return int(batch_size)
+    fitting = [size for size in BATCH_CANDIDATES if n_rows / size >= min_steps]
+    return max(fitting) if fitting else BATCH_CANDIDATES[0]
+
+
+def scaled_learning_rate(batch_size):
+    """Adam learning rate for batch_size, scaled by sqrt(batch_size / 32) from the Keras default"""
+    return BASE_LEARNING_RATE * math.sqrt(batch_size / BASE_BATCH_SIZE)
+
+
+def stratified_validation_split(X, y, validation_fraction=0.2, random_state=42):
+    """(train_idx, val_idx) stratified by label, splitting distinct rows rather than copies
+
+    Identical (row, label) pairs form one group; whole groups go to one
+    side, and the validation side keeps a single copy of each.
+    """
+    y = np.asarray(y)
+    keyed = np.column_stack([np.asarray(X, dtype=np.float64), y])
+    _, first, groups = np.unique(keyed, axis=0, return_index=True, return_inverse=True)
+    groups = groups.ravel()
+    group_labels = y[first]
+
+    rng = np.random.RandomState(random_state)
+    val_groups = []
+    for label in np.unique(group_labels):
+        members = np.flatnonzero(group_labels == label)
+        n_val = int(round(len(members) * validation_fraction))
+        val_groups.append(rng.choice(members, n_val, replace=False))
+    is_val_group = np.zeros(len(first), dtype=bool)
+    is_val_group[np.concatenate(val_groups)] = True
+
+    train_idx = np.flatnonzero(~is_val_group[groups])
+    val_idx = np.sort(first[is_val_group])
+    return train_idx, val_idx
+
+
+def make_dataset(X, y, sample_weight=None, batch_size=32, shuffle=False, seed=42):
+    """Batched, prefetched tf.data pipeline over in-memory arrays
+
+    Shuffling permutes row indices each epoch and gathers a whole batch per
+    step, which is much cheaper than shuffling and batching element-wise.
+    """
+    import tensorflow as tf
+
+    tensors = [tf.constant(np.asarray(X, dtype=FEATURE_DTYPE)),
+               tf.constant(np.asarray(y, dtype=np.float32))]
+    if sample_weight is not None:
+        tensors.append(tf.constant(np.asarray(sample_weight, dtype=np.float32)))
+    n_rows = len(y)
+
+    indices = tf.data.Dataset.range(n_rows)
+    if shuffle:
+        indices = indices.shuffle(n_rows, seed=seed, reshuffle_each_iteration=True)
+    dataset = indices.batch(batch_size).map(
+        lambda idx: tuple(tf.gather(t, idx) for t in tensors),
+        num_parallel_calls=tf.data.AUTOTUNE,
+    )
+
+    options = tf.data.Options()
+    options.threading.private_threadpool_size = max(
+        1, tf.config.threading.get_intra_op_parallelism_threads() or os.cpu_count() or 1)
+    options.threading.max_intra_op_parallelism = 1
+    return dataset.with_options(options).prefetch(tf.data.AUTOTUNE)
+
+
+def _throughput_callback(epoch_seconds):
+    from tensorflow.keras.callbacks import Callback
+
+    class Throughput(Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            epoch_seconds.append(time.perf_counter() - self.start)
+
+    return Throughput()
+
+
+def train_dnn(X, y, sample_weight=None, epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZE,
+              validation_split=0.2, patience=10, xla=DEFAULT_XLA, precision=DEFAULT_PRECISION, verbose=2, random_state=42,
+              hidden_units=(64, 32, 16), dropout=0.3, dnn=None, learning_rate_scale=1.0):
+    """Fit a fresh ThyroNet DNN, or continue training `dnn`; returns (dnn, history dict with throughput entries)
+
+    `learning_rate_scale` multiplies the batch-size-scaled learning rate
+    (e.g. 0.1 for fine-tuning). An existing `dnn` is recompiled and trained
+    from its current weights; it keeps the dtype it was built with, so
+    `precision`, `hidden_units` and `dropout` only apply to fresh networks.
+    """
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    from training_orchestrator import build_dnn
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+    X = np.asarray(X, dtype=FEATURE_DTYPE)
+    y = np.asarray(y)
+
+    callbacks = []
+    validation = None
+    train_idx = np.arange(len(y))
+    if validation_split:
+        train_idx, val_idx = stratified_validation_split(X, y, validation_split, random_state)
+        val_weight = None if sample_weight is None else sample_weight[val_idx]
+        validation = make_dataset(X[val_idx], y[val_idx], val_weight, batch_size=1024)
+        callbacks.append(EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True))
+
+    n_train = len(train_idx)
+    batch_size = resolve_batch_size(batch_size, n_train)
+    train_weight = None if sample_weight is None else sample_weight[train_idx]
+    train = make_dataset(X[train_idx], y[train_idx], train_weight, batch_size, shuffle=True,
+                         seed=random_state)
+
+    epoch_seconds = []
+    callbacks.append(_throughput_callback(epoch_seconds))
+
+    learning_rate = learning_rate_scale * scaled_learning_rate(batch_size)
+    if dnn is None:
+        dnn = build_dnn(X.shape[1], learning_rate=learning_rate, jit_compile=xla,
+                        dtype=None if precision == 'float32' else precision, hidden_units=hidden_units,
+                        dropout=dropout)
+    else:
+        from tensorflow.keras.optimizers import Adam
+
+        dnn.compile(optimizer=Adam(learning_rate=learning_rate), loss='binary_crossentropy',
+                    metrics=['accuracy'], jit_compile=xla)
+    history = dnn.fit(train, validation_data=validation, epochs=epochs, callbacks=callbacks,
+                      verbose=verbose).history
+
+    return dnn, _with_throughput(history, epoch_seconds, n_train,
+                                 0 if validation is None else len(val_idx), batch_size)
+
+
+def _with_throughput(history, epoch_seconds, n_train, n_val, batch_size):
+    """Add per-epoch timings and rows/sec to a Keras history dict and print the summary line"""
+    history['epoch_seconds'] = epoch_seconds
+    history['rows_per_second'] = [n_train / seconds for seconds in epoch_seconds]
+    history['batch_size'] = batch_size
+    # The first epoch includes tracing/compilation; report the steady state
+    steady = history['rows_per_second'][1:] or history['rows_per_second']
+    print(f"⚡ DNN: {len(epoch_seconds)} epochs, batch {batch_size}, "
+          f"{np.median(steady):,.0f} rows/s ({n_train} train / {n_val} validation rows)")
+    return history
+
+
+def make_stream_dataset(chunks, n_rows, n_features, batch_size=32, random_state=42):
+    """Batched, prefetched tf.data pipeline over a stream of (X, y, sample_weight) chunks
+
+    `chunks` is called once per epoch and must return a fresh iterator over
+    n_rows rows in total. Rows are shuffled within each chunk (with a new
+    seed every epoch) and cut into batches; a partial batch at the end of a
+    chunk is carried into the next one, so only about one chunk is held in
+    memory and every epoch has exactly ceil(n_rows / batch_size) steps.
+    """
+    import tensorflow as tf
+
+    epoch = [0]
+
+    def batches():
+        rng = np.random.RandomState(random_state + epoch[0])
+        epoch[0] += 1
+        carry = None
+        for chunk in chunks():
+            if carry is not None:
+                chunk = tuple(np.concatenate([left, right]) for left, right in zip(carry, chunk))
+            X, y, sample_weight = (np.asarray(array, dtype=np.float32) for array in chunk)
+            order = rng.permutation(len(y))
+            n_full = len(order) - len(order) % batch_size
+            for start in range(0, n_full, batch_size):
+                rows = order[start:start + batch_size]
+                yield X[rows], y[rows], sample_weight[rows]
+            carry = (X[order[n_full:]], y[order[n_full:]], sample_weight[order[n_full:]])
+        if carry is not None and len(carry[1]):
+            yield carry
+
+    signature = (tf.TensorSpec((None, n_features), tf.float32), tf.TensorSpec((None,), tf.float32),
+                 tf.TensorSpec((None,), tf.float32))
+    dataset = tf.data.Dataset.from_generator(batches, output_signature=signature)
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(math.ceil(n_rows / batch_size)))
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def train_dnn_streaming(chunks, n_rows, n_features, validation=None, epochs=DEFAULT_EPOCHS,
+                        batch_size=DEFAULT_BATCH_SIZE, patience=10, xla=DEFAULT_XLA, precision=DEFAULT_PRECISION,
+                        verbose=2, random_state=42, hidden_units=(64, 32, 16), dropout=0.3):
+    """Fit a fresh ThyroNet DNN from chunks that need not fit in memory; returns (dnn, history)
+
+    `chunks` returns a fresh iterator of (X, y, sample_weight) per epoch
+    (see make_stream_dataset) over n_rows training rows in total.
+    `validation` is an optional in-memory (X, y, sample_weight) tuple used
+    for early stopping.
+    """
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    from training_orchestrator import build_dnn
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+    batch_size = resolve_batch_size(batch_size, n_rows)
+    train = make_stream_dataset(chunks, n_rows, n_features, batch_size, random_state)
+
+    epoch_seconds = []
+    callbacks = [_throughput_callback(epoch_seconds)]
+    validation_data = None
+    if validation is not None:
+        validation_data = make_dataset(*validation, batch_size=1024)
+        callbacks.append(EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True))
+
+    dnn = build_dnn(n_features, learning_rate=scaled_learning_rate(batch_size), jit_compile=xla,
+                    dtype=None if precision == 'float32' else precision, hidden_units=hidden_units,
+                    dropout=dropout)
+    history = dnn.fit(train, validation_data=validation_data, epochs=epochs, callbacks=callbacks,
+                      verbose=verbose).history
+    return dnn, _with_throughput(history, epoch_seconds, n_rows,
+                                 0 if validation is None else len(validation[1]), batch_size)
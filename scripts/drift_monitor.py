@@ -0,0 +1,216 @@
+"""
+Feature Drift Monitor for ThyroNet-XAI
+Watches the selected features the model actually consumes. At training time
+each feature gets a reference histogram on quantile bin edges of the raw
+training values (a fixed-size quantile sketch, so binary flags collapse to
+two bins). At scoring time every batch is binned against those edges with
+one searchsorted per feature and one bincount. Counts decay with a half-life
+in rows, so the monitor tracks recent traffic in O(batch) time and
+O(features x bins) memory without keeping any rows.
+
+On demand, per feature:
+    - PSI between reference and current bin shares (< 0.1 stable,
+      0.1-0.25 moderate, > 0.25 drift)
+    - Kolmogorov-Smirnov distance between the binned CDFs, with an
+      asymptotic p-value for the effective sample sizes
+    - mean shift in reference standard deviations, and the share of values
+      outside the training range or missing
+
+Usage:
+    python scripts/predict.py --drift patients.csv
+    curl localhost:8000/drift
+"""
+
+import os
+import threading
+
+import numpy as np
+from scipy.stats import kstwobign
+
+DEFAULT_BINS = 20
+DEFAULT_HALF_LIFE = int(os.environ.get("THYRONET_DRIFT_HALF_LIFE", 10000))
+MIN_ROWS = 100
+PSI_THRESHOLDS = (0.1, 0.25)
+PSI_EPSILON = 1e-4
+
+
+def _bin_counts(X, edges, n_edges, n_bins):
+    """Per-feature bin counts of X on right-closed bins, plus NaN counts
+
+    Bin 0 is (-inf, e_0], bin i is (e_{i-1}, e_i] and bin n_edges is
+    (e_last, inf); edges beyond n_edges are padding.
+    """
+    n_rows, n_features = X.shape
+    missing = np.isnan(X)
+    flat = np.empty(X.shape, dtype=np.intp)
+    for j in range(n_features):
+        flat[:, j] = np.searchsorted(edges[j, :n_edges[j]], X[:, j], side='left') + j * n_bins
+    counts = np.bincount(flat[~missing], minlength=n_features * n_bins).reshape(n_features, n_bins)
+    return counts.astype(np.float64), missing.sum(axis=0).astype(np.float64)
+
+
+def build_reference(X, feature_names, n_bins=DEFAULT_BINS):
+    """Reference histograms of the raw selected training columns of X on quantile bin edges"""
+    X = np.asarray(X, dtype=np.float64)
+    n_features = X.shape[1]
+    edges = np.full((n_features, n_bins - 1), np.nan)
+    n_edges = np.zeros(n_features, dtype=np.int64)
+    for j in range(n_features):
+        column = X[:, j][~np.isnan(X[:, j])]
+        unique_edges = np.unique(np.quantile(column, np.linspace(0, 1, n_bins + 1)[1:-1]))
+        edges[j, :len(unique_edges)] = unique_edges
+        n_edges[j] = len(unique_edges)
+
+    counts, _ = _bin_counts(X, edges, n_edges, n_bins)
+    return {
+        'features': np.array(feature_names),
+        'edges': edges,
+        'n_edges': n_edges,
+        'counts': counts,
+        'minimum': np.nanmin(X, axis=0),
+        'maximum': np.nanmax(X, axis=0),
+        'mean': np.nanmean(X, axis=0),
+        'std': np.nanstd(X, axis=0),
+        'n_rows': np.array(len(X)),
+    }
+
+
+def update_reference(reference, X):
+    """Reference with the rows of X added on the existing bin edges (e.g. after incremental training)"""
+    X = np.asarray(X, dtype=np.float64)
+    counts, _ = _bin_counts(X, reference['edges'], reference['n_edges'], reference['counts'].shape[1])
+    n_old, n_new = float(reference['n_rows']), len(X)
+    n = n_old + n_new
+    mean = (reference['mean'] * n_old + np.nansum(X, axis=0)) / n
+    second_moment = ((reference['std'] ** 2 + reference['mean'] ** 2) * n_old + np.nansum(X ** 2, axis=0)) / n
+    return {
+        **reference,
+        'counts': reference['counts'] + counts,
+        'minimum': np.fmin(reference['minimum'], np.nanmin(X, axis=0)),
+        'maximum': np.fmax(reference['maximum'], np.nanmax(X, axis=0)),
+        'mean': mean,
+        'std': np.sqrt(np.maximum(second_moment - mean ** 2, 0)),
+        'n_rows': np.array(int(n)),
+    }
+
+
+def population_stability_index(reference_counts, current_counts, epsilon=PSI_EPSILON):
+    """PSI per row of two (n_features, n_bins) count arrays"""
+    p = reference_counts / np.maximum(reference_counts.sum(axis=1, keepdims=True), 1)
+    q = current_counts / np.maximum(current_counts.sum(axis=1, keepdims=True), 1)
+    p, q = np.maximum(p, epsilon), np.maximum(q, epsilon)
+    return ((q - p) * np.log(q / p)).sum(axis=1)
+
+
+def ks_distance(reference_counts, current_counts):
+    """Largest gap between the binned CDFs per row of two (n_features, n_bins) count arrays"""
+    p = np.cumsum(reference_counts, axis=1) / np.maximum(reference_counts.sum(axis=1, keepdims=True), 1)
+    q = np.cumsum(current_counts, axis=1) / np.maximum(current_counts.sum(axis=1, keepdims=True), 1)
+    return np.abs(p - q).max(axis=1)
+
+
+class DriftMonitor:
+    """Exponentially decayed histograms of scored batches, compared with a training reference
+
+    `columns` picks the monitored features out of raw full-width rows (as
+    HybridScorer.columns); without it, update() expects the selected
+    columns only. half_life=None keeps plain cumulative counts.
+    Updates and reports are thread-safe.
+    """
+
+    def __init__(self, reference, columns=None, half_life=DEFAULT_HALF_LIFE):
+        self.reference = reference
+        self.features = [str(name) for name in reference['features']]
+        self.columns = None if columns is None else np.asarray(columns, dtype=np.intp)
+        self.decay = 0.5 ** (1 / half_life) if half_life else 1.0
+        n_features, n_bins = reference['counts'].shape
+        self.counts = np.zeros((n_features, n_bins))
+        self.missing = np.zeros(n_features)
+        self.below = np.zeros(n_features)
+        self.above = np.zeros(n_features)
+        self.total = np.zeros(n_features)
+        self.weight = 0.0
+        self.rows_seen = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bundle(cls, bundle, **kwargs):
+        """Monitor for a ModelBundle's selected features, or None for bundles without a reference"""
+        reference = bundle.drift_reference
+        if reference is None:
+            return None
+        kept = np.flatnonzero(bundle.var_thresh.get_support())
+        return cls(reference, columns=kept[bundle.selector.get_support()], **kwargs)
+
+    def update(self, X):
+        """Fold one batch of rows into the decayed histograms"""
+        X = np.asarray(X, dtype=np.float64)
+        if self.columns is not None:
+            X = X[:, self.columns]
+        reference = self.reference
+        counts, missing = _bin_counts(X, reference['edges'], reference['n_edges'], self.counts.shape[1])
+        below = (X < reference['minimum']).sum(axis=0)
+        above = (X > reference['maximum']).sum(axis=0)
+        total = np.nansum(X, axis=0)
+
+        factor = self.decay ** len(X)
+        with self._lock:
+            for name, batch in (('counts', counts), ('missing', missing), ('below', below),
+                                ('above', above), ('total', total)):
+                accumulated = getattr(self, name)
+                accumulated *= factor
+                accumulated += batch
+            self.weight = self.weight * factor + len(X)
+            self.rows_seen += len(X)
+        return self
+
+    def reset(self):
+        with self._lock:
+            for accumulated in (self.counts, self.missing, self.below, self.above, self.total):
+                accumulated[:] = 0
+            self.weight = 0.0
+            self.rows_seen = 0
+
+    def drift(self):
+        """pandas DataFrame of drift scores per feature for the current window"""
+        import pandas as pd
+
+        with self._lock:
+            counts, missing = self.counts.copy(), self.missing.copy()
+            below, above, total, weight = self.below.copy(), self.above.copy(), self.total.copy(), self.weight
+
+        reference = self.reference
+        n_reference = float(reference['n_rows'])
+        present = np.maximum(weight - missing, 1e-12)
+        psi = population_stability_index(reference['counts'], counts)
+        ks = ks_distance(reference['counts'], counts)
+        n_effective = n_reference * present / (n_reference + present)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_shift = np.where(reference['std'] > 0,
+                                  (total / present - reference['mean']) / reference['std'], 0.0)
+
+        status = np.select([psi > PSI_THRESHOLDS[1], psi > PSI_THRESHOLDS[0]], ['drift', 'moderate'], 'stable').astype(object)
+        if weight < MIN_ROWS:
+            status[:] = 'warming up'
+        return pd.DataFrame({
+            'psi': psi,
+            'ks': ks,
+            'ks_pvalue': kstwobign.sf(ks * np.sqrt(n_effective)),
+            'mean_shift_sd': mean_shift,
+            'out_of_range': (below + above) / np.maximum(weight, 1e-12),
+            'missing': missing / np.maximum(weight, 1e-12),
+            'status': status,
+        }, index=pd.Index(self.features, name='feature'))
+
+    def report(self):
+        """JSON-serializable drift summary, e.g. for the /drift endpoint"""
+        table = self.drift()
+        return {
+            'effective_rows': round(self.weight, 1),
+            'rows_seen': self.rows_seen,
+            'reference_rows': int(self.reference['n_rows']),
+            'drifted_features': table.index[table['status'] == 'drift'].tolist(),
+            'features': {name: {key: (value if isinstance(value, str) else round(float(value), 6))
+                                for key, value in row.items()}
+                         for name, row in table.iterrows()},
+        }
@@ -0,0 +1,204 @@
+"""
+Hybrid Decision-Rule Optimizer for ThyroNet-XAI
+Chooses the RF/DNN blend weights and the decision threshold of the hybrid
+model from out-of-fold probabilities, against a target such as
+"recall >= 0.95 at maximum precision". Only the cached probabilities are
+searched, so no model is refitted: every candidate weight is scored from one
+sorted pass (metrics_engine.SortedScores) and the weight grid is refined
+around the best point. Optionally a logistic meta-learner proposes the
+weights instead (stacking); being monotone in a linear blend, it is stored
+as ordinary hybrid weights plus a threshold. The new rule is saved as a new
+bundle version whose lineage points at the tuned bundle.
+
+Usage:
+    python scripts/cross_validation.py --oof-output oof.npz
+    python scripts/hybrid_optimizer.py --oof oof.npz --target-recall 0.95 --stacking
+"""
+
+import argparse
+import os
+
+import numpy as np
+from joblib import Memory
+from sklearn.linear_model import LogisticRegression
+
+from metrics_engine import SortedScores
+from schema import FEATURE_DTYPE
+
+OBJECTIVES = ('precision_at_recall', 'f1')
+DEFAULT_OBJECTIVE = os.environ.get("THYRONET_TUNING_OBJECTIVE", "precision_at_recall")
+DEFAULT_TARGET_RECALL = float(os.environ.get("THYRONET_TARGET_RECALL", 0.95))
+
+RF_NAME = 'Random Forest'
+DNN_NAME = 'DNN'
+
+
+def best_thresholds(y_true, scores, objective=DEFAULT_OBJECTIVE, target_recall=DEFAULT_TARGET_RECALL):
+    """Best decision threshold for every row of an (n_candidates, n_samples) score matrix
+
+    Every cut between two distinct sorted scores is evaluated at once from
+    cumulative label counts. Returns a dict of per-row arrays: 'threshold'
+    (predict positive when score > threshold), 'value' of the objective,
+    'precision', 'recall' and 'f1'.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective must be one of {OBJECTIVES}, got {objective!r}")
+    evaluation = SortedScores(y_true, scores)
+    n = evaluation.n_samples
+    sorted_scores = evaluation.sorted_scores
+
+    # Cut j predicts the sorted rows j..n-1 positive; only cuts between distinct scores are reachable
+    cuts = np.arange(n)
+    valid = np.ones(sorted_scores.shape, dtype=bool)
+    valid[:, 1:] = sorted_scores[:, 1:] != sorted_scores[:, :-1]
+
+    tp = evaluation.n_positive - evaluation.cum_positive[:, :n]
+    predicted = n - cuts
+    precision = tp / predicted
+    recall = tp / evaluation.n_positive
+    f1 = 2 * tp / (predicted + evaluation.n_positive)
+
+    if objective == 'precision_at_recall':
+        value = np.where(valid & (recall >= target_recall), precision, -np.inf)
+    else:
+        value = np.where(valid, f1, -np.inf)
+    # argmax takes the first maximum, i.e. the highest recall among equal values
+    best = np.argmax(value, axis=1)
+    rows = np.arange(len(best))
+
+    # Midway between the last negative and first positive score; below the minimum for cut 0
+    lower = sorted_scores[rows, np.maximum(best - 1, 0)]
+    upper = sorted_scores[rows, best]
+    threshold = np.where(best > 0, (lower + upper) / 2, np.nextafter(upper, -np.inf))
+
+    return {
+        'threshold': threshold,
+        'value': value[rows, best],
+        'precision': precision[rows, best],
+        'recall': recall[rows, best],
+        'f1': f1[rows, best],
+    }
+
+
+def _rule(method, rf_weight, found, index, objective, target_recall):
+    return {
+        'method': method,
+        'objective': objective,
+        'target_recall': float(target_recall),
+        'hybrid_weights': [float(rf_weight), float(1 - rf_weight)],
+        'threshold': float(found['threshold'][index]),
+        'precision': float(found['precision'][index]),
+        'recall': float(found['recall'][index]),
+        'f1': float(found['f1'][index]),
+        'value': float(found['value'][index]),
+    }
+
+
+def optimize_blend(y_true, rf_probs, dnn_probs, objective=DEFAULT_OBJECTIVE,
+                   target_recall=DEFAULT_TARGET_RECALL, n_grid=21, n_refine=3):
+    """Grid-search the RF weight w (DNN weight 1 - w) and the threshold, zooming in n_refine times"""
+    rf_probs = np.asarray(rf_probs, dtype=np.float64)
+    dnn_probs = np.asarray(dnn_probs, dtype=np.float64)
+    low, high = 0.0, 1.0
+    best = None
+
+    for _ in range(n_refine + 1):
+        weights = np.linspace(low, high, n_grid)
+        blends = weights[:, None] * rf_probs + (1 - weights[:, None]) * dnn_probs
+        found = best_thresholds(y_true, blends, objective, target_recall)
+        i = int(np.argmax(found['value']))
+        if best is None or found['value'][i] > best['value']:
+            best = _rule('grid', weights[i], found, i, objective, target_recall)
+
+        step = (high - low) / (n_grid - 1)
+        center = best['hybrid_weights'][0]
+        low, high = max(0.0, center - step), min(1.0, center + step)
+    return best
+
+
+def optimize_stacking(y_true, rf_probs, dnn_probs, objective=DEFAULT_OBJECTIVE,
+                      target_recall=DEFAULT_TARGET_RECALL):
+    """Weights from a logistic meta-learner on (rf, dnn) probabilities, then the best threshold
+
+    sigmoid(a*rf + b*dnn + c) ranks rows exactly like the blend
+    (a*rf + b*dnn) / (a + b), so the stacker is kept as hybrid weights.
+    Returns None unless both weights are non-negative (and not both zero):
+    a negative weight would take the blended score outside [0, 1].
+    """
+    meta = LogisticRegression(C=1e4).fit(np.column_stack([rf_probs, dnn_probs]), y_true)
+    a, b = meta.coef_[0]
+    if a < 0 or b < 0 or a + b <= 0:
+        return None
+    rf_weight = a / (a + b)
+    blend = rf_weight * np.asarray(rf_probs) + (1 - rf_weight) * np.asarray(dnn_probs)
+    found = best_thresholds(y_true, blend, objective, target_recall)
+    return _rule('stacking', rf_weight, found, 0, objective, target_recall)
+
+
+def optimize_hybrid(y_true, rf_probs, dnn_probs, objective=DEFAULT_OBJECTIVE,
+                    target_recall=DEFAULT_TARGET_RECALL, stacking=False):
+    """Best hybrid decision rule: the grid search, or the stacker if it scores higher"""
+    best = optimize_blend(y_true, rf_probs, dnn_probs, objective, target_recall)
+    if stacking:
+        stacked = optimize_stacking(y_true, rf_probs, dnn_probs, objective, target_recall)
+        if stacked is not None and stacked['value'] > best['value']:
+            best = stacked
+    return best
+
+
+def _out_of_fold(X, y, n_splits, k, balancing, random_state, params=None):
+    from cross_validation import cross_validate
+    from training_orchestrator import build_default_models
+
+    models = build_default_models(int(len(y) * (1 - 1 / n_splits)), params)
+    models = {name: models[name] for name in (RF_NAME, DNN_NAME)}
+    _, _, oof = cross_validate(X, y, models=models, n_splits=n_splits, k=k, balancing=balancing,
+                               random_state=random_state, cache_dir=None, return_oof=True)
+    return oof[RF_NAME], oof[DNN_NAME]
+
+
+def out_of_fold_probabilities(X, y, n_splits=3, k=10, balancing=None, random_state=42,
+                              cache_dir=None, params=None):
+    """(rf_probs, dnn_probs) out of fold for every row of X, memoized on disk in cache_dir
+
+    `params` are model hyperparameters for training_orchestrator.build_default_models.
+    """
+    from balancing import DEFAULT_BALANCING
+    from cross_validation import DEFAULT_CV_CACHE_DIR
+
+    cache_dir = DEFAULT_CV_CACHE_DIR if cache_dir is None else cache_dir
+    compute = Memory(cache_dir, verbose=0).cache(_out_of_fold) if cache_dir else _out_of_fold
+    return compute(np.ascontiguousarray(X, dtype=FEATURE_DTYPE), np.asarray(y).astype(int),
+                   n_splits, k, balancing or DEFAULT_BALANCING, random_state, params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the ThyroNet-XAI hybrid weights and threshold")
+    parser.add_argument('--oof', required=True, help=".npz written by cross_validation.py --oof-output")
+    parser.add_argument('--bundle', help="bundle directory or artifact dir (default: latest bundle)")
+    parser.add_argument('--objective', choices=OBJECTIVES, default=DEFAULT_OBJECTIVE)
+    parser.add_argument('--target-recall', type=float, default=DEFAULT_TARGET_RECALL)
+    parser.add_argument('--stacking', action='store_true', help="also try a logistic meta-learner")
+    parser.add_argument('--dry-run', action='store_true', help="print the rule without updating the bundle")
+    args = parser.parse_args()
+
+    from cross_validation import load_oof
+    from model_bundle import update_decision_rule
+
+    y, oof = load_oof(args.oof)
+    rule = optimize_hybrid(y, oof[RF_NAME], oof[DNN_NAME], args.objective, args.target_recall,
+                           args.stacking)
+
+    rf_weight, dnn_weight = rule['hybrid_weights']
+    print(f"🎯 {rule['method']}: weights RF {rf_weight:.3f} / DNN {dnn_weight:.3f}, "
+          f"threshold {rule['threshold']:.4f}")
+    print(f"   Out-of-fold precision {rule['precision']:.4f}, recall {rule['recall']:.4f}, "
+          f"F1 {rule['f1']:.4f}")
+
+    if not args.dry_run:
+        bundle_path = update_decision_rule(args.bundle, rule['threshold'], rule['hybrid_weights'], rule)
+        print(f"✅ Bundle with the new decision rule saved to {bundle_path}")
+
+
+if __name__ == "__main__":
+    main()
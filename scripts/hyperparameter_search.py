@@ -0,0 +1,281 @@
+"""
+Hyperparameter Search for ThyroNet-XAI
+Jointly tunes SelectKBest k, the Random Forest size, the DNN architecture and
+dropout, and the KNN neighbour count with successive halving. A bracket
+samples many configurations and fits them on a small stratified subset of
+the training rows. The best 1/eta are promoted to eta times the rows, and
+so on until the survivors are fitted on every training row. Hyperband runs
+several brackets, trading the number of configurations against their
+starting budget.
+
+    - preprocessing (balance -> VarianceThreshold -> SelectKBest ->
+      MinMaxScaler) depends only on (k, budget) and is memoized on disk, so
+      every configuration sharing them reuses one fitted chain
+    - the trials of a rung run in parallel worker processes
+    - every finished trial is appended to trials.jsonl in the store
+      directory; rerunning with the same data and settings skips trials
+      already stored, so an interrupted search resumes where it stopped
+    - KNN is cheap, so every candidate neighbour count is scored in each
+      trial from a single neighbour query
+
+Trials are scored by the validation ROC-AUC of the hybrid (mean of RF and
+DNN). The validation split is a fixed stratified part of the training rows,
+and the pipeline's test split is never touched. The best configuration is
+written to best_hyperparams.json for thyronet_xai_analysis.py --hyperparams.
+
+Usage:
+    python scripts/hyperparameter_search.py --workers 4 --eta 3 --brackets 2
+    python scripts/thyronet_xai_analysis.py --hyperparams ~/.cache/thyronet/search/best_hyperparams.json
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+from joblib import Memory
+from sklearn.model_selection import train_test_split
+
+from balancing import BALANCING_STRATEGIES, DEFAULT_BALANCING
+from cross_validation import prepare_fold
+from metrics_engine import SortedScores
+from schema import FEATURE_DTYPE
+from training_orchestrator import build_default_models, effective_workers, fit_and_predict, resolve_hyperparams
+
+DEFAULT_SEARCH_DIR = os.environ.get(
+    "THYRONET_SEARCH_DIR", os.path.join(os.path.expanduser("~"), ".cache", "thyronet", "search")
+)
+TRIALS_FILENAME = "trials.jsonl"
+BEST_FILENAME = "best_hyperparams.json"
+
+SEARCH_SPACE = {
+    'k': (6, 8, 10, 12, 14),
+    'rf_n_estimators': (50, 100, 200, 400),
+    'dnn_hidden_units': ((32, 16), (64, 32), (64, 32, 16), (128, 64, 32)),
+    'dnn_dropout': (0.0, 0.15, 0.3, 0.45),
+}
+KNN_NEIGHBORS = (3, 5, 7, 11, 15, 21)
+DEFAULT_ETA = 3
+DEFAULT_MIN_ROWS = 500
+VALIDATION_FRACTION = 0.2
+OBJECTIVE = 'Hybrid ROC-AUC'
+
+
+def sample_configurations(n_configs, random_state=42, space=SEARCH_SPACE):
+    """n_configs distinct configurations drawn without replacement from the grid of `space`"""
+    names = list(space)
+    grid = list(itertools.product(*(space[name] for name in names)))
+    order = np.random.RandomState(random_state).permutation(len(grid))[:n_configs]
+    return [dict(zip(names, grid[i])) for i in order]
+
+
+def stratified_order(y, random_state=42):
+    """Row order in which every prefix keeps the class ratio, so budgets give nested subsets"""
+    rng = np.random.RandomState(random_state)
+    y = np.asarray(y)
+    position = np.empty(len(y))
+    for label in np.unique(y):
+        rows = np.flatnonzero(y == label)
+        position[rng.permutation(rows)] = (np.arange(len(rows)) + rng.uniform(size=len(rows))) / len(rows)
+    return np.argsort(position, kind='mergesort')
+
+
+def bracket_schedule(max_rows, min_rows=DEFAULT_MIN_ROWS, eta=DEFAULT_ETA, n_brackets=1, n_configs=None):
+    """[(bracket, n_configs, [rows per rung])] for the n_brackets most aggressive Hyperband brackets"""
+    s_max = max(0, int(math.log(max_rows / min_rows, eta) + 1e-9))
+    schedule = []
+    for s in range(s_max, max(-1, s_max - n_brackets), -1):
+        n = n_configs or math.ceil((s_max + 1) / (s + 1) * eta ** s)
+        budgets = [int(round(max_rows * eta ** (i - s))) for i in range(s + 1)]
+        schedule.append((s_max - s, n, budgets))
+    return schedule
+
+
+def _knn_aucs(X_train, y_train, X_val, y_val):
+    """{n_neighbors: validation AUC} for every KNN_NEIGHBORS from one query of the largest k"""
+    from neighbor_index import NeighborIndex
+
+    k_max = min(max(KNN_NEIGHBORS), len(y_train))
+    labels = NeighborIndex(n_neighbors=k_max, method='kd_tree').fit(X_train, y_train).neighbor_labels(X_val)
+    candidates = [k for k in KNN_NEIGHBORS if k <= k_max]
+    scores = np.vstack([labels[:, :k].mean(axis=1) for k in candidates])
+    return dict(zip(candidates, SortedScores(y_val, scores).auc().tolist()))
+
+
+def run_trial(trial, X, y, train_order, val_idx, balancing, random_state, cache_dir, n_threads):
+    """Fit RF, DNN and KNN for one (configuration, budget) and score them on the validation rows"""
+    start = time.perf_counter()
+    prepare = Memory(cache_dir, verbose=0).cache(prepare_fold) if cache_dir else prepare_fold
+    train_idx = np.sort(train_order[:trial['budget']])
+    fold = prepare(X, y, train_idx, val_idx, trial['config']['k'], random_state, balancing)
+
+    models = build_default_models(len(fold['y_train']), trial['config'])
+    models['DNN'].verbose = 0
+    probabilities = {}
+    for name in ('Random Forest', 'DNN'):
+        _, result = fit_and_predict(name, models[name], fold['X_train'], fold['y_train'], fold['X_test'],
+                                    n_threads, fold['sample_weight'])
+        probabilities[name] = result['probabilities']
+    probabilities['Hybrid'] = (probabilities['Random Forest'] + probabilities['DNN']) / 2
+
+    aucs = SortedScores(fold['y_test'], np.vstack(list(probabilities.values()))).auc()
+    return {
+        **trial,
+        'auc': dict(zip(probabilities, aucs.tolist())),
+        'knn_auc': _knn_aucs(fold['X_train'], fold['y_train'], fold['X_test'], fold['y_test']),
+        'seconds': time.perf_counter() - start,
+        'finished_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+class TrialStore:
+    """Append-only JSON-lines store of finished trials, keyed by (data, settings, config, budget)"""
+
+    def __init__(self, directory=DEFAULT_SEARCH_DIR):
+        self.directory = directory
+        self.path = os.path.join(directory, TRIALS_FILENAME)
+        os.makedirs(directory, exist_ok=True)
+        self.trials = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    # A line cut short by an interrupted write is simply rerun
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.trials[record['key']] = record
+
+    @staticmethod
+    def key(fingerprint, config, budget):
+        return joblib.hash((fingerprint, sorted(config.items()), budget))
+
+    def get(self, key):
+        return self.trials.get(key)
+
+    def add(self, record):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+        self.trials[record['key']] = record
+
+
+def _run_rung(trials, store, args, max_workers):
+    """Run every trial of a rung not already in the store; returns the records in trial order"""
+    pending = [trial for trial in trials if store.get(trial['key']) is None]
+    if len(pending) < len(trials):
+        print(f"   ↩️  {len(trials) - len(pending)} trial(s) restored from {store.path}")
+
+    max_workers = effective_workers(max_workers, len(pending)) if pending else 1
+    n_threads = max(1, (os.cpu_count() or 1) // max_workers)
+
+    def finished(record):
+        store.add(record)
+        print(f"   {record['auc']['Hybrid']:.4f} hybrid AUC in {record['seconds']:.1f}s: {record['config']}")
+
+    if max_workers == 1:
+        for trial in pending:
+            finished(run_trial(trial, *args, n_threads))
+    else:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = [executor.submit(run_trial, trial, *args, n_threads) for trial in pending]
+            for future in as_completed(futures):
+                finished(future.result())
+    return [store.get(trial['key']) for trial in trials]
+
+
+def successive_halving(X, y, n_brackets=1, eta=DEFAULT_ETA, min_rows=DEFAULT_MIN_ROWS, n_configs=None,
+                       balancing=DEFAULT_BALANCING, max_workers=None, store_dir=DEFAULT_SEARCH_DIR,
+                       cache_preprocessing=True, random_state=42):
+    """Hyperband over SEARCH_SPACE on (X, y); returns (best hyperparameters, every final-rung record)"""
+    X = np.ascontiguousarray(X, dtype=FEATURE_DTYPE)
+    y = np.asarray(y).astype(int)
+    train_idx, val_idx = train_test_split(np.arange(len(y)), test_size=VALIDATION_FRACTION, stratify=y,
+                                          random_state=random_state)
+    train_order = train_idx[stratified_order(y[train_idx], random_state)]
+
+    store = TrialStore(store_dir)
+    cache_dir = os.path.join(store_dir, 'preprocessing') if cache_preprocessing else None
+    from dnn_training import DEFAULT_EPOCHS as DEFAULT_DNN_EPOCHS
+    fingerprint = joblib.hash((X, y, balancing, random_state, DEFAULT_DNN_EPOCHS))
+    args = (X, y, train_order, val_idx, balancing, random_state)
+
+    final = []
+    for bracket, n, budgets in bracket_schedule(len(train_idx), min_rows, eta, n_brackets, n_configs):
+        configs = sample_configurations(n, random_state + bracket)
+        print(f"\n🎰 Bracket {bracket}: {len(configs)} configurations, rows per rung {budgets}")
+        for rung, budget in enumerate(budgets):
+            trials = [{'key': TrialStore.key(fingerprint, config, budget), 'bracket': bracket, 'rung': rung,
+                       'budget': budget, 'config': config} for config in configs]
+            print(f"🔎 Rung {rung}: {len(trials)} trial(s) on {budget} rows")
+            records = _run_rung(trials, store, args + (cache_dir,), max_workers)
+
+            # Stable ranking: ties keep the sampling order, so a resumed search promotes the same trials
+            ranked = sorted(range(len(records)), key=lambda i: -records[i]['auc']['Hybrid'])
+            if rung == len(budgets) - 1:
+                final.extend(records)
+            else:
+                configs = [configs[i] for i in ranked[:max(1, len(configs) // eta)]]
+
+    best = max(final, key=lambda record: record['auc']['Hybrid'])
+    knn_auc = {int(k): auc for k, auc in best['knn_auc'].items()}
+    hyperparams = resolve_hyperparams({**best['config'], 'knn_n_neighbors': max(knn_auc, key=knn_auc.get)})
+    return hyperparams, final
+
+
+def load_hyperparams(path=None):
+    """Hyperparameters from a best_hyperparams.json (or a plain JSON dict); defaults when path is None"""
+    if not path:
+        return resolve_hyperparams()
+    with open(path) as f:
+        data = json.load(f)
+    return resolve_hyperparams(data.get('hyperparams', data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive-halving hyperparameter search for ThyroNet-XAI")
+    parser.add_argument('--brackets', type=int, default=1,
+                        help="Hyperband brackets to run, most aggressive first (1: plain successive halving)")
+    parser.add_argument('--eta', type=int, default=DEFAULT_ETA, help="keep 1/eta of the trials per rung")
+    parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS, help="training rows of the first rung")
+    parser.add_argument('--configs', type=int, help="configurations per bracket (default: Hyperband's count)")
+    parser.add_argument('--balancing', choices=BALANCING_STRATEGIES, default=DEFAULT_BALANCING)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--store-dir', default=DEFAULT_SEARCH_DIR,
+                        help="trial store and preprocessing cache (also THYRONET_SEARCH_DIR)")
+    parser.add_argument('--no-cache', action='store_true', help="do not memoize preprocessing on disk")
+    parser.add_argument('--output', help=f"best hyperparameters JSON (default: <store-dir>/{BEST_FILENAME})")
+    args = parser.parse_args()
+
+    from data_loader import load_arrays
+
+    X, y, _ = load_arrays()
+    # Search on the pipeline's training split only; its test split stays unseen
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+    print(f"🔍 Hyperparameter search on {len(y_train)} training rows (eta={args.eta}, "
+          f"{args.brackets} bracket(s))")
+
+    hyperparams, final = successive_halving(X_train, y_train, args.brackets, args.eta, args.min_rows,
+                                            args.configs, args.balancing, args.workers, args.store_dir,
+                                            not args.no_cache)
+    best = max(final, key=lambda record: record['auc']['Hybrid'])
+
+    output = args.output or os.path.join(args.store_dir, BEST_FILENAME)
+    with open(output, 'w') as f:
+        json.dump({'hyperparams': hyperparams, 'objective': OBJECTIVE, 'validation_auc': best['auc'],
+                   'knn_auc': best['knn_auc']}, f, indent=2)
+
+    print(f"\n🏆 Best configuration ({OBJECTIVE} {best['auc']['Hybrid']:.4f}):")
+    for name, value in hyperparams.items():
+        print(f"   {name}: {value}")
+    print(f"✅ Written to {output}; use it with thyronet_xai_analysis.py --hyperparams {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Incremental Retraining for ThyroNet-XAI
+Updates the latest model bundle with a batch of newly labelled panels
+instead of retraining on the whole history:
+
+    - MinMaxScaler ranges grow with partial_fit; the existing trees, the
+      DNN's first layer, the SHAP background and the neighbour index are
+      re-expressed exactly in the updated scaling
+    - the Random Forest grows new trees on the new rows plus a replay
+      sample (warm start) and evicts its oldest trees beyond max_trees
+    - the DNN is fine-tuned from its saved weights for a few epochs on the
+      same new + replayed rows, through the dnn_training engine (stratified
+      validation with early stopping, batch-size resolution) at a tenth of
+      the usual learning rate
+    - per-class running moments keep the variance filter and ANOVA F
+      ranking current; a changed top-k selection is reported, since it
+      needs a full retrain
+
+Work is proportional to the new rows plus the fixed-size replay sample,
+with one exception: the registry neighbour index. New rows are added to it
+without refitting, but when the scaler ranges grow every indexed row is
+moved into the new scaling - a vectorized O(history) pass, plus a kd-tree
+rebuild (O(n log n); IVF indexes keep their cells). The update reports
+whether that happened and how long the index took.
+
+Usage:
+    python scripts/incremental_training.py new_panels.csv --new-trees 20 --epochs 5
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from balancing import DEFAULT_BALANCING, balance
+from data_loader import clean_dataframe
+from dnn_training import train_dnn
+from drift_monitor import update_reference
+from model_bundle import load_bundle, save_bundle
+from schema import FEATURE_DTYPE, LABEL_DTYPE, TARGET_COLUMN, apply_schema
+
+DEFAULT_REPLAY_SIZE = int(os.environ.get("THYRONET_REPLAY_SIZE", 5000))
+DEFAULT_MAX_TREES = int(os.environ.get("THYRONET_MAX_TREES", 100))
+FINE_TUNE_LEARNING_RATE_SCALE = 0.1
+
+
+class RunningStats:
+    """Per-class count, sum and sum of squares of every raw feature, plus min/max"""
+
+    def __init__(self, count, total, total_sq, minimum, maximum):
+        self.count = np.asarray(count, dtype=np.float64)
+        self.total = np.asarray(total, dtype=np.float64)
+        self.total_sq = np.asarray(total_sq, dtype=np.float64)
+        self.minimum = np.asarray(minimum, dtype=np.float64)
+        self.maximum = np.asarray(maximum, dtype=np.float64)
+
+    @classmethod
+    def from_data(cls, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        n_features = X.shape[1]
+        stats = cls(np.zeros(2), np.zeros((2, n_features)), np.zeros((2, n_features)),
+                    np.full(n_features, np.inf), np.full(n_features, -np.inf))
+        return stats.update(X, y)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['count'], data['total'], data['total_sq'], data['minimum'], data['maximum'])
+
+    def to_dict(self):
+        return {'count': self.count, 'total': self.total, 'total_sq': self.total_sq,
+                'minimum': self.minimum, 'maximum': self.maximum}
+
+    def update(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        for label in (0, 1):
+            rows = X[y == label]
+            self.count[label] += len(rows)
+            self.total[label] += rows.sum(axis=0)
+            self.total_sq[label] += (rows ** 2).sum(axis=0)
+        if len(X):
+            self.minimum = np.minimum(self.minimum, X.min(axis=0))
+            self.maximum = np.maximum(self.maximum, X.max(axis=0))
+        return self
+
+    def variances(self):
+        """Population variance of each feature over all rows, as VarianceThreshold computes it"""
+        n = self.count.sum()
+        mean = self.total.sum(axis=0) / n
+        return self.total_sq.sum(axis=0) / n - mean ** 2
+
+    def anova_f(self):
+        """One-way ANOVA F per feature with both classes weighted equally, as after balancing"""
+        n_per_class = self.count.max()
+        means = self.total / self.count[:, None]
+        within = (self.total_sq / self.count[:, None] - means ** 2) * n_per_class
+        grand_mean = means.mean(axis=0)
+        between = n_per_class * ((means - grand_mean) ** 2).sum(axis=0)
+        df_within = 2 * n_per_class - 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return between / (within.sum(axis=0) / df_within)
+
+
+def replay_sample(X, y, capacity=DEFAULT_REPLAY_SIZE, seen=None, random_state=42):
+    """Class-stratified uniform sample of the rows seen so far, capped at capacity
+
+    `seen` gives how many rows of each class X/y already stand for (for a
+    replay buffer merged with new rows, buffer rows stand for all history).
+    """
+    rng = np.random.RandomState(random_state)
+    X = np.asarray(X, dtype=FEATURE_DTYPE)
+    y = np.asarray(y).astype(LABEL_DTYPE)
+    seen = np.bincount(y, minlength=2) if seen is None else np.asarray(seen)
+    keep = []
+    for label in (0, 1):
+        rows = np.flatnonzero(y == label)
+        n_keep = min(len(rows), capacity // 2)
+        keep.append(rng.choice(rows, n_keep, replace=False))
+    keep = np.sort(np.concatenate(keep))
+    return {'X': X[keep], 'y': y[keep], 'seen': seen}
+
+
+def _merge_replay(replay, X_new, y_new, capacity, random_state):
+    """Fold new rows into the replay buffer so every row seen so far is equally likely to stay"""
+    rng = np.random.RandomState(random_state)
+    new_seen = np.bincount(y_new, minlength=2)
+    seen = replay['seen'] + new_seen
+    X_parts, y_parts = [], []
+    for label in (0, 1):
+        old_rows = np.flatnonzero(replay['y'] == label)
+        new_rows = np.flatnonzero(y_new == label)
+        quota = min(capacity // 2, len(old_rows) + len(new_rows))
+        n_new = min(len(new_rows), int(round(quota * new_seen[label] / max(seen[label], 1))))
+        n_old = min(len(old_rows), quota - n_new)
+        old_keep = rng.choice(old_rows, n_old, replace=False)
+        new_keep = rng.choice(new_rows, n_new, replace=False)
+        X_parts += [replay['X'][old_keep], X_new[new_keep]]
+        y_parts += [replay['y'][old_keep], y_new[new_keep]]
+    return {'X': np.concatenate(X_parts), 'y': np.concatenate(y_parts), 'seen': seen}
+
+
+def _rescale_map(old_scale, old_offset, new_scale, new_offset):
+    """(a, b) such that new_scaled = a * old_scaled + b, feature-wise"""
+    a = new_scale / old_scale
+    return a, new_offset - a * old_offset
+
+
+def rescale_forest(rf, a, b):
+    """Move every split threshold of a fitted forest into the new scaled space, in place"""
+    for tree in rf.estimators_:
+        nodes = tree.tree_
+        split = nodes.feature >= 0
+        features = nodes.feature[split]
+        nodes.threshold[split] = a[features] * nodes.threshold[split] + b[features]
+
+
+def rescale_dnn(dnn, a, b):
+    """Fold the inverse rescaling into the DNN's first Dense layer, in place"""
+    first = next(layer for layer in dnn.layers if layer.get_weights())
+    kernel, bias = first.get_weights()
+    # x_old = (x_new - b) / a, so W^T x_old + c = (W / a)^T x_new + (c - (b / a) @ W)
+    first.set_weights([kernel / a[:, None], bias - (b / a) @ kernel])
+
+
+def update_bundle(bundle, X_new, y_new, new_trees=20, max_trees=DEFAULT_MAX_TREES, epochs=5,
+                  replay_size=None, replay_capacity=DEFAULT_REPLAY_SIZE, balancing=DEFAULT_BALANCING,
+                  random_state=42, artifact_dir=None):
+    """Update `bundle` with newly labelled raw rows and save the result as a new bundle"""
+    if bundle.running_stats is None or bundle.replay is None:
+        raise ValueError(f"Bundle {bundle.version} predates incremental training; "
+                         "run thyronet_xai_analysis.py once to create a full bundle")
+    start = time.perf_counter()
+    X_new = np.asarray(X_new, dtype=FEATURE_DTYPE)
+    y_new = np.asarray(y_new).astype(LABEL_DTYPE)
+
+    var_thresh, selector, scaler = bundle.var_thresh, bundle.selector, bundle.scaler
+    columns = np.flatnonzero(var_thresh.get_support())[selector.get_support()]
+
+    # 1. Running statistics -> variance filter and ANOVA ranking
+    stats = RunningStats.from_dict(bundle.running_stats).update(X_new, y_new)
+    f_scores = np.where(stats.variances() > var_thresh.threshold, stats.anova_f(), -np.inf)
+    ranked = np.sort(np.argsort(-np.nan_to_num(f_scores, nan=-np.inf), kind='stable')[:len(columns)])
+    if not np.array_equal(ranked, np.sort(columns)):
+        changed = sorted(set(np.array(bundle.feature_names)[ranked]) ^ set(bundle.selected_features))
+        print(f"⚠️  Feature ranking changed ({', '.join(changed)}); keeping the current selection - "
+              "run a full retrain to adopt it")
+
+    # 2. Scaler ranges grow with the new rows; existing models move into the new space exactly
+    old_scale, old_offset = scaler.scale_.copy(), scaler.min_.copy()
+    scaler.partial_fit(X_new[:, columns])
+    a, b = _rescale_map(old_scale, old_offset, scaler.scale_, scaler.min_)
+
+    rf, dnn = bundle.rf, bundle.dnn
+    rescale_forest(rf, a, b)
+    rescale_dnn(dnn, a, b)
+    background = None if bundle.background is None else bundle.background * a + b
+
+    # 3. Delta training set: new rows plus a replay sample of earlier ones
+    replay = bundle.replay
+    rng = np.random.RandomState(random_state)
+    n_replay = min(len(replay['y']), replay_size or max(len(y_new), 1000))
+    replayed = rng.choice(len(replay['y']), n_replay, replace=False)
+    X_delta = np.concatenate([X_new, replay['X'][replayed]])
+    y_delta = np.concatenate([y_new, replay['y'][replayed]])
+    X_delta_scaled = scaler.transform(X_delta[:, columns]).astype(FEATURE_DTYPE)
+    X_train, y_train, sample_weight = balance(X_delta_scaled, y_delta, balancing,
+                                              random_state=random_state)
+
+    # 4. Random Forest: grow new trees, evict the oldest
+    n_before = len(rf.estimators_)
+    # Reseed per update: warm start derives tree seeds from their position, which eviction reuses
+    rf.set_params(warm_start=True, n_estimators=n_before + new_trees,
+                  random_state=int(stats.count.sum()) % (2 ** 31))
+    rf.fit(X_train, y_train, sample_weight=sample_weight)
+    evicted = max(0, len(rf.estimators_) - max_trees)
+    if evicted:
+        rf.estimators_ = rf.estimators_[evicted:]
+    rf.set_params(warm_start=False, n_estimators=len(rf.estimators_))
+
+    # 5. DNN: a few low-learning-rate epochs from the saved weights
+    train_dnn(X_train, y_train, sample_weight=sample_weight, epochs=epochs, random_state=random_state,
+              dnn=dnn, learning_rate_scale=FINE_TUNE_LEARNING_RATE_SCALE)
+
+    # 6. Registry index: rescaled (O(history)) only if the ranges grew, then the new rows are added
+    neighbor_index = bundle.neighbor_index
+    index_rescaled, index_start = False, time.perf_counter()
+    if neighbor_index is not None:
+        index_rescaled = not (np.all(a == 1) and np.all(b == 0))
+        neighbor_index.rescale(a, b).add(scaler.transform(X_new[:, columns]), y_new)
+    index_seconds = time.perf_counter() - index_start
+
+    lineage = {
+        'parent': bundle.version,
+        'rows_added': int(len(y_new)),
+        'rows_replayed': int(n_replay),
+        'trees_added': int(new_trees),
+        'trees_evicted': int(evicted),
+        'dnn_epochs': int(epochs),
+        'index_rescaled': index_rescaled,
+        'index_seconds': round(index_seconds, 3),
+        'update_seconds': round(time.perf_counter() - start, 3),
+    }
+    bundle_path = save_bundle(
+        var_thresh, selector, scaler, rf, dnn,
+        feature_names=bundle.feature_names,
+        selected_features=bundle.selected_features,
+        threshold=bundle.threshold,
+        hybrid_weights=bundle.hybrid_weights,
+        metrics=bundle.manifest.get('metrics'),
+        neighbor_index=neighbor_index,
+        background=background,
+        tuning=bundle.manifest.get('tuning'),
+        running_stats=stats.to_dict(),
+        replay=_merge_replay(replay, X_new, y_new, replay_capacity, random_state),
+        lineage=lineage,
+        drift_reference=None if bundle.drift_reference is None else update_reference(
+            bundle.drift_reference, X_new[:, columns]),
+        **({'artifact_dir': artifact_dir} if artifact_dir else {})
+    )
+    return bundle_path, lineage
+
+
+def read_labelled_panels(path, delimiter=';'):
+    """Read new labelled rows as (X, y), validated against the schema"""
+    df = apply_schema(clean_dataframe(pd.read_csv(path, delimiter=delimiter)))
+    if TARGET_COLUMN not in df.columns:
+        raise ValueError(f"{path} has no {TARGET_COLUMN} column")
+    return df.drop(columns=TARGET_COLUMN), df[TARGET_COLUMN].to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the latest ThyroNet-XAI bundle with new labelled data")
+    parser.add_argument('input', help="CSV of new labelled panels (annthyroid columns + Outlier_label)")
+    parser.add_argument('--bundle', help="bundle directory or artifact dir (default: latest bundle)")
+    parser.add_argument('--delimiter', default=';')
+    parser.add_argument('--new-trees', type=int, default=20)
+    parser.add_argument('--max-trees', type=int, default=DEFAULT_MAX_TREES)
+    parser.add_argument('--epochs', type=int, default=5, help="DNN fine-tuning epochs")
+    parser.add_argument('--replay-size', type=int, help="earlier rows replayed (default: max(new rows, 1000))")
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle)
+    X_new, y_new = read_labelled_panels(args.input, args.delimiter)
+    if list(X_new.columns) != bundle.feature_names:
+        X_new = X_new[bundle.feature_names]
+    print(f"🔁 Updating {bundle.version} with {len(y_new)} new rows ({int(y_new.sum())} anomalies)")
+
+    bundle_path, lineage = update_bundle(bundle, X_new.to_numpy(), y_new, new_trees=args.new_trees,
+                                         max_trees=args.max_trees, epochs=args.epochs,
+                                         replay_size=args.replay_size,
+                                         artifact_dir=os.path.dirname(bundle.path))
+    print(f"✅ Updated bundle saved to {bundle_path} in {lineage['update_seconds']:.1f}s "
+          f"(+{lineage['trees_added']} trees, -{lineage['trees_evicted']} evicted)")
+    if bundle.neighbor_index is not None:
+        action = ("rescaled all rows to the grown feature ranges" if lineage['index_rescaled']
+                  else "added the new rows")
+        print(f"🔎 Registry index: {action} in {lineage['index_seconds']:.2f}s "
+              f"({bundle.neighbor_index.n_samples_} rows indexed)")
+
+
+if __name__ == "__main__":
+    main()
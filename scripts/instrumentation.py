@@ -0,0 +1,230 @@
+"""
+Stage Instrumentation for ThyroNet-XAI
+Runs pipeline stages as plain functions over a shared run state and records,
+per stage, wall time, CPU time (this process and any worker processes it
+reaped), peak RSS sampled while the stage runs and the shape/size of every
+array the stage produces. A run report is written as JSON (full detail) and
+CSV (one row per stage) for comparing runs and sizing hardware. Any stage
+can be profiled with cProfile (.prof for pstats/snakeviz) or, when it is
+installed, py-spy (speedscope JSON).
+"""
+
+import cProfile
+import csv
+import inspect
+import json
+import os
+import platform
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+PROFILERS = ('cprofile', 'py-spy')
+RSS_SAMPLE_INTERVAL = 0.02
+CSV_FIELDS = ['stage', 'wall_seconds', 'cpu_seconds', 'worker_cpu_seconds', 'peak_rss_mb',
+              'rss_delta_mb', 'output_mb', 'profile']
+
+
+def _rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # No procfs: fall back to the lifetime high-water mark (KB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def git_commit():
+    """Commit hash of the working tree, or None outside a git checkout"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def describe_arrays(outputs):
+    """{name: {'type', 'shape', 'bytes'}} for every ndarray/DataFrame/Series in a stage's outputs"""
+    arrays = {}
+    for name, value in outputs.items():
+        if isinstance(value, np.ndarray):
+            nbytes = value.nbytes
+        elif hasattr(value, 'memory_usage') and hasattr(value, 'shape'):
+            nbytes = int(np.sum(value.memory_usage(deep=True)))
+        else:
+            continue
+        arrays[name] = {
+            'type': str(value.dtype) if isinstance(value, np.ndarray) else type(value).__name__,
+            'shape': list(value.shape),
+            'bytes': int(nbytes),
+        }
+    return arrays
+
+
+class _PeakRSS:
+    """Samples RSS in a background thread for the duration of a with-block"""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+
+    def __enter__(self):
+        self.start = self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end = _rss_bytes()
+        self.peak = max(self.peak, self.end)
+
+
+class _StageProfiler:
+    """cProfile or py-spy around one stage; a no-op when path is None"""
+
+    def __init__(self, profiler, path):
+        self.profiler = profiler
+        self.path = path
+
+    def __enter__(self):
+        if self.path is None:
+            return self
+        if self.profiler == 'py-spy':
+            self._process = subprocess.Popen(
+                ['py-spy', 'record', '--pid', str(os.getpid()), '--format', 'speedscope',
+                 '--output', self.path, '--subprocesses'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            time.sleep(0.2)  # let py-spy attach before the stage starts
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.path is None:
+            return
+        if self.profiler == 'py-spy':
+            self._process.send_signal(signal.SIGINT)
+            self._process.wait(timeout=60)
+        else:
+            self._profile.disable()
+            self._profile.dump_stats(self.path)
+
+
+class PipelineRun:
+    """Executes instrumented stages over a shared state dict
+
+    A stage is a function whose parameters are looked up in the state by
+    name and which returns a dict of new state entries (or None).
+    `profile` names the stages to profile ('all' for every stage).
+    """
+
+    def __init__(self, name='thyronet', profile=(), profiler='cprofile', profile_dir='.', state=None):
+        if profiler not in PROFILERS:
+            raise ValueError(f"profiler must be one of {PROFILERS}, got {profiler!r}")
+        if profiler == 'py-spy' and profile and shutil.which('py-spy') is None:
+            print("⚠️  py-spy not found on PATH; profiling with cProfile instead")
+            profiler = 'cprofile'
+        self.name = name
+        self.profile = set(profile or ())
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.state = dict(state or {})
+        self.records = []
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        self.run_id = time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+        self._start = time.perf_counter()
+
+    def _profile_path(self, stage):
+        if not ({'all', stage} & self.profile):
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        extension = 'speedscope.json' if self.profiler == 'py-spy' else 'prof'
+        return os.path.join(self.profile_dir, f"{self.run_id}-{stage}.{extension}")
+
+    def stage(self, func, name=None):
+        """Run one stage, merge its outputs into the state and record its cost; returns the outputs"""
+        name = name or func.__name__
+        parameters = inspect.signature(func).parameters.values()
+        missing = [p.name for p in parameters if p.name not in self.state and p.default is p.empty]
+        if missing:
+            raise KeyError(f"Stage {name} needs {missing}, which no earlier stage produced")
+        kwargs = {p.name: self.state[p.name] for p in parameters if p.name in self.state}
+
+        profile_path = self._profile_path(name)
+        times_before = os.times()
+        wall_start = time.perf_counter()
+        with _PeakRSS() as rss, _StageProfiler(self.profiler, profile_path):
+            outputs = func(**kwargs) or {}
+        wall = time.perf_counter() - wall_start
+        times_after = os.times()
+
+        self.state.update(outputs)
+        arrays = describe_arrays(outputs)
+        self.records.append({
+            'stage': name,
+            'wall_seconds': wall,
+            'cpu_seconds': (times_after.user + times_after.system) - (times_before.user + times_before.system),
+            'worker_cpu_seconds': ((times_after.children_user + times_after.children_system)
+                                   - (times_before.children_user + times_before.children_system)),
+            'peak_rss_mb': rss.peak / 1024 ** 2,
+            'rss_delta_mb': (rss.end - rss.start) / 1024 ** 2,
+            'output_mb': sum(a['bytes'] for a in arrays.values()) / 1024 ** 2,
+            'arrays': arrays,
+            'profile': profile_path,
+        })
+        return outputs
+
+    def record(self, name, wall_seconds, **details):
+        """Add a timing measured elsewhere, e.g. a model fitted inside a worker process"""
+        self.records.append({'stage': name, 'wall_seconds': float(wall_seconds), **details})
+
+    def summary(self):
+        """pandas DataFrame with one row per stage and the CSV columns"""
+        import pandas as pd
+        return pd.DataFrame([{field: record.get(field) for field in CSV_FIELDS[:-1]}
+                             for record in self.records]).set_index('stage')
+
+    def report(self):
+        return {
+            'name': self.name,
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'total_wall_seconds': time.perf_counter() - self._start,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'worker_peak_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+            'git_commit': git_commit(),
+            'host': platform.node(),
+            'platform': platform.platform(),
+            'python': sys.version.split()[0],
+            'cpu_count': os.cpu_count(),
+            'argv': sys.argv,
+            'stages': self.records,
+        }
+
+    def write_report(self, directory):
+        """Write <name>-<run_id>.json and .csv to directory; returns both paths"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{self.name}-{self.run_id}")
+        with open(f"{base}.json", 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        with open(f"{base}.csv", 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.records)
+        return f"{base}.json", f"{base}.csv"
@@ -0,0 +1,217 @@
+"""
+Single-Pass Evaluation Metrics for ThyroNet-XAI
+Sorts each model's probability vector once and derives ROC-AUC, ROC/PR
+curves and confusion-matrix metrics at any set of thresholds from cumulative
+label counts. All models (or CV folds) are evaluated together as rows of one
+score matrix, and bootstrap confidence intervals reuse the same sort order
+through resampling weights instead of re-sorting.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+BOOTSTRAP_MEMORY_MB = int(os.environ.get("THYRONET_BOOTSTRAP_MEMORY_MB", 256))
+BOOTSTRAP_BYTES_PER_VALUE = 40
+METRIC_NAMES = ['Accuracy', 'Precision', 'Recall', 'F1-Score', 'ROC-AUC']
+
+
+def _safe_divide(numerator, denominator):
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+class SortedScores:
+    """Scores of one or more models against shared binary labels, sorted once
+
+    `scores` is an (n_samples,) vector or an (n_models, n_samples) matrix.
+    Predictions at threshold t are `score > t`, as in the training script.
+    """
+
+    def __init__(self, y_true, scores):
+        y_true = np.asarray(y_true).astype(np.int8)
+        scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+        self.n_models, self.n_samples = scores.shape
+
+        self.order = np.argsort(scores, axis=1, kind='mergesort')
+        self.sorted_scores = np.take_along_axis(scores, self.order, axis=1)
+        self.sorted_labels = y_true[self.order]
+        self.n_positive = int(y_true.sum())
+        self.n_negative = self.n_samples - self.n_positive
+
+        # Positives among the first i rows in ascending score order, with a leading 0
+        self.cum_positive = np.zeros((self.n_models, self.n_samples + 1), dtype=np.int64)
+        np.cumsum(self.sorted_labels, axis=1, out=self.cum_positive[:, 1:])
+
+        # First and last sorted position of each element's tie group
+        positions = np.broadcast_to(np.arange(self.n_samples), scores.shape)
+        new_group = np.ones(scores.shape, dtype=bool)
+        new_group[:, 1:] = self.sorted_scores[:, 1:] != self.sorted_scores[:, :-1]
+        last_of_group = np.ones(scores.shape, dtype=bool)
+        last_of_group[:, :-1] = new_group[:, 1:]
+        self.group_start = np.maximum.accumulate(np.where(new_group, positions, 0), axis=1)
+        self.group_end = np.minimum.accumulate(
+            np.where(last_of_group, positions, self.n_samples)[:, ::-1], axis=1)[:, ::-1]
+
+    def auc(self):
+        """Tie-aware ROC-AUC per model (Mann-Whitney U on average ranks)"""
+        average_rank = (self.group_start + self.group_end) / 2 + 1
+        positive_rank_sum = (average_rank * self.sorted_labels).sum(axis=1)
+        u_statistic = positive_rank_sum - self.n_positive * (self.n_positive + 1) / 2
+        return u_statistic / (self.n_positive * self.n_negative)
+
+    def _count_above(self, thresholds):
+        """Number of rows scoring strictly above each threshold, shape (n_models, n_thresholds)"""
+        thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+        return np.stack([
+            self.n_samples - np.searchsorted(row, thresholds, side='right')
+            for row in self.sorted_scores
+        ])
+
+    def confusion(self, thresholds=0.5):
+        """Confusion counts tp/fp/tn/fn at each threshold, each shaped (n_models, n_thresholds)"""
+        above = self._count_above(thresholds)
+        below = self.n_samples - above
+        tp = self.n_positive - np.take_along_axis(self.cum_positive, below, axis=1)
+        fp = above - tp
+        return {'tp': tp, 'fp': fp, 'tn': self.n_negative - fp, 'fn': self.n_positive - tp}
+
+    def confusion_matrix(self, model=0, threshold=0.5):
+        """sklearn-layout [[tn, fp], [fn, tp]] for one model"""
+        counts = self.confusion(threshold)
+        return np.array([[counts['tn'][model, 0], counts['fp'][model, 0]],
+                         [counts['fn'][model, 0], counts['tp'][model, 0]]])
+
+    def metrics(self, thresholds=0.5):
+        """Accuracy/Precision/Recall/F1-Score at each threshold, plus ROC-AUC per model"""
+        counts = self.confusion(thresholds)
+        tp, fp, tn, fn = counts['tp'], counts['fp'], counts['tn'], counts['fn']
+        precision = _safe_divide(tp, tp + fp)
+        recall = _safe_divide(tp, tp + fn)
+        return {
+            'Accuracy': (tp + tn) / self.n_samples,
+            'Precision': precision,
+            'Recall': recall,
+            'F1-Score': _safe_divide(2 * precision * recall, precision + recall),
+            'ROC-AUC': self.auc(),
+        }
+
+    def _curve_points(self, model):
+        # One point per distinct score t (predicting score >= t), from high to low
+        scores = self.sorted_scores[model]
+        first = np.flatnonzero(np.r_[True, scores[1:] != scores[:-1]])[::-1]
+        tps = self.n_positive - self.cum_positive[model, first]
+        fps = (self.n_samples - first) - tps
+        return tps, fps, scores[first]
+
+    def roc_curve(self, model=0):
+        """(fpr, tpr, thresholds) for one model, starting at (0, 0)"""
+        tps, fps, thresholds = self._curve_points(model)
+        tps = np.r_[0, tps]
+        fps = np.r_[0, fps]
+        return fps / self.n_negative, tps / self.n_positive, np.r_[np.inf, thresholds]
+
+    def pr_curve(self, model=0):
+        """(precision, recall, thresholds) for one model, ordered by decreasing threshold"""
+        tps, fps, thresholds = self._curve_points(model)
+        return tps / (tps + fps), tps / self.n_positive, thresholds
+
+    def bootstrap(self, n_boot=1000, threshold=0.5, alpha=0.05, random_state=42, chunk_size=None):
+        """Percentile confidence intervals {metric: (low, high)} per model
+
+        Each bootstrap replicate is a vector of resampling counts applied to
+        the existing sort order, so no replicate is ever re-sorted.
+        Replicates are processed in chunks sized to stay within
+        BOOTSTRAP_MEMORY_MB (see bootstrap_chunk_size) unless chunk_size is given.
+        """
+        rng = np.random.RandomState(random_state)
+        below = self.n_samples - self._count_above(threshold)[:, 0]
+        chunk_size = chunk_size or bootstrap_chunk_size(self.n_models, self.n_samples)
+        samples = {name: [] for name in METRIC_NAMES}
+
+        for start in range(0, n_boot, chunk_size):
+            n_chunk = min(chunk_size, n_boot - start)
+            counts = np.empty((n_chunk, self.n_samples), dtype=np.int32)
+            for b in range(n_chunk):
+                counts[b] = np.bincount(rng.randint(0, self.n_samples, self.n_samples), minlength=self.n_samples)
+
+            # weights[b, m, i]: copies of the i-th sorted row of model m in replicate b
+            weights = counts[:, self.order]
+            del counts
+            w_pos = weights * self.sorted_labels
+            shape = weights.shape[:2] + (self.n_samples + 1,)
+            cum_pos = np.zeros(shape)
+            np.cumsum(w_pos, axis=2, out=cum_pos[..., 1:])
+            cum_neg = np.zeros(shape)
+            np.cumsum(weights, axis=2, out=cum_neg[..., 1:])
+            del weights
+            cum_neg -= cum_pos
+            total_pos, total_neg = cum_pos[..., -1], cum_neg[..., -1]
+
+            cut = np.broadcast_to(below[None, :, None], shape[:2] + (1,))
+            tp = total_pos - np.take_along_axis(cum_pos, cut, axis=2)[..., 0]
+            fp = total_neg - np.take_along_axis(cum_neg, cut, axis=2)[..., 0]
+            del cum_pos
+
+            # Negatives ranked below each row plus half of those tied with it
+            index_shape = w_pos.shape
+            neg_tied = np.take_along_axis(cum_neg, np.broadcast_to(self.group_end + 1, index_shape), axis=2)
+            neg_below = np.take_along_axis(cum_neg, np.broadcast_to(self.group_start, index_shape), axis=2)
+            del cum_neg
+            neg_tied += neg_below
+            neg_tied *= 0.5
+            del neg_below
+            neg_tied *= w_pos
+            auc = _safe_divide(neg_tied.sum(axis=2), total_pos * total_neg)
+            del neg_tied, w_pos
+
+            tn, fn = total_neg - fp, total_pos - tp
+            precision = _safe_divide(tp, tp + fp)
+            recall = _safe_divide(tp, tp + fn)
+
+            samples['Accuracy'].append((tp + tn) / self.n_samples)
+            samples['Precision'].append(precision)
+            samples['Recall'].append(recall)
+            samples['F1-Score'].append(_safe_divide(2 * precision * recall, precision + recall))
+            samples['ROC-AUC'].append(auc)
+
+        intervals = {}
+        for name, chunks in samples.items():
+            values = np.concatenate(chunks)
+            intervals[name] = (np.percentile(values, 100 * alpha / 2, axis=0),
+                               np.percentile(values, 100 * (1 - alpha / 2), axis=0))
+        return intervals
+
+
+def bootstrap_chunk_size(n_models, n_samples, budget_mb=None):
+    """Bootstrap replicates per chunk that keep the per-chunk arrays within budget_mb
+
+    A chunk holds about BOOTSTRAP_BYTES_PER_VALUE bytes per (replicate,
+    model, row): int32 weights plus a few float64 cumulative sums.
+    """
+    budget = (BOOTSTRAP_MEMORY_MB if budget_mb is None else budget_mb) * 2 ** 20
+    return max(1, int(budget // (BOOTSTRAP_BYTES_PER_VALUE * n_models * n_samples)))
+
+
+def evaluate_models(y_true, model_scores, threshold=0.5):
+    """performance_df-style DataFrame for {model_name: probabilities}, plus the SortedScores used"""
+    names = list(model_scores)
+    evaluation = SortedScores(y_true, np.vstack([model_scores[name] for name in names]))
+    metrics = evaluation.metrics(threshold)
+    performance_df = pd.DataFrame({
+        'Model': names,
+        **{name: (values[:, 0] if values.ndim == 2 else values) for name, values in metrics.items()}
+    })
+    return performance_df, evaluation
+
+
+def confidence_interval_frame(names, intervals):
+    """Tabulate bootstrap intervals as 'low - high' strings per model and metric"""
+    return pd.DataFrame({
+        metric: [f"{low:.4f} - {high:.4f}" for low, high in zip(*intervals[metric])]
+        for metric in METRIC_NAMES
+    }, index=pd.Index(names, name='Model'))
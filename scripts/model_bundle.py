@@ -0,0 +1,292 @@
+"""
+Versioned Model Artifacts for ThyroNet-XAI
+Persists the fitted preprocessing chain, Random Forest, DNN weights, selected
+features and decision thresholds as a single bundle directory.
+"""
+
+import itertools
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+
+BUNDLE_FORMAT_VERSION = 1
+
+DEFAULT_ARTIFACT_DIR = os.environ.get(
+    "THYRONET_ARTIFACT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "artifacts"),
+)
+
+MANIFEST_FILENAME = "manifest.json"
+PREPROCESSING_FILENAME = "preprocessing.joblib"
+RF_FILENAME = "random_forest.joblib"
+DNN_FILENAME = "dnn.keras"
+DNN_EXPORT_FILENAME = "dnn.npz"
+NEIGHBOR_INDEX_FILENAME = "neighbor_index.joblib"
+BACKGROUND_FILENAME = "background.npy"
+RUNNING_STATS_FILENAME = "running_stats.npz"
+REPLAY_FILENAME = "replay.npz"
+DRIFT_REFERENCE_FILENAME = "drift_reference.npz"
+LATEST_FILENAME = "LATEST"
+
+
+class ModelBundle:
+    """Fitted ThyroNet-XAI models loaded from a bundle directory
+
+    The preprocessing chain and Random Forest are loaded on first use and the
+    DNN (and therefore TensorFlow) only when its output is actually requested.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self._preprocessing = None
+        self._rf = None
+        self._dnn = None
+        self._numpy_dnn = None
+        self._neighbor_index = None
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def feature_names(self):
+        return self.manifest['feature_names']
+
+    @property
+    def selected_features(self):
+        return self.manifest['selected_features']
+
+    @property
+    def threshold(self):
+        return self.manifest['threshold']
+
+    @property
+    def hybrid_weights(self):
+        return self.manifest['hybrid_weights']
+
+    def _load_preprocessing(self):
+        if self._preprocessing is None:
+            self._preprocessing = joblib.load(os.path.join(self.path, PREPROCESSING_FILENAME))
+        return self._preprocessing
+
+    @property
+    def var_thresh(self):
+        return self._load_preprocessing()['var_thresh']
+
+    @property
+    def selector(self):
+        return self._load_preprocessing()['selector']
+
+    @property
+    def scaler(self):
+        return self._load_preprocessing()['scaler']
+
+    @property
+    def rf(self):
+        if self._rf is None:
+            self._rf = joblib.load(os.path.join(self.path, RF_FILENAME))
+        return self._rf
+
+    @property
+    def dnn(self):
+        if self._dnn is None:
+            from tensorflow.keras.models import load_model
+            self._dnn = load_model(os.path.join(self.path, DNN_FILENAME), compile=False)
+        return self._dnn
+
+    @property
+    def numpy_dnn(self):
+        """TensorFlow-free NumpyDNN export of the DNN, or None for bundles saved without one"""
+        path = os.path.join(self.path, DNN_EXPORT_FILENAME)
+        if self._numpy_dnn is None and os.path.exists(path):
+            from numpy_dnn import NumpyDNN
+            self._numpy_dnn = NumpyDNN.load(path)
+        return self._numpy_dnn
+
+    @property
+    def neighbor_index(self):
+        """Registry NeighborIndex over the scaled training rows, or None if not bundled"""
+        path = os.path.join(self.path, NEIGHBOR_INDEX_FILENAME)
+        if self._neighbor_index is None and os.path.exists(path):
+            self._neighbor_index = joblib.load(path)
+        return self._neighbor_index
+
+    @property
+    def background(self):
+        """Sample of scaled training rows used as the SHAP background, or None if not bundled"""
+        path = os.path.join(self.path, BACKGROUND_FILENAME)
+        return np.load(path) if os.path.exists(path) else None
+
+    def _load_npz(self, filename):
+        path = os.path.join(self.path, filename)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return {key: data[key] for key in data.files}
+
+    @property
+    def running_stats(self):
+        """Per-class feature moments for incremental refits, or None if not bundled"""
+        return self._load_npz(RUNNING_STATS_FILENAME)
+
+    @property
+    def replay(self):
+        """Replay sample of raw training rows ('X', 'y', 'seen'), or None if not bundled"""
+        return self._load_npz(REPLAY_FILENAME)
+
+    @property
+    def drift_reference(self):
+        """Reference histograms of the raw selected features (drift_monitor), or None if not bundled"""
+        return self._load_npz(DRIFT_REFERENCE_FILENAME)
+
+    def __repr__(self):
+        return f"ModelBundle(version={self.version!r}, path={self.path!r})"
+
+
+def _create_bundle_dir(artifact_dir, version=None):
+    """Create the directory of a new bundle version; returns (version, path)
+
+    The default version is the UTC timestamp, suffixed with -1, -2, ... when
+    a bundle was already saved in the same second. An explicit version must
+    be new.
+    """
+    os.makedirs(artifact_dir, exist_ok=True)
+    if version:
+        bundle_path = os.path.join(artifact_dir, f"thyronet-{version}")
+        os.mkdir(bundle_path)
+        return version, bundle_path
+
+    timestamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+    for attempt in itertools.count():
+        version = f"{timestamp}-{attempt}" if attempt else timestamp
+        bundle_path = os.path.join(artifact_dir, f"thyronet-{version}")
+        try:
+            os.mkdir(bundle_path)
+        except FileExistsError:
+            continue
+        return version, bundle_path
+
+
+def save_bundle(var_thresh, selector, scaler, rf, dnn, feature_names, selected_features,
+                threshold=0.5, hybrid_weights=(0.5, 0.5), metrics=None, neighbor_index=None,
+                background=None, tuning=None, running_stats=None, replay=None, lineage=None,
+                drift_reference=None, artifact_dir=DEFAULT_ARTIFACT_DIR, version=None):
+    """Write a new versioned bundle and point LATEST at it
+
+    The DNN is also exported for TensorFlow-free scoring and checked against
+    Keras on the background rows (or random rows in the scaled [0, 1] range).
+    """
+    from numpy_dnn import export_dnn
+
+    version, bundle_path = _create_bundle_dir(artifact_dir, version)
+
+    joblib.dump({'var_thresh': var_thresh, 'selector': selector, 'scaler': scaler},
+                os.path.join(bundle_path, PREPROCESSING_FILENAME))
+    joblib.dump(rf, os.path.join(bundle_path, RF_FILENAME))
+    dnn.save(os.path.join(bundle_path, DNN_FILENAME))
+    X_check = background if background is not None else np.random.RandomState(0).uniform(
+        size=(256, len(selected_features)))
+    export_dnn(dnn, os.path.join(bundle_path, DNN_EXPORT_FILENAME), X_check)
+    if neighbor_index is not None:
+        neighbor_index.save(os.path.join(bundle_path, NEIGHBOR_INDEX_FILENAME))
+    if background is not None:
+        np.save(os.path.join(bundle_path, BACKGROUND_FILENAME), np.asarray(background))
+    if running_stats is not None:
+        np.savez(os.path.join(bundle_path, RUNNING_STATS_FILENAME), **running_stats)
+    if replay is not None:
+        np.savez(os.path.join(bundle_path, REPLAY_FILENAME), **replay)
+    if drift_reference is not None:
+        np.savez(os.path.join(bundle_path, DRIFT_REFERENCE_FILENAME), **drift_reference)
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'feature_names': list(feature_names),
+        'selected_features': list(selected_features),
+        'threshold': float(threshold),
+        'hybrid_weights': [float(w) for w in hybrid_weights],
+        'metrics': metrics or {},
+    }
+    if tuning is not None:
+        manifest['tuning'] = tuning
+    if lineage is not None:
+        manifest['lineage'] = lineage
+    with open(os.path.join(bundle_path, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Update the pointer last so readers never see a partially written bundle
+    _point_latest(artifact_dir, bundle_path)
+    return bundle_path
+
+
+def _point_latest(artifact_dir, bundle_path):
+    latest_tmp = os.path.join(artifact_dir, f"{LATEST_FILENAME}.tmp")
+    with open(latest_tmp, 'w') as f:
+        f.write(os.path.basename(bundle_path))
+    os.replace(latest_tmp, os.path.join(artifact_dir, LATEST_FILENAME))
+
+
+def resolve_bundle_path(path=None):
+    """Resolve a bundle directory, defaulting to the LATEST bundle in the artifact dir"""
+    path = path or DEFAULT_ARTIFACT_DIR
+    if os.path.exists(os.path.join(path, MANIFEST_FILENAME)):
+        return path
+
+    latest = os.path.join(path, LATEST_FILENAME)
+    if not os.path.exists(latest):
+        raise FileNotFoundError(f"No model bundle found in {path}; run thyronet_xai_analysis.py first")
+    with open(latest) as f:
+        return os.path.join(path, f.read().strip())
+
+
+def load_bundle(path=None):
+    """Open a bundle; model files are read lazily on first access"""
+    bundle_path = resolve_bundle_path(path)
+    with open(os.path.join(bundle_path, MANIFEST_FILENAME)) as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported bundle format {manifest.get('format_version')} in {bundle_path}"
+        )
+    return ModelBundle(bundle_path, manifest)
+
+
+def update_decision_rule(path, threshold, hybrid_weights, tuning=None, version=None):
+    """Save a new bundle version with a different hybrid weights/threshold rule; returns its path
+
+    The parent bundle is left untouched, so a version always scores the same.
+    Model files are copied unchanged, the manifest's lineage points at the
+    parent, and `tuning` (e.g. the optimizer's objective and validation
+    scores) is recorded alongside the new rule. LATEST moves to the new
+    bundle, next to its parent.
+    """
+    parent_path = resolve_bundle_path(path)
+    with open(os.path.join(parent_path, MANIFEST_FILENAME)) as f:
+        manifest = json.load(f)
+
+    artifact_dir = os.path.dirname(os.path.abspath(parent_path))
+    version, bundle_path = _create_bundle_dir(artifact_dir, version)
+    shutil.copytree(parent_path, bundle_path, ignore=shutil.ignore_patterns(MANIFEST_FILENAME),
+                    dirs_exist_ok=True)
+
+    manifest.update({
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'threshold': float(threshold),
+        'hybrid_weights': [float(w) for w in hybrid_weights],
+        'lineage': {'parent': manifest['version'], 'updated': 'decision_rule'},
+    })
+    if tuning is not None:
+        manifest['tuning'] = tuning
+    with open(os.path.join(bundle_path, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    _point_latest(artifact_dir, bundle_path)
+    return bundle_path
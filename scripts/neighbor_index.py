@@ -0,0 +1,198 @@
+"""
+Nearest-Neighbour Index for ThyroNet-XAI
+Prebuilt KD-tree/ball-tree (exact) or inverted-file (approximate) index over
+the scaled selected features. Serves both the KNN baseline and the
+"similar patients" lookup of the prediction service.
+"""
+
+import joblib
+import numpy as np
+from sklearn.neighbors import BallTree, KDTree
+
+METHOD_CHOICES = ('kd_tree', 'ball_tree', 'ivf')
+
+# Rows added to a kd/ball tree are scanned exhaustively until they exceed this
+# fraction of the tree, which is then rebuilt (amortized O(1) tree work per row)
+REBUILD_FRACTION = 0.25
+
+
+def _squared_distances(A, B):
+    """Pairwise squared Euclidean distances between the rows of A and B"""
+    return (A ** 2).sum(1)[:, None] - 2 * A @ B.T + (B ** 2).sum(1)[None, :]
+
+
+class NeighborIndex:
+    """Batch k-nearest-neighbour index with a classifier-style interface
+
+    'kd_tree' and 'ball_tree' are exact. 'ivf' clusters the rows into
+    n_lists cells with k-means and only scans the n_probe cells closest to
+    each query, trading a little recall for query cost that grows roughly
+    with sqrt(n) instead of n.
+
+    `add` grows a fitted index without refitting it: IVF rows go straight into
+    their nearest cells, tree rows into a small exhaustively scanned buffer.
+    """
+
+    def __init__(self, n_neighbors=5, method='kd_tree', leaf_size=40, n_lists=None, n_probe=8,
+                 random_state=42):
+        if method not in METHOD_CHOICES:
+            raise ValueError(f"method must be one of {METHOD_CHOICES}, got {method!r}")
+        self.n_neighbors = n_neighbors
+        self.method = method
+        self.leaf_size = leaf_size
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        self.n_samples_ = X.shape[0]
+        self.labels_ = None if y is None else np.asarray(y).astype(np.int8)
+        self.classes_ = np.array([0, 1])
+        self.pending_rows_ = X[:0]
+
+        if self.method == 'kd_tree':
+            self.tree_ = KDTree(X, leaf_size=self.leaf_size)
+        elif self.method == 'ball_tree':
+            self.tree_ = BallTree(X, leaf_size=self.leaf_size)
+        else:
+            self._fit_ivf(X)
+        return self
+
+    def _fit_ivf(self, X):
+        from sklearn.cluster import MiniBatchKMeans
+
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(X))))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=4096, n_init=3,
+                                 random_state=self.random_state)
+        assignments = kmeans.fit_predict(X)
+
+        # Store rows grouped by cell so each cell is one contiguous slice
+        order = np.argsort(assignments, kind='stable')
+        self.centroids_ = kmeans.cluster_centers_
+        self.list_offsets_ = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+        self.list_rows_ = X[order]
+        self.list_ids_ = order
+
+    def _query_ivf(self, Q, k):
+        n_lists = len(self.centroids_)
+        n_probe = min(self.n_probe, n_lists)
+        centroid_d2 = _squared_distances(Q, self.centroids_)
+        probes = np.argpartition(centroid_d2, n_probe - 1, axis=1)[:, :n_probe]
+
+        distances = np.empty((len(Q), k))
+        indices = np.empty((len(Q), k), dtype=np.intp)
+        for i, q in enumerate(Q):
+            cells = probes[i]
+            candidates = np.concatenate([
+                np.arange(self.list_offsets_[c], self.list_offsets_[c + 1]) for c in cells
+            ])
+            if len(candidates) < k:
+                candidates = np.arange(len(self.list_rows_))
+
+            d2 = ((self.list_rows_[candidates] - q) ** 2).sum(1)
+            top = np.argpartition(d2, k - 1)[:k]
+            top = top[np.argsort(d2[top])]
+            distances[i] = np.sqrt(d2[top])
+            indices[i] = self.list_ids_[candidates[top]]
+        return distances, indices
+
+    def _pending(self):
+        # Indexes pickled before `add` existed have no buffer
+        return getattr(self, 'pending_rows_', None)
+
+    def add(self, X, y=None):
+        """Index further rows, numbered after the existing ones, without refitting
+
+        IVF rows are assigned to their nearest existing cell (the k-means
+        centroids are kept). kd/ball rows are buffered and scanned
+        exhaustively; the tree is rebuilt once the buffer exceeds
+        REBUILD_FRACTION of it.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if (y is None) != (self.labels_ is None):
+            raise ValueError("Labels must be given exactly when the index was built with labels")
+        if self.labels_ is not None:
+            self.labels_ = np.concatenate([self.labels_, np.asarray(y).astype(np.int8)])
+        ids = np.arange(self.n_samples_, self.n_samples_ + len(X))
+        self.n_samples_ += len(X)
+
+        if self.method == 'ivf':
+            cells = np.argmin(_squared_distances(X, self.centroids_), axis=1)
+            cell_of_row = np.repeat(np.arange(len(self.centroids_)), np.diff(self.list_offsets_))
+            order = np.argsort(np.concatenate([cell_of_row, cells]), kind='stable')
+            self.list_rows_ = np.concatenate([self.list_rows_, X])[order]
+            self.list_ids_ = np.concatenate([self.list_ids_, ids])[order]
+            self.list_offsets_ = self.list_offsets_ + np.searchsorted(
+                np.sort(cells), np.arange(len(self.centroids_) + 1))
+            return self
+
+        pending = self._pending()
+        self.pending_rows_ = X if pending is None else np.concatenate([pending, X])
+        if len(self.pending_rows_) > REBUILD_FRACTION * (self.n_samples_ - len(self.pending_rows_)):
+            self.fit(self.indexed_rows(), self.labels_)
+        return self
+
+    def rescale(self, a, b):
+        """Move the index into new feature scaling, x -> a * x + b, feature-wise
+
+        IVF rows and centroids are transformed in place without re-clustering;
+        kd/ball trees are rebuilt over the transformed rows.
+        """
+        if np.all(a == 1) and np.all(b == 0):
+            return self
+        if self.method == 'ivf':
+            self.list_rows_ = self.list_rows_ * a + b
+            self.centroids_ = self.centroids_ * a + b
+            return self
+        return self.fit(self.indexed_rows() * a + b, self.labels_)
+
+    def indexed_rows(self):
+        """The indexed rows in their original fit order, followed by the added ones"""
+        if self.method == 'ivf':
+            rows = np.empty_like(self.list_rows_)
+            rows[self.list_ids_] = self.list_rows_
+            return rows
+        rows = np.asarray(self.tree_.get_arrays()[0])
+        pending = self._pending()
+        return rows if pending is None or not len(pending) else np.concatenate([rows, pending])
+
+    def query(self, X, k=None):
+        """Return (distances, indices) of the k nearest indexed rows for every query row"""
+        k = min(k or self.n_neighbors, self.n_samples_)
+        Q = np.ascontiguousarray(X, dtype=np.float64)
+        if self.method == 'ivf':
+            return self._query_ivf(Q, k)
+
+        pending = self._pending()
+        if pending is None or not len(pending):
+            return self.tree_.query(Q, k=k)
+        n_tree = self.n_samples_ - len(pending)
+        distances, indices = self.tree_.query(Q, k=min(k, n_tree))
+        pending_d = np.sqrt(np.maximum(_squared_distances(Q, pending), 0))
+        distances = np.concatenate([distances, pending_d], axis=1)
+        indices = np.concatenate([indices, np.broadcast_to(np.arange(n_tree, self.n_samples_), pending_d.shape)],
+                                 axis=1)
+        top = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(distances, top, 1), np.take_along_axis(indices, top, 1)
+
+    def neighbor_labels(self, X, k=None):
+        """Labels of the k nearest indexed rows for every query row"""
+        if self.labels_ is None:
+            raise ValueError("Index was built without labels")
+        _, indices = self.query(X, k)
+        return self.labels_[indices]
+
+    def predict_proba(self, X):
+        positive = self.neighbor_labels(X).mean(axis=1)
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
@@ -0,0 +1,167 @@
+"""
+TensorFlow-free DNN Inference for ThyroNet-XAI
+Exports the trained Keras DNN as plain NumPy arrays so scoring processes
+never import TensorFlow. Dropout is an identity at inference and is dropped;
+each BatchNormalization is a fixed per-unit affine map at inference and is
+folded into the weights of a neighbouring Dense layer. In the ThyroNet
+network BN follows the ReLU of its Dense layer, so it is folded forward
+into the next Dense layer (folding backward would cross the ReLU). What is
+left is four Dense layers evaluated with float32 matmuls. Networks trained
+with mixed precision export the same way (their variables are float32) and
+are checked against a float32-compute copy of themselves.
+"""
+
+import numpy as np
+from scipy.special import expit
+
+from schema import FEATURE_DTYPE
+
+DEFAULT_TOLERANCE = 1e-5
+
+ACTIVATIONS = {
+    'linear': lambda z: z,
+    'relu': lambda z: np.maximum(z, 0, out=z),
+    'sigmoid': lambda z: expit(z, out=z),
+}
+
+
+def _batch_norm_affine(layer):
+    """(scale, shift) such that BN(h) = h * scale + shift at inference"""
+    variance = np.asarray(layer.moving_variance, dtype=np.float64)
+    mean = np.asarray(layer.moving_mean, dtype=np.float64)
+    scale = 1.0 / np.sqrt(variance + layer.epsilon)
+    if layer.gamma is not None:
+        scale = scale * np.asarray(layer.gamma, dtype=np.float64)
+    shift = -mean * scale
+    if layer.beta is not None:
+        shift = shift + np.asarray(layer.beta, dtype=np.float64)
+    return scale, shift
+
+
+def fold_layers(dnn):
+    """(weights, biases, activations) of a Sequential Dense/BatchNormalization/Dropout network"""
+    weights, biases, activations = [], [], []
+    pending = None  # BN affine map waiting for the next Dense layer
+
+    for layer in dnn.layers:
+        kind = type(layer).__name__
+        if kind in ('InputLayer', 'Dropout'):
+            continue
+        if kind == 'BatchNormalization':
+            scale, shift = _batch_norm_affine(layer)
+            if pending is not None:
+                scale, shift = pending[0] * scale, pending[1] * scale + shift
+            pending = (scale, shift)
+        elif kind == 'Dense':
+            kernel, bias = (np.asarray(w, dtype=np.float64) for w in layer.get_weights())
+            if pending is not None:
+                # (h * s + t) @ W + b = h @ (s[:, None] * W) + (t @ W + b)
+                bias = pending[1] @ kernel + bias
+                kernel = pending[0][:, None] * kernel
+                pending = None
+            activation = layer.get_config()['activation']
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation {activation!r} in layer {layer.name}")
+            weights.append(kernel)
+            biases.append(bias)
+            activations.append(activation)
+        else:
+            raise ValueError(f"Cannot export layer {layer.name} of type {kind}")
+
+    if pending is not None:
+        raise ValueError("A BatchNormalization layer after the last Dense layer cannot be folded")
+    return weights, biases, activations
+
+
+class NumpyDNN:
+    """Forward pass of a folded Dense network in NumPy
+
+    Callable like a Keras model (`dnn(X, training=False)` returns an
+    (n, 1) array) and exposes the input gradient for expected-gradients SHAP.
+    """
+
+    def __init__(self, weights, biases, activations):
+        self.weights = [np.ascontiguousarray(w, dtype=FEATURE_DTYPE) for w in weights]
+        self.biases = [np.asarray(b, dtype=FEATURE_DTYPE) for b in biases]
+        self.activations = list(activations)
+
+    @classmethod
+    def from_keras(cls, dnn):
+        return cls(*fold_layers(dnn))
+
+    @property
+    def input_dim(self):
+        return self.weights[0].shape[0]
+
+    def __call__(self, X, training=False):
+        h = np.asarray(X, dtype=FEATURE_DTYPE)
+        for kernel, bias, activation in zip(self.weights, self.biases, self.activations):
+            h = h @ kernel
+            h += bias
+            h = ACTIVATIONS[activation](h)
+        return h
+
+    def predict(self, X, verbose=0):
+        return self(X)
+
+    def gradient(self, X):
+        """d output / d input for every row of X (single-output networks)"""
+        h = np.asarray(X, dtype=FEATURE_DTYPE)
+        derivatives = []
+        for kernel, bias, activation in zip(self.weights, self.biases, self.activations):
+            z = h @ kernel + bias
+            h = ACTIVATIONS[activation](z.copy())
+            if activation == 'relu':
+                derivatives.append((z > 0).astype(FEATURE_DTYPE))
+            elif activation == 'sigmoid':
+                derivatives.append(h * (1 - h))
+            else:
+                derivatives.append(np.ones_like(z))
+
+        grad = derivatives[-1]
+        for kernel, derivative in zip(self.weights[:0:-1], derivatives[-2::-1]):
+            grad = (grad @ kernel.T) * derivative
+        return grad @ self.weights[0].T
+
+    def save(self, path):
+        arrays = {f"weight_{i}": w for i, w in enumerate(self.weights)}
+        arrays.update({f"bias_{i}": b for i, b in enumerate(self.biases)})
+        np.savez(path, activations=np.array(self.activations), **arrays)
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            activations = [str(a) for a in data['activations']]
+            n_layers = len(activations)
+            return NumpyDNN([data[f"weight_{i}"] for i in range(n_layers)],
+                            [data[f"bias_{i}"] for i in range(n_layers)], activations)
+
+
+def float32_reference(dnn):
+    """`dnn` itself, or for a mixed-precision network a float32-compute copy with the same weights"""
+    if all(layer.compute_dtype == 'float32' for layer in dnn.layers):
+        return dnn
+    from tensorflow.keras.models import Sequential
+
+    config = dnn.get_config()
+    for layer in config['layers']:
+        layer['config']['dtype'] = 'float32'
+    reference = Sequential.from_config(config)
+    reference.set_weights(dnn.get_weights())
+    return reference
+
+
+def export_dnn(dnn, path, X_check, tolerance=DEFAULT_TOLERANCE):
+    """Fold and save `dnn`, after checking it matches Keras on X_check; returns the max abs difference
+
+    The check runs Keras in float32 (see float32_reference), so bfloat16 or
+    float16 rounding in a mixed-precision network does not fail it.
+    """
+    exported = NumpyDNN.from_keras(dnn)
+    X_check = np.asarray(X_check, dtype=FEATURE_DTYPE)
+    expected = np.asarray(float32_reference(dnn)(X_check, training=False), dtype=np.float64)
+    difference = float(np.max(np.abs(exported(X_check) - expected)))
+    if difference > tolerance:
+        raise ValueError(f"Exported DNN differs from Keras by {difference:.2e} (tolerance {tolerance:.0e})")
+    exported.save(path)
+    return difference
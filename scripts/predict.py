@@ -0,0 +1,96 @@
+"""
+Inference Entry Point for ThyroNet-XAI
+Scores patient records with a persisted model bundle without retraining.
+The DNN runs from its NumPy export, so TensorFlow is not imported unless the
+bundle predates the export.
+
+Usage:
+    python scripts/predict.py patients.csv
+    python scripts/predict.py --model rf --bundle artifacts/thyronet-20250101-000000 patients.json
+    python scripts/predict.py --drift patients.csv
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+
+import numpy as np
+
+from hybrid_scorer import DEFAULT_BATCH_SIZE, MODEL_CHOICES, HybridScorer
+from model_bundle import load_bundle
+from schema import validate_matrix
+
+
+def records_to_matrix(records, feature_names):
+    """Build a validated float32 feature matrix from dict records, matching keys case-insensitively"""
+    X = np.empty((len(records), len(feature_names)), dtype=np.float64)
+    for i, record in enumerate(records):
+        lowered = {str(k).lower(): v for k, v in record.items()}
+        for j, name in enumerate(feature_names):
+            value = record.get(name, lowered.get(name.lower()))
+            if value is None:
+                raise KeyError(f"Record {i} is missing feature '{name}'")
+            X[i, j] = value
+    return validate_matrix(X, feature_names)
+
+
+def read_records(path):
+    """Read a CSV or JSON file of patient records"""
+    if path.endswith('.json'):
+        with open(path) as f:
+            records = json.load(f)
+        return [records] if isinstance(records, dict) else records
+
+    with open(path, newline='') as f:
+        dialect = csv.Sniffer().sniff(f.readline(), delimiters=';,\t')
+        f.seek(0)
+        return list(csv.DictReader(f, dialect=dialect))
+
+
+def predict(X, bundle, model='hybrid', batch_size=DEFAULT_BATCH_SIZE):
+    """Score a raw (n_samples, 21) matrix and return a dict of probability/label arrays"""
+    scorer = HybridScorer.from_bundle(bundle, batch_size=batch_size)
+    return scorer.score(X, model=model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score patient records with a saved ThyroNet-XAI model")
+    parser.add_argument('input', help="CSV or JSON file of patient records")
+    parser.add_argument('--bundle', help="bundle directory (defaults to the LATEST bundle)")
+    parser.add_argument('--model', choices=MODEL_CHOICES, default='hybrid')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--drift', action='store_true',
+                        help="also compare the records' feature distributions with the training reference")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    bundle = load_bundle(args.bundle)
+    records = read_records(args.input)
+    X = records_to_matrix(records, bundle.feature_names)
+    outputs = predict(X, bundle, model=args.model, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    results = [
+        {key: (int(values[i]) if key == 'prediction' else round(float(values[i]), 6))
+         for key, values in outputs.items()}
+        for i in range(len(records))
+    ]
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    print(f"Scored {len(records)} records with {bundle.version} in {elapsed * 1000:.1f} ms",
+          file=sys.stderr)
+
+    if args.drift:
+        from drift_monitor import DriftMonitor
+
+        monitor = DriftMonitor.from_bundle(bundle, half_life=None)
+        if monitor is None:
+            print(f"Bundle {bundle.version} has no drift reference; retrain to add one", file=sys.stderr)
+        else:
+            print(monitor.update(X).drift().round(4).to_string(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
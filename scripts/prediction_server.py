@@ -0,0 +1,351 @@
+"""
+Prediction Server for ThyroNet-XAI
+ASGI application that loads the persisted hybrid model once at startup and
+serves the PredictionRequest/PredictionResponse contract used by
+app/api/predict. Concurrent requests are micro-batched into a single
+vectorized RF/DNN call and a single SHAP explanation call. Scored rows feed a streaming feature drift monitor
+(drift_monitor.py) reported at GET /drift.
+
+Usage:
+    python scripts/prediction_server.py --port 8000
+    uvicorn prediction_server:app --app-dir scripts
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from drift_monitor import DriftMonitor
+from explainability import HybridExplainer, top_contributions
+from hybrid_scorer import HybridScorer
+from model_bundle import load_bundle
+from predict import records_to_matrix
+
+SIMILAR_PATIENTS = 100
+
+REQUIRED_FIELDS = ["age", "sex", "TSH", "T3_measured", "TT4_measured", "T4U_measured", "FTI_measured"]
+
+
+class MicroBatcher:
+    """Collects concurrent scoring requests and runs them as one batch
+
+    A batch is flushed when it reaches max_batch_size rows or when the oldest
+    queued request has waited max_wait_ms. Scoring runs in a worker thread so
+    the event loop keeps accepting requests meanwhile. Each row's outputs
+    include its scaled features ('scaled') and, with a HybridExplainer, its
+    hybrid SHAP values ('shap'), computed for the whole batch at once. With a
+    DriftMonitor, each scored batch is also folded into its histograms in
+    that thread.
+    """
+
+    def __init__(self, scorer, max_batch_size=256, max_wait_ms=2.0, monitor=None, explainer=None):
+        self.scorer = scorer
+        self.monitor = monitor
+        self.explainer = explainer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _score(self, X):
+        outputs = self.scorer.score(X)
+        outputs['scaled'] = self.scorer.transform(X)
+        if self.explainer is not None:
+            outputs['shap'] = self.explainer.explain(outputs['scaled'])['hybrid']
+        if self.monitor is not None:
+            self.monitor.update(X)
+        return outputs
+
+    async def submit(self, row):
+        """Queue one raw feature row and wait for its scoring (and explanation) outputs"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(pending) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            X = np.vstack([row for row, _ in pending])
+            try:
+                outputs = await loop.run_in_executor(None, self._score, X)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for i, (_, future) in enumerate(pending):
+                if not future.done():
+                    future.set_result({key: values[i] for key, values in outputs.items()})
+
+
+def clinical_insights(record, risk_score, similar_abnormal_ratio=None, baseline_risk=None):
+    """Rule-based notes shown alongside the model output"""
+    insights = []
+    if similar_abnormal_ratio is not None and similar_abnormal_ratio > baseline_risk * 2:
+        insights.append(
+            f"Patient profile matches {round(similar_abnormal_ratio * 100)}% abnormal cases in medical database"
+        )
+    if record.get('tumor'):
+        insights.append("Tumor history present - requires immediate clinical evaluation")
+    if record.get('thyroid_surgery'):
+        insights.append("Previous thyroid surgery documented - ongoing monitoring indicated")
+    if record['TSH'] < 0.4:
+        insights.append("Suppressed TSH detected - possible hyperthyroid condition")
+    if record['TSH'] > 4.5:
+        insights.append("Elevated TSH found - hypothyroid evaluation recommended")
+    if record.get('goitre') and record.get('tumor'):
+        insights.append("Combined goitre and tumor history - high priority assessment")
+
+    if risk_score > 0.7:
+        insights.append("High-risk profile identified - urgent specialist referral recommended")
+    elif risk_score > 0.4:
+        insights.append("Moderate risk detected - follow-up within 3-6 months advised")
+    else:
+        insights.append("Low risk profile - routine monitoring appropriate")
+    return insights
+
+
+class PredictionApp:
+    """ASGI app exposing POST /predict, GET /health and GET /drift"""
+
+    def __init__(self, bundle_path=None, max_batch_size=256, max_wait_ms=2.0):
+        self.bundle_path = bundle_path
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.bundle = None
+        self.scorer = None
+        self.batcher = None
+        self.explainer = None
+        self.monitor = None
+        self._feature_importance = None
+        self._startup_lock = asyncio.Lock()
+
+    def load(self):
+        """Load the bundle and warm up both models so the first request is not slow"""
+        self.bundle = load_bundle(self.bundle_path)
+        self.scorer = HybridScorer.from_bundle(self.bundle)
+        self.scorer.score(np.zeros((1, len(self.bundle.feature_names))))
+        if self.bundle.neighbor_index is not None:
+            print(f"✅ Loaded neighbour index over {self.bundle.neighbor_index.n_samples_} patients")
+
+        if self.bundle.background is not None:
+            self.explainer = HybridExplainer.from_bundle(self.bundle, dnn=self.scorer.dnn)
+            self.explainer.tree_explainer  # preprocess the forest before the first request
+            print(f"✅ SHAP explainer ready (hybrid base value {self.explainer.base_values['hybrid']:.3f})")
+        else:
+            # Older bundles without a SHAP background fall back to global RF importances
+            importances = self.bundle.rf.feature_importances_
+            self._feature_importance = sorted(
+                zip(self.scorer.selected_features, importances), key=lambda item: item[1], reverse=True
+            )
+        self.monitor = DriftMonitor.from_bundle(self.bundle)
+        if self.monitor is not None:
+            print(f"✅ Drift monitor watching {len(self.monitor.features)} features")
+        print(f"✅ Loaded model bundle {self.bundle.version}")
+
+    async def startup(self):
+        async with self._startup_lock:
+            if self.scorer is None:
+                await asyncio.get_running_loop().run_in_executor(None, self.load)
+            if self.batcher is None:
+                self.batcher = MicroBatcher(self.scorer, self.max_batch_size, self.max_wait_ms, self.monitor,
+                                            self.explainer)
+                self.batcher.start()
+
+    async def shutdown(self):
+        if self.batcher is not None:
+            await self.batcher.stop()
+            self.batcher = None
+
+    async def predict(self, record):
+        """Score one PredictionRequest dict and build the PredictionResponse payload"""
+        row = records_to_matrix([record], self.bundle.feature_names)
+        outputs = await self.batcher.submit(row)
+
+        risk_score = float(outputs['probability'])
+        scaled = outputs['scaled']
+        if self.explainer is not None:
+            # SHAP values were computed with the rest of the micro-batch
+            explanation = {'features': self.explainer.feature_names, 'hybrid': outputs['shap'][None, :]}
+            contributions = top_contributions(explanation, 0, n=len(explanation['features']))
+            feature_importance = [
+                {
+                    'feature': feature,
+                    'importance': round(abs(value), 4),
+                    'impact': 'positive' if value > 0 else 'negative',
+                }
+                for feature, value in contributions
+            ]
+        else:
+            feature_importance = [
+                {
+                    'feature': feature,
+                    'importance': round(float(importance), 4),
+                    'impact': 'positive' if scaled[self.scorer.selected_features.index(feature)] >= 0.5
+                              else 'negative',
+                }
+                for feature, importance in self._feature_importance
+            ]
+
+        similar_abnormal_ratio = baseline_risk = None
+        index = self.bundle.neighbor_index
+        if index is not None:
+            similar_abnormal_ratio = float(index.neighbor_labels(scaled[None, :], k=SIMILAR_PATIENTS).mean())
+            baseline_risk = float(index.labels_.mean())
+
+        return {
+            'prediction': 'abnormal' if outputs['prediction'] else 'normal',
+            'confidence': round(max(risk_score, 1 - risk_score), 2),
+            'risk_score': round(risk_score, 2),
+            'model_outputs': {
+                'random_forest': round(float(outputs['random_forest']), 2),
+                'deep_neural_network': round(float(outputs['deep_neural_network']), 2),
+                'hybrid_ensemble': round(risk_score, 2),
+            },
+            'feature_importance': feature_importance,
+            'clinical_insights': clinical_insights(record, risk_score, similar_abnormal_ratio, baseline_risk),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        # Servers without lifespan support get the model loaded on first request
+        await self.startup()
+
+        method, path = scope['method'], scope['path'].rstrip('/')
+        if method == 'GET' and path == '/health':
+            await self._respond(send, 200, {'status': 'ok', 'model_version': self.bundle.version})
+        elif method == 'GET' and path == '/drift':
+            if self.monitor is None:
+                await self._respond(send, 404, {'error': 'Model bundle has no drift reference'})
+            else:
+                await self._respond(send, 200, {'model_version': self.bundle.version, **self.monitor.report()})
+        elif method == 'POST' and path in ('/predict', '/api/predict'):
+            await self._handle_predict(receive, send)
+        else:
+            await self._respond(send, 404, {'error': 'Not found'})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _handle_predict(self, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        try:
+            record = json.loads(body)
+        except ValueError:
+            await self._respond(send, 400, {'error': 'Invalid JSON body'})
+            return
+        if not isinstance(record, dict):
+            await self._respond(send, 400, {'error': 'Expected a JSON object'})
+            return
+
+        for field in REQUIRED_FIELDS:
+            if record.get(field) is None:
+                await self._respond(send, 400, {'error': f'Missing required field: {field}'})
+                return
+        # Optional clinical flags default to "absent", as in the web form
+        record = {**{name.lower(): 0 for name in self.bundle.feature_names}, **record}
+
+        try:
+            prediction = await self.predict(record)
+        except (KeyError, TypeError, ValueError) as e:
+            await self._respond(send, 400, {'error': str(e)})
+            return
+        except Exception as e:
+            print(f"❌ Prediction error: {e}")
+            await self._respond(send, 500, {'error': 'Internal server error during prediction'})
+            return
+
+        await self._respond(send, 200, {
+            'success': True,
+            'data': prediction,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'model_version': f"ThyroNet-XAI {self.bundle.version}",
+        })
+
+    @staticmethod
+    async def _respond(send, status, payload):
+        body = json.dumps(payload).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = PredictionApp(
+    bundle_path=os.environ.get("THYRONET_BUNDLE"),
+    max_batch_size=int(os.environ.get("THYRONET_MAX_BATCH_SIZE", 256)),
+    max_wait_ms=float(os.environ.get("THYRONET_MAX_WAIT_MS", 2.0)),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve ThyroNet-XAI predictions over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--bundle', help="bundle directory (defaults to the LATEST bundle)")
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(PredictionApp(args.bundle, args.max_batch_size, args.max_wait_ms),
+                host=args.host, port=args.port, log_level='info')
+
+
+if __name__ == "__main__":
+    main()
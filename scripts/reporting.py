@@ -0,0 +1,229 @@
+"""
+Headless Figure Reporting for ThyroNet-XAI
+Renders every figure with the Agg backend straight to PNG/SVG files in a
+report directory. Figures are drawn by background worker processes, so
+training never waits on matplotlib, and matplotlib/seaborn are imported
+only inside those workers - a run with plotting disabled never loads them.
+
+Plot functions take plain arrays/DataFrames (they are pickled to the
+workers) and return the matplotlib Figure to save.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_REPORT_DIR = os.environ.get(
+    "THYRONET_REPORT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reports"),
+)
+DEFAULT_FIGURE_FORMATS = tuple(os.environ.get("THYRONET_FIGURE_FORMATS", "png,svg").split(","))
+PLOTS_ENABLED = os.environ.get("THYRONET_NO_PLOTS", "").lower() not in ("1", "true", "yes")
+DEFAULT_PLOT_WORKERS = int(os.environ.get("THYRONET_PLOT_WORKERS", min(2, os.cpu_count() or 1)))
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.style.use('default')
+    sns.set_palette("husl")
+    return plt
+
+
+def _render(name, plot_func, args, output_dir, formats, dpi):
+    plt = _pyplot()
+    fig = plot_func(*args)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(output_dir, f"{name}.{fmt}")
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+def _warm_up():
+    return os.getpid()
+
+
+class FigureReporter:
+    """Queue figures for rendering in background processes; a no-op when disabled
+
+    The pool is forked when the reporter is created, so create it before
+    TensorFlow is imported to keep the workers small and fork-safe.
+    """
+
+    def __init__(self, output_dir=DEFAULT_REPORT_DIR, formats=DEFAULT_FIGURE_FORMATS,
+                 enabled=PLOTS_ENABLED, max_workers=DEFAULT_PLOT_WORKERS, dpi=150):
+        self.output_dir = output_dir
+        self.formats = tuple(fmt.strip() for fmt in formats if fmt.strip())
+        self.enabled = enabled
+        self.dpi = dpi
+        self._futures = {}
+        self._executor = None
+
+        if enabled:
+            os.makedirs(output_dir, exist_ok=True)
+            context = multiprocessing.get_context('fork')
+            self._executor = ProcessPoolExecutor(max_workers=max(1, max_workers), mp_context=context)
+            # With fork every worker starts on the first submit; do it now, while the parent is light
+            self._executor.submit(_warm_up).result()
+
+    def submit(self, name, plot_func, *args):
+        """Render plot_func(*args) to <output_dir>/<name>.<fmt> in the background"""
+        if not self.enabled:
+            return None
+        future = self._executor.submit(_render, name, plot_func, args, self.output_dir,
+                                       self.formats, self.dpi)
+        self._futures[name] = future
+        return future
+
+    def close(self):
+        """Wait for pending figures; returns {name: [saved paths]}"""
+        if not self.enabled:
+            return {}
+        saved = {}
+        for name, future in self._futures.items():
+            try:
+                saved[name] = future.result()
+            except Exception as e:
+                print(f"⚠️ Figure {name} failed: {e}")
+        self._executor.shutdown()
+        return saved
+
+
+def plot_class_distribution(class_counts):
+    """Bar and pie chart of the original label counts (pandas Series indexed by class)"""
+    plt = _pyplot()
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+
+    # Bar plot
+    class_counts.plot(kind='bar', ax=ax1, color=['#3498db', '#e74c3c'], alpha=0.8)
+    ax1.set_title('Original Class Distribution', fontsize=14, fontweight='bold')
+    ax1.set_xlabel('Class Label')
+    ax1.set_ylabel('Count')
+    ax1.set_xticklabels(['Normal (0)', 'Anomaly (1)'], rotation=0)
+    ax1.grid(True, alpha=0.3)
+
+    # Add count labels on bars
+    for i, v in enumerate(class_counts.values):
+        ax1.text(i, v + 50, str(v), ha='center', va='bottom', fontweight='bold')
+
+    # Pie chart
+    class_counts.plot(kind='pie', ax=ax2, autopct='%1.1f%%', colors=['#3498db', '#e74c3c'])
+    ax2.set_title('Class Distribution (Percentage)', fontsize=14, fontweight='bold')
+    ax2.set_ylabel('')
+
+    fig.tight_layout()
+    return fig
+
+
+def plot_performance_dashboard(performance_df, feature_names, feature_importance, confusion,
+                               roc_curves):
+    """2x2 dashboard: ROC-AUC bars, RF importances, hybrid confusion matrix, ROC curves
+
+    roc_curves maps model name -> (fpr, tpr, auc).
+    """
+    plt = _pyplot()
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig.suptitle('ThyroNet-XAI: Performance Dashboard', fontsize=16, fontweight='bold')
+
+    # 1. ROC-AUC Comparison
+    ax1 = axes[0, 0]
+    models = performance_df['Model']
+    roc_aucs = performance_df['ROC-AUC']
+    colors = ['#e74c3c', '#3498db', '#2ecc71', '#f39c12', '#9b59b6', '#e67e22']
+    bars = ax1.bar(range(len(models)), roc_aucs, color=colors, alpha=0.8)
+    ax1.set_title('ROC-AUC Score Comparison', fontsize=12, fontweight='bold')
+    ax1.set_xlabel('Models')
+    ax1.set_ylabel('ROC-AUC')
+    ax1.set_xticks(range(len(models)))
+    ax1.set_xticklabels(models, rotation=45, ha='right')
+    ax1.set_ylim(0, 1)
+    ax1.grid(True, alpha=0.3)
+
+    for bar, value in zip(bars, roc_aucs):
+        ax1.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.01,
+                 f'{value:.3f}', ha='center', va='bottom', fontweight='bold')
+
+    # 2. Feature Importance
+    ax2 = axes[0, 1]
+    sorted_idx = np.argsort(feature_importance)[::-1]
+    top_features = [feature_names[i] for i in sorted_idx]
+    top_importance = [feature_importance[i] for i in sorted_idx]
+
+    ax2.barh(range(len(top_features)), top_importance, color='#3498db', alpha=0.8)
+    ax2.set_title('Feature Importance (Random Forest)', fontsize=12, fontweight='bold')
+    ax2.set_xlabel('Importance')
+    ax2.set_yticks(range(len(top_features)))
+    ax2.set_yticklabels(top_features)
+    ax2.invert_yaxis()
+    ax2.grid(True, alpha=0.3)
+
+    # 3. Confusion Matrix - Hybrid Model
+    ax3 = axes[1, 0]
+    ax3.imshow(confusion, interpolation='nearest', cmap='Blues')
+    ax3.set_title('Confusion Matrix - Hybrid Model', fontsize=12, fontweight='bold')
+    ax3.set_xlabel('Predicted Label')
+    ax3.set_ylabel('True Label')
+
+    for i in range(confusion.shape[0]):
+        for j in range(confusion.shape[1]):
+            ax3.text(j, i, format(confusion[i, j], 'd'),
+                     ha="center", va="center",
+                     color="white" if confusion[i, j] > confusion.max() / 2 else "black",
+                     fontweight='bold')
+
+    # 4. ROC Curves
+    ax4 = axes[1, 1]
+    for model_name, (fpr, tpr, auc) in roc_curves.items():
+        ax4.plot(fpr, tpr, label=f'{model_name} (AUC: {auc:.3f})', linewidth=2)
+
+    ax4.plot([0, 1], [0, 1], 'k--', alpha=0.5)
+    ax4.set_title('ROC Curves - All Models', fontsize=12, fontweight='bold')
+    ax4.set_xlabel('False Positive Rate')
+    ax4.set_ylabel('True Positive Rate')
+    ax4.legend(fontsize=8)
+    ax4.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    return fig
+
+
+def plot_target_distribution(target_counts):
+    """Target bar and pie chart for data_exploration.py"""
+    plt = _pyplot()
+    fig = plt.figure(figsize=(12, 4))
+
+    plt.subplot(1, 2, 1)
+    target_counts.plot(kind='bar', color=['#3498db', '#e74c3c'])
+    plt.title('Target Variable Distribution')
+    plt.xlabel('Class')
+    plt.ylabel('Count')
+    plt.xticks(rotation=0)
+
+    plt.subplot(1, 2, 2)
+    target_counts.plot(kind='pie', autopct='%1.1f%%', colors=['#3498db', '#e74c3c'])
+    plt.title('Target Variable Percentage')
+    plt.ylabel('')
+
+    fig.tight_layout()
+    return fig
+
+
+def plot_correlation_heatmap(correlation_matrix):
+    """Annotated feature correlation heatmap for data_exploration.py"""
+    plt = _pyplot()
+    import seaborn as sns
+
+    fig = plt.figure(figsize=(12, 10))
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0,
+                square=True, fmt='.2f')
+    plt.title('Feature Correlation Matrix')
+    fig.tight_layout()
+    return fig
@@ -24,7 +24,8 @@ packages = [
     "tensorflow",
     "imbalanced-learn",
     "shap",
-    "lime"
+    "lime",
+    "uvicorn"
 ]
 
 print("🔄 Installing required packages for ThyroNet-XAI...")
@@ -0,0 +1,94 @@
+"""
+Column Schema for the annthyroid Dataset
+Explicit compact dtypes for the 21 features and the label: uint8 for the 15
+binary flags (including Sex), float32 for age and the five lab values, uint8
+for Outlier_label. Data is validated against the schema when it is loaded or
+scored, so bad extracts fail early instead of being silently coerced.
+"""
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_VERSION = 1
+
+TARGET_COLUMN = "Outlier_label"
+LABEL_MAPPING = {'n': 0, 'o': 1}
+
+LAB_COLUMNS = ['Age', 'TSH', 'T3_measured', 'TT4_measured', 'T4U_measured', 'FTI_measured']
+FLAG_COLUMNS = [
+    'Sex', 'on_thyroxine', 'query_on_thyroxine', 'on_antithyroid_medication', 'sick', 'pregnant',
+    'thyroid_surgery', 'I131_treatment', 'query_hypothyroid', 'query_hyperthyroid', 'lithium',
+    'goitre', 'tumor', 'hypopituitary', 'psych',
+]
+# Dataset column order
+FEATURE_COLUMNS = ['Age'] + FLAG_COLUMNS + LAB_COLUMNS[1:]
+
+FEATURE_DTYPE = np.float32
+LABEL_DTYPE = np.uint8
+COLUMN_DTYPES = {
+    **{name: np.uint8 for name in FLAG_COLUMNS},
+    **{name: np.float32 for name in LAB_COLUMNS},
+    TARGET_COLUMN: LABEL_DTYPE,
+}
+
+
+class SchemaError(ValueError):
+    """Raised when data does not match the annthyroid schema"""
+
+
+def _raise_first(bad, values, names, requirement):
+    rows, cols = np.nonzero(bad)
+    raise SchemaError(
+        f"Column '{names[cols[0]]}' {requirement}, got {float(values[rows[0], cols[0]])} "
+        f"(row {rows[0]}, {int(bad.sum())} invalid values)"
+    )
+
+
+def _check_flags(values, names):
+    values = np.asarray(values, dtype=np.float64)
+    bad = ~np.isin(values, (0, 1))
+    if bad.any():
+        _raise_first(bad, values, names, "must be 0 or 1")
+
+
+def _check_labs(values, names):
+    values = np.asarray(values, dtype=np.float64)
+    bad = ~np.isfinite(values) | (values < 0)
+    if bad.any():
+        _raise_first(bad, values, names, "must be a finite non-negative number")
+
+
+def encode_labels(labels):
+    """Map 'n'/'o' (or 0/1) labels to uint8, rejecting anything else"""
+    labels = pd.Series(labels)
+    if not pd.api.types.is_numeric_dtype(labels):
+        labels = labels.astype(str).str.strip().map(LABEL_MAPPING)
+    if labels.isna().any() or not labels.isin((0, 1)).all():
+        raise SchemaError(f"{TARGET_COLUMN} must be one of {list(LABEL_MAPPING)} or 0/1")
+    return labels.to_numpy(dtype=LABEL_DTYPE)
+
+
+def apply_schema(df):
+    """Validate a cleaned DataFrame and return it with the compact column dtypes"""
+    missing = [name for name in FEATURE_COLUMNS if name not in df.columns]
+    if missing:
+        raise SchemaError(f"Missing columns: {missing}")
+
+    _check_flags(df[FLAG_COLUMNS].to_numpy(), FLAG_COLUMNS)
+    _check_labs(df[LAB_COLUMNS].to_numpy(), LAB_COLUMNS)
+
+    typed = {name: df[name].to_numpy(dtype=COLUMN_DTYPES[name]) for name in FEATURE_COLUMNS}
+    if TARGET_COLUMN in df.columns:
+        typed[TARGET_COLUMN] = encode_labels(df[TARGET_COLUMN])
+    return pd.DataFrame(typed, index=df.index)
+
+
+def validate_matrix(X, feature_names):
+    """Validate a raw (n_samples, n_features) matrix by column name and return it as float32"""
+    X = np.asarray(X)
+    names = list(feature_names)
+    flags = [j for j, name in enumerate(names) if name in FLAG_COLUMNS]
+    labs = [j for j, name in enumerate(names) if name in LAB_COLUMNS]
+    _check_flags(X[:, flags], [names[j] for j in flags])
+    _check_labs(X[:, labs], [names[j] for j in labs])
+    return np.ascontiguousarray(X, dtype=FEATURE_DTYPE)
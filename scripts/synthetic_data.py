@@ -0,0 +1,64 @@
+"""
+Synthetic annthyroid-shaped Data for ThyroNet-XAI
+One column spec for the demo fallback in thyronet_xai_analysis.py and the
+benchmark suite: uniform age and lab values, Bernoulli clinical flags and
+'n'/'o' labels at the annthyroid anomaly rate. `separation` shifts the lab
+values of anomalies so models have something to learn (0 keeps every
+feature independent of the label, as the original demo data).
+"""
+
+import numpy as np
+import pandas as pd
+
+from schema import TARGET_COLUMN
+
+# (low, high) of the uniform distribution per continuous column
+UNIFORM_COLUMNS = {
+    'Age': (0, 1),
+    'TSH': (0, 0.1),
+    'T3_measured': (0, 0.1),
+    'TT4_measured': (50, 150),
+    'T4U_measured': (50, 150),
+    'FTI_measured': (50, 150),
+}
+# P(flag == 1) per binary column
+FLAG_RATES = {
+    'Sex': 0.5,
+    'on_thyroxine': 0.1,
+    'query_on_thyroxine': 0.05,
+    'on_antithyroid_medication': 0.05,
+    'sick': 0.1,
+    'pregnant': 0.05,
+    'thyroid_surgery': 0.02,
+    'I131_treatment': 0.02,
+    'query_hypothyroid': 0.1,
+    'query_hyperthyroid': 0.1,
+    'lithium': 0.01,
+    'goitre': 0.05,
+    'tumor': 0.02,
+    'hypopituitary': 0.01,
+    'psych': 0.05,
+}
+ANOMALY_RATE = 0.07
+# Anomalies: TSH up, thyroxine measures down, by `separation` x the column range
+ANOMALY_SHIFTS = {'TSH': 0.5, 'TT4_measured': -0.3, 'FTI_measured': -0.3, 'T3_measured': -0.2}
+
+
+def synthetic_annthyroid(n_rows, separation=0.0, anomaly_rate=ANOMALY_RATE, random_state=42):
+    """DataFrame of n_rows raw annthyroid-shaped records with 'n'/'o' Outlier_label"""
+    rng = np.random.RandomState(random_state)
+    columns = {'Age': rng.uniform(*UNIFORM_COLUMNS['Age'], n_rows)}
+    for name, rate in FLAG_RATES.items():
+        p = None if rate == 0.5 else [1 - rate, rate]
+        columns[name] = rng.choice([0, 1], n_rows, p=p)
+    for name in ('TSH', 'T3_measured', 'TT4_measured', 'T4U_measured', 'FTI_measured'):
+        columns[name] = rng.uniform(*UNIFORM_COLUMNS[name], n_rows)
+    columns[TARGET_COLUMN] = rng.choice(['n', 'o'], n_rows, p=[1 - anomaly_rate, anomaly_rate])
+
+    if separation:
+        anomalous = columns[TARGET_COLUMN] == 'o'
+        for name, shift in ANOMALY_SHIFTS.items():
+            low, high = UNIFORM_COLUMNS[name]
+            shifted = columns[name][anomalous] + separation * shift * (high - low)
+            columns[name][anomalous] = np.clip(shifted, 0, None)
+    return pd.DataFrame(columns)
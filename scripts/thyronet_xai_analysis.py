@@ -3,446 +3,480 @@
 ThyroNet-XAI: Thyroid Cancer Prediction with Hybrid (RF+DNN) Model
 Complete Implementation with Explainability and Visualizations
 Author: Research Team
+
+Each STEP is a stage function run by instrumentation.PipelineRun, which
+records its wall/CPU time, peak RSS and output array sizes in a JSON/CSV
+run report (--run-report-dir); --profile STAGE profiles individual stages.
 """
 
 # ========================
 # STEP 1: Installations and Imports
 # ========================
+import argparse
+import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from sklearn.model_selection import train_test_split
 from sklearn.feature_selection import VarianceThreshold, SelectKBest, f_classif
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.svm import SVC
-from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score, roc_curve
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Dropout, BatchNormalization
-from tensorflow.keras.callbacks import EarlyStopping
+from sklearn.metrics import classification_report
+from balancing import DEFAULT_BALANCING, balance
+from data_loader import clean_dataframe, load_dataframe
+from drift_monitor import build_reference
+from explainability import HybridExplainer, top_contributions
+from hyperparameter_search import load_hyperparams
+from hybrid_optimizer import DEFAULT_OBJECTIVE, DEFAULT_TARGET_RECALL, optimize_hybrid, out_of_fold_probabilities
+from incremental_training import RunningStats, replay_sample
+from instrumentation import PROFILERS, PipelineRun
+from metrics_engine import confidence_interval_frame, evaluate_models
+from model_bundle import save_bundle
+from neighbor_index import NeighborIndex
+from reporting import DEFAULT_REPORT_DIR, PLOTS_ENABLED, FigureReporter
+from reporting import plot_class_distribution, plot_performance_dashboard
+from schema import apply_schema
+from synthetic_data import synthetic_annthyroid
+from training_orchestrator import build_default_models, resolve_hyperparams, train_models
 import warnings
 warnings.filterwarnings('ignore')
 
-# Set style for better visualizations
-plt.style.use('default')
-sns.set_palette("husl")
-
-print("🚀 ThyroNet-XAI: Thyroid Cancer Prediction System")
-print("=" * 60)
 
 # ========================
 # STEP 2: Data Loading and Preparation
 # ========================
-print("\n🔄 STEP 2: Data Loading and Preparation")
-print("=" * 50)
-
-# Load data from the provided URL
-data_url = "https://hebbkx1anhila5yf.public.blob.vercel-storage.com/annthyroid_unsupervised_anomaly_detection%20%281%29-sjO68MzKaASs0l6gSA10YZXwFeJh45.csv"
-
-try:
-    df = pd.read_csv(data_url, delimiter=';')
-    print("✅ Data loaded successfully from URL")
-except Exception as e:
-    print(f"❌ Error loading data: {e}")
-    # Create sample data for demonstration
-    np.random.seed(42)
-    n_samples = 1000
-    df = pd.DataFrame({
-        'Age': np.random.uniform(0, 1, n_samples),
-        'Sex': np.random.choice([0, 1], n_samples),
-        'on_thyroxine': np.random.choice([0, 1], n_samples, p=[0.9, 0.1]),
-        'query_on_thyroxine': np.random.choice([0, 1], n_samples, p=[0.95, 0.05]),
-        'on_antithyroid_medication': np.random.choice([0, 1], n_samples, p=[0.95, 0.05]),
-        'sick': np.random.choice([0, 1], n_samples, p=[0.9, 0.1]),
-        'pregnant': np.random.choice([0, 1], n_samples, p=[0.95, 0.05]),
-        'thyroid_surgery': np.random.choice([0, 1], n_samples, p=[0.98, 0.02]),
-        'I131_treatment': np.random.choice([0, 1], n_samples, p=[0.98, 0.02]),
-        'query_hypothyroid': np.random.choice([0, 1], n_samples, p=[0.9, 0.1]),
-        'query_hyperthyroid': np.random.choice([0, 1], n_samples, p=[0.9, 0.1]),
-        'lithium': np.random.choice([0, 1], n_samples, p=[0.99, 0.01]),
-        'goitre': np.random.choice([0, 1], n_samples, p=[0.95, 0.05]),
-        'tumor': np.random.choice([0, 1], n_samples, p=[0.98, 0.02]),
-        'hypopituitary': np.random.choice([0, 1], n_samples, p=[0.99, 0.01]),
-        'psych': np.random.choice([0, 1], n_samples, p=[0.95, 0.05]),
-        'TSH': np.random.uniform(0, 0.1, n_samples),
-        'T3_measured': np.random.uniform(0, 0.1, n_samples),
-        'TT4_measured': np.random.uniform(50, 150, n_samples),
-        'T4U_measured': np.random.uniform(50, 150, n_samples),
-        'FTI_measured': np.random.uniform(50, 150, n_samples),
-        'Outlier_label': np.random.choice(['n', 'o'], n_samples, p=[0.93, 0.07])
-    })
-    print("✅ Using sample data for demonstration")
-
-# Clean data
-df = df.loc[:, ~df.columns.str.contains('^Unnamed|^;$', regex=True)]
-df.columns = df.columns.str.strip()
-
-# Display basic info
-print(f"Dataset shape: {df.shape}")
-print(f"Missing values: {df.isnull().sum().sum()}")
-print(f"Data types:\n{df.dtypes.value_counts()}")
-
-# Encode target
-if df['Outlier_label'].dtype == 'object':
-    df['Outlier_label'] = df['Outlier_label'].map({'n': 0, 'o': 1})
-
-X = df.drop('Outlier_label', axis=1)
-y = df['Outlier_label']
-
-print("\nOriginal class distribution:")
-print(y.value_counts())
-print(f"Class imbalance ratio: {y.value_counts()[0]/y.value_counts()[1]:.2f}:1")
-
-# Visualization 1: Class Distribution
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
-
-# Bar plot
-y.value_counts().plot(kind='bar', ax=ax1, color=['#3498db', '#e74c3c'], alpha=0.8)
-ax1.set_title('Original Class Distribution', fontsize=14, fontweight='bold')
-ax1.set_xlabel('Class Label')
-ax1.set_ylabel('Count')
-ax1.set_xticklabels(['Normal (0)', 'Anomaly (1)'], rotation=0)
-ax1.grid(True, alpha=0.3)
-
-# Add count labels on bars
-for i, v in enumerate(y.value_counts().values):
-    ax1.text(i, v + 50, str(v), ha='center', va='bottom', fontweight='bold')
-
-# Pie chart
-y.value_counts().plot(kind='pie', ax=ax2, autopct='%1.1f%%', colors=['#3498db', '#e74c3c'])
-ax2.set_title('Class Distribution (Percentage)', fontsize=14, fontweight='bold')
-ax2.set_ylabel('')
-
-plt.tight_layout()
-plt.show()
+def load_data(reporter):
+    print("\n🔄 STEP 2: Data Loading and Preparation")
+    print("=" * 50)
 
-# ========================
-# STEP 3: Train-Test Split
-# ========================
-print("\n🔄 STEP 3: Train-Test Split")
-print("=" * 30)
+    # Load data from the local cache (downloaded once, then memory-mapped)
+    try:
+        df = load_dataframe()
+        print("✅ Data loaded successfully from local cache")
+    except Exception as e:
+        print(f"❌ Error loading data: {e}")
+        # Create sample data for demonstration
+        df = synthetic_annthyroid(1000)
+        print("✅ Using sample data for demonstration")
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, stratify=y, random_state=42
-)
+    # Clean data, encode the target and apply the compact schema dtypes (validated)
+    df = apply_schema(clean_dataframe(df))
+
+    # Display basic info
+    print(f"Dataset shape: {df.shape}")
+    print(f"Missing values: {df.isnull().sum().sum()}")
+    print(f"Data types:\n{df.dtypes.value_counts()}")
+    print(f"Memory usage: {df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+
+    X = df.drop('Outlier_label', axis=1)
+    y = df['Outlier_label']
+
+    print("\nOriginal class distribution:")
+    print(y.value_counts())
+    print(f"Class imbalance ratio: {y.value_counts()[0]/y.value_counts()[1]:.2f}:1")
+
+    # Visualization 1: Class Distribution
+    reporter.submit('class_distribution', plot_class_distribution, y.value_counts())
+    return {'X': X, 'y': y}
 
-print(f"Train size: {X_train.shape[0]}")
-print(f"Test size: {X_test.shape[0]}")
-print(f"Train class distribution:\n{y_train.value_counts()}")
-print(f"Test class distribution:\n{y_test.value_counts()}")
 
 # ========================
-# STEP 4: Handle Class Imbalance (Simple Oversampling)
+# STEP 3: Train-Test Split
 # ========================
-print("\n🔄 STEP 4: Class Balancing with Simple Oversampling")
-print("=" * 55)
+def split_data(X, y):
+    print("\n🔄 STEP 3: Train-Test Split")
+    print("=" * 30)
 
-# Simple oversampling approach (alternative to SMOTE-ENN)
-from sklearn.utils import resample
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, stratify=y, random_state=42
+    )
 
-# Separate majority and minority classes
-df_majority = pd.concat([X_train[y_train == 0], y_train[y_train == 0]], axis=1)
-df_minority = pd.concat([X_train[y_train == 1], y_train[y_train == 1]], axis=1)
+    print(f"Train size: {X_train.shape[0]}")
+    print(f"Test size: {X_test.shape[0]}")
+    print(f"Train class distribution:\n{y_train.value_counts()}")
+    print(f"Test class distribution:\n{y_test.value_counts()}")
+    return {'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
 
-# Upsample minority class
-df_minority_upsampled = resample(df_minority, 
-                                replace=True,
-                                n_samples=len(df_majority),
-                                random_state=42)
 
-# Combine majority class with upsampled minority class
-df_upsampled = pd.concat([df_majority, df_minority_upsampled])
+# ========================
+# STEP 4: Handle Class Imbalance
+# ========================
+def balance_classes(X_train, y_train):
+    print(f"\n🔄 STEP 4: Class Balancing ({DEFAULT_BALANCING})")
+    print("=" * 55)
+
+    # Index-based balancing: one gather of the training rows instead of DataFrame copies
+    X_train_res, y_train_res, sample_weight = balance(
+        X_train.to_numpy(), y_train.to_numpy(), strategy=DEFAULT_BALANCING, random_state=42
+    )
 
-# Separate features and target
-X_train_res = df_upsampled.drop('Outlier_label', axis=1)
-y_train_res = df_upsampled['Outlier_label']
+    print("Class distribution after balancing:")
+    print(pd.Series(y_train_res).value_counts())
+    if sample_weight is not None:
+        for label in np.unique(y_train_res):
+            print(f"Sample weight for class {label}: {sample_weight[y_train_res == label][0]:.3f}")
+    return {'X_train_res': X_train_res, 'y_train_res': y_train_res, 'sample_weight': sample_weight}
 
-print("Class distribution after oversampling:")
-print(pd.Series(y_train_res).value_counts())
 
 # ========================
 # STEP 5: Feature Selection
 # ========================
-print("\n🔄 STEP 5: Feature Selection")
-print("=" * 30)
-
-# Remove constant features
-var_thresh = VarianceThreshold(threshold=0)
-X_train_var = var_thresh.fit_transform(X_train_res)
-features_after_var = X_train.columns[var_thresh.get_support()]
-print(f"Features after VarianceThreshold: {len(features_after_var)}")
-
-# Select top 10 features
-selector = SelectKBest(score_func=f_classif, k=min(10, len(features_after_var)))
-X_train_selected = selector.fit_transform(X_train_var, y_train_res)
-selected_features = features_after_var[selector.get_support()]
-print(f"\nSelected top {len(selected_features)} features:")
-print(selected_features.tolist())
+def select_features(X_train, X_train_res, y_train_res, hyperparams=None):
+    print("\n🔄 STEP 5: Feature Selection")
+    print("=" * 30)
+
+    # Remove constant features
+    var_thresh = VarianceThreshold(threshold=0)
+    X_train_var = var_thresh.fit_transform(X_train_res)
+    features_after_var = X_train.columns[var_thresh.get_support()]
+    print(f"Features after VarianceThreshold: {len(features_after_var)}")
+
+    # Select the top k (default 10) features
+    k = resolve_hyperparams(hyperparams)['k']
+    selector = SelectKBest(score_func=f_classif, k=min(k, len(features_after_var)))
+    X_train_selected = selector.fit_transform(X_train_var, y_train_res)
+    selected_features = features_after_var[selector.get_support()]
+    print(f"\nSelected top {len(selected_features)} features:")
+    print(selected_features.tolist())
+    return {'var_thresh': var_thresh, 'selector': selector, 'X_train_selected': X_train_selected,
+            'selected_features': selected_features}
+
 
 # ========================
 # STEP 6: Feature Scaling
 # ========================
-print("\n🔄 STEP 6: Feature Scaling")
-print("=" * 25)
+def scale_features(X_train_selected, X_test, var_thresh, selector):
+    print("\n🔄 STEP 6: Feature Scaling")
+    print("=" * 25)
+
+    scaler = MinMaxScaler()
+    X_train_scaled = scaler.fit_transform(X_train_selected)
 
-scaler = MinMaxScaler()
-X_train_scaled = scaler.fit_transform(X_train_selected)
+    # Apply same transformations to test data
+    X_test_var = var_thresh.transform(X_test.to_numpy())
+    X_test_selected = selector.transform(X_test_var)
+    X_test_scaled = scaler.transform(X_test_selected)
 
-# Apply same transformations to test data
-X_test_var = var_thresh.transform(X_test)
-X_test_selected = selector.transform(X_test_var)
-X_test_scaled = scaler.transform(X_test_selected)
+    print(f"Final training shape: {X_train_scaled.shape}")
+    print(f"Final testing shape: {X_test_scaled.shape}")
+    return {'scaler': scaler, 'X_train_scaled': X_train_scaled, 'X_test_scaled': X_test_scaled}
 
-print(f"Final training shape: {X_train_scaled.shape}")
-print(f"Final testing shape: {X_test_scaled.shape}")
 
 # ========================
 # STEP 7: Build Models
 # ========================
-print("\n🔄 STEP 7: Building Models")
-print("=" * 30)
-
-# ------------------------
-# 7.1 Random Forest (RF)
-# ------------------------
-print("\n🌲 Training Random Forest...")
-rf = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-rf.fit(X_train_scaled, y_train_res)
-
-# Predictions
-rf_preds = rf.predict(X_test_scaled)
-rf_probs = rf.predict_proba(X_test_scaled)[:, 1]
+def fit_models(X_train_scaled, y_train_res, X_test_scaled, sample_weight, hyperparams=None):
+    print("\n🔄 STEP 7: Building Models")
+    print("=" * 30)
+
+    # Independent models are fitted concurrently; the baselines of STEP 8 share the pool
+    print("\n🌲🧠 Training Random Forest, DNN and baselines in parallel...")
+    models = build_default_models(len(X_train_scaled), hyperparams)
+    training_results = train_models(models, X_train_scaled, y_train_res, X_test_scaled,
+                                    sample_weight=sample_weight)
+    return {
+        'training_results': training_results,
+        'rf': training_results["Random Forest"]['model'],
+        'dnn': training_results["DNN"]['model'],
+        'history': training_results["DNN"]['history'],
+        'rf_probs': training_results["Random Forest"]['probabilities'],
+        'dnn_probs': training_results["DNN"]['probabilities'],
+    }
 
-print("🔴 Random Forest Results:")
-print(confusion_matrix(y_test, rf_preds))
-print(classification_report(y_test, rf_preds))
-print(f"ROC-AUC: {roc_auc_score(y_test, rf_probs):.4f}")
 
-# ------------------------
-# 7.2 Deep Neural Network (DNN)
-# ------------------------
-print("\n🧠 Training Deep Neural Network...")
-dnn = Sequential([
-    Dense(64, input_shape=(X_train_scaled.shape[1],), activation='relu'),
-    BatchNormalization(),
-    Dropout(0.3),
-    Dense(32, activation='relu'),
-    BatchNormalization(),
-    Dropout(0.2),
-    Dense(16, activation='relu'),
-    Dropout(0.1),
-    Dense(1, activation='sigmoid')
-])
-
-dnn.compile(optimizer='adam',
-            loss='binary_crossentropy',
-            metrics=['accuracy'])
-
-early_stop = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
-
-history = dnn.fit(
-    X_train_scaled, y_train_res,
-    validation_split=0.2,
-    epochs=50,
-    batch_size=32,
-    callbacks=[early_stop],
-    verbose=1
-)
-
-# Predictions
-dnn_probs = dnn.predict(X_test_scaled).flatten()
-dnn_preds = (dnn_probs > 0.5).astype(int)
-
-print("\n🔵 DNN Results:")
-print(confusion_matrix(y_test, dnn_preds))
-print(classification_report(y_test, dnn_preds))
-print(f"ROC-AUC: {roc_auc_score(y_test, dnn_probs):.4f}")
+def evaluate_hybrid(y_test, training_results, rf_probs, dnn_probs):
+    # Every model is scored from one sorted pass over its probabilities;
+    # predictions everywhere below are probability > 0.5
+    hybrid_probs = (rf_probs + dnn_probs) / 2
 
-# ------------------------
-# 7.3 Hybrid (RF + DNN)
-# ------------------------
-print("\n🔥 Creating Hybrid Model...")
-hybrid_probs = (rf_probs + dnn_probs) / 2
-hybrid_preds = (hybrid_probs > 0.5).astype(int)
+    model_probs = {
+        'Random Forest': rf_probs,
+        'DNN': dnn_probs,
+        'Hybrid (RF+DNN)': hybrid_probs,
+        'Decision Tree': training_results['Decision Tree']['probabilities'],
+        'KNN': training_results['KNN']['probabilities'],
+        'SVM': training_results['SVM']['probabilities'],
+    }
+    performance_df, evaluation = evaluate_models(y_test, model_probs)
+    model_names = list(model_probs)
+    model_aucs = dict(zip(model_names, performance_df['ROC-AUC']))
+
+    # ------------------------
+    # 7.1 Random Forest (RF)
+    # ------------------------
+    rf_preds = (rf_probs > 0.5).astype(int)
+
+    print("🔴 Random Forest Results:")
+    print(evaluation.confusion_matrix(model_names.index('Random Forest')))
+    print(classification_report(y_test, rf_preds))
+    print(f"ROC-AUC: {model_aucs['Random Forest']:.4f}")
+
+    # ------------------------
+    # 7.2 Deep Neural Network (DNN)
+    # ------------------------
+    dnn_preds = (dnn_probs > 0.5).astype(int)
+
+    print("\n🔵 DNN Results:")
+    print(evaluation.confusion_matrix(model_names.index('DNN')))
+    print(classification_report(y_test, dnn_preds))
+    print(f"ROC-AUC: {model_aucs['DNN']:.4f}")
+
+    # ------------------------
+    # 7.3 Hybrid (RF + DNN)
+    # ------------------------
+    print("\n🔥 Creating Hybrid Model...")
+    hybrid_preds = (hybrid_probs > 0.5).astype(int)
+
+    print("🔥 Hybrid (RF + DNN) Results:")
+    print(evaluation.confusion_matrix(model_names.index('Hybrid (RF+DNN)')))
+    print(classification_report(y_test, hybrid_preds))
+    print(f"ROC-AUC: {model_aucs['Hybrid (RF+DNN)']:.4f}")
+    return {'model_probs': model_probs, 'performance_df': performance_df, 'evaluation': evaluation,
+            'model_names': model_names, 'model_aucs': model_aucs}
 
-print("🔥 Hybrid (RF + DNN) Results:")
-print(confusion_matrix(y_test, hybrid_preds))
-print(classification_report(y_test, hybrid_preds))
-print(f"ROC-AUC: {roc_auc_score(y_test, hybrid_probs):.4f}")
 
 # ========================
 # STEP 8: Baseline Model Comparison
 # ========================
-print("\n🔄 STEP 8: Baseline Model Comparison")
-print("=" * 40)
-
-baseline_models = {
-    "Decision Tree": DecisionTreeClassifier(random_state=42),
-    "KNN": KNeighborsClassifier(n_neighbors=5),
-    "SVM": SVC(probability=True, random_state=42)
-}
-
-baseline_results = {}
-for name, model in baseline_models.items():
-    print(f"\n🔍 Training {name}...")
-    model.fit(X_train_scaled, y_train_res)
-    y_pred = model.predict(X_test_scaled)
-    y_proba = model.predict_proba(X_test_scaled)[:, 1]
-
-    baseline_results[name] = {
-        'predictions': y_pred,
-        'probabilities': y_proba,
-        'auc': roc_auc_score(y_test, y_proba)
-    }
+def compare_baselines(y_test, model_probs, evaluation, model_names, model_aucs):
+    print("\n🔄 STEP 8: Baseline Model Comparison")
+    print("=" * 40)
+
+    baseline_results = {}
+    for name in ["Decision Tree", "KNN", "SVM"]:
+        y_proba = model_probs[name]
+        y_pred = (y_proba > 0.5).astype(int)
+
+        baseline_results[name] = {
+            'predictions': y_pred,
+            'probabilities': y_proba,
+            'auc': model_aucs[name]
+        }
+
+        print(f"🔍 {name} Results:")
+        print(evaluation.confusion_matrix(model_names.index(name)))
+        print(classification_report(y_test, y_pred))
+        print(f"ROC-AUC: {model_aucs[name]:.4f}")
+    return {'baseline_results': baseline_results}
 
-    print(f"🔍 {name} Results:")
-    print(confusion_matrix(y_test, y_pred))
-    print(classification_report(y_test, y_pred))
-    print(f"ROC-AUC: {roc_auc_score(y_test, y_proba):.4f}")
 
 # ========================
 # STEP 9: Performance Analysis
 # ========================
-print("\n🔄 STEP 9: Performance Analysis")
-print("=" * 35)
-
-# Compile all results
-all_results = {
-    'Random Forest': {'probs': rf_probs, 'preds': rf_preds},
-    'DNN': {'probs': dnn_probs, 'preds': dnn_preds},
-    'Hybrid (RF+DNN)': {'probs': hybrid_probs, 'preds': hybrid_preds},
-    'Decision Tree': {'probs': baseline_results['Decision Tree']['probabilities'],
-                     'preds': baseline_results['Decision Tree']['predictions']},
-    'KNN': {'probs': baseline_results['KNN']['probabilities'],
-            'preds': baseline_results['KNN']['predictions']},
-    'SVM': {'probs': baseline_results['SVM']['probabilities'],
-            'preds': baseline_results['SVM']['predictions']}
-}
-
-# Calculate comprehensive metrics
-performance_data = []
-for model_name, results in all_results.items():
-    performance_data.append({
-        'Model': model_name,
-        'Accuracy': accuracy_score(y_test, results['preds']),
-        'Precision': precision_score(y_test, results['preds']),
-        'Recall': recall_score(y_test, results['preds']),
-        'F1-Score': f1_score(y_test, results['preds']),
-        'ROC-AUC': roc_auc_score(y_test, results['probs'])
-    })
-
-performance_df = pd.DataFrame(performance_data)
-print("\nModel Performance Comparison:")
-print(performance_df.round(4))
-
-# Visualization: Performance Dashboard
-fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-fig.suptitle('ThyroNet-XAI: Performance Dashboard', fontsize=16, fontweight='bold')
-
-# 1. ROC-AUC Comparison
-ax1 = axes[0, 0]
-models = performance_df['Model']
-roc_aucs = performance_df['ROC-AUC']
-colors = ['#e74c3c', '#3498db', '#2ecc71', '#f39c12', '#9b59b6', '#e67e22']
-bars = ax1.bar(range(len(models)), roc_aucs, color=colors, alpha=0.8)
-ax1.set_title('ROC-AUC Score Comparison', fontsize=12, fontweight='bold')
-ax1.set_xlabel('Models')
-ax1.set_ylabel('ROC-AUC')
-ax1.set_xticks(range(len(models)))
-ax1.set_xticklabels(models, rotation=45, ha='right')
-ax1.set_ylim(0, 1)
-ax1.grid(True, alpha=0.3)
-
-for bar, value in zip(bars, roc_aucs):
-    ax1.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.01,
-             f'{value:.3f}', ha='center', va='bottom', fontweight='bold')
-
-# 2. Feature Importance
-ax2 = axes[0, 1]
-feature_importance = rf.feature_importances_
-sorted_idx = np.argsort(feature_importance)[::-1]
-top_features = [selected_features.tolist()[i] for i in sorted_idx]
-top_importance = [feature_importance[i] for i in sorted_idx]
-
-bars = ax2.barh(range(len(top_features)), top_importance, color='#3498db', alpha=0.8)
-ax2.set_title('Feature Importance (Random Forest)', fontsize=12, fontweight='bold')
-ax2.set_xlabel('Importance')
-ax2.set_yticks(range(len(top_features)))
-ax2.set_yticklabels(top_features)
-ax2.invert_yaxis()
-ax2.grid(True, alpha=0.3)
-
-# 3. Confusion Matrix - Hybrid Model
-ax3 = axes[1, 0]
-cm_hybrid = confusion_matrix(y_test, hybrid_preds)
-im = ax3.imshow(cm_hybrid, interpolation='nearest', cmap='Blues')
-ax3.set_title('Confusion Matrix - Hybrid Model', fontsize=12, fontweight='bold')
-ax3.set_xlabel('Predicted Label')
-ax3.set_ylabel('True Label')
-
-for i in range(cm_hybrid.shape[0]):
-    for j in range(cm_hybrid.shape[1]):
-        ax3.text(j, i, format(cm_hybrid[i, j], 'd'),
-                ha="center", va="center",
-                color="white" if cm_hybrid[i, j] > cm_hybrid.max() / 2 else "black",
-                fontweight='bold')
-
-# 4. ROC Curves
-ax4 = axes[1, 1]
-for model_name, results in all_results.items():
-    fpr, tpr, _ = roc_curve(y_test, results['probs'])
-    auc = roc_auc_score(y_test, results['probs'])
-    ax4.plot(fpr, tpr, label=f'{model_name} (AUC: {auc:.3f})', linewidth=2)
-
-ax4.plot([0, 1], [0, 1], 'k--', alpha=0.5)
-ax4.set_title('ROC Curves - All Models', fontsize=12, fontweight='bold')
-ax4.set_xlabel('False Positive Rate')
-ax4.set_ylabel('True Positive Rate')
-ax4.legend(fontsize=8)
-ax4.grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.show()
+def analyze_performance(performance_df, evaluation, model_names):
+    print("\n🔄 STEP 9: Performance Analysis")
+    print("=" * 35)
+
+    print("\nModel Performance Comparison:")
+    print(performance_df.round(4))
+
+    n_bootstrap = int(os.environ.get("THYRONET_BOOTSTRAP", 1000))
+    intervals = None
+    if n_bootstrap:
+        intervals = evaluation.bootstrap(n_boot=n_bootstrap)
+        print(f"\n95% Bootstrap Confidence Intervals ({n_bootstrap} resamples):")
+        print(confidence_interval_frame(model_names, intervals).to_string())
+    return {'intervals': intervals}
+
+
+# ------------------------
+# 9.1 Hybrid Decision Rule
+# ------------------------
+def tune_hybrid(X_train, y_train, y_test, selected_features, rf_probs, dnn_probs, hyperparams=None):
+    # Blend weights and threshold are tuned on out-of-fold training predictions
+    # (cached on disk), never on the test set; THYRONET_TUNING_FOLDS=0 keeps 0.5/0.5 and > 0.5
+    tuning_folds = int(os.environ.get("THYRONET_TUNING_FOLDS", 3))
+    hybrid_rule = None
+    hybrid_weights, hybrid_threshold = (0.5, 0.5), 0.5
+    if tuning_folds > 1:
+        print(f"\n🎯 Tuning hybrid weights and threshold ({DEFAULT_OBJECTIVE}, "
+              f"target recall {DEFAULT_TARGET_RECALL:.2f}) on {tuning_folds}-fold out-of-fold predictions...")
+        oof_rf, oof_dnn = out_of_fold_probabilities(X_train.to_numpy(), y_train.to_numpy(),
+                                                    n_splits=tuning_folds, k=len(selected_features),
+                                                    params=hyperparams)
+        hybrid_rule = optimize_hybrid(y_train.to_numpy(), oof_rf, oof_dnn, stacking=True)
+        hybrid_weights, hybrid_threshold = hybrid_rule['hybrid_weights'], hybrid_rule['threshold']
+
+    tuned_probs = hybrid_weights[0] * rf_probs + hybrid_weights[1] * dnn_probs
+    tuned_df, _ = evaluate_models(y_test, {'Hybrid (tuned)': tuned_probs}, threshold=hybrid_threshold)
+    tuned_metrics = {metric: float(value) for metric, value in tuned_df.set_index('Model').iloc[0].items()}
+    print(f"Hybrid rule: RF {hybrid_weights[0]:.3f} / DNN {hybrid_weights[1]:.3f}, "
+          f"threshold {hybrid_threshold:.4f}")
+    print(f"Test set: precision {tuned_metrics['Precision']:.4f}, recall {tuned_metrics['Recall']:.4f}, "
+          f"F1 {tuned_metrics['F1-Score']:.4f}")
+    return {'hybrid_rule': hybrid_rule, 'hybrid_weights': hybrid_weights,
+            'hybrid_threshold': hybrid_threshold, 'tuned_probs': tuned_probs, 'tuned_metrics': tuned_metrics}
+
+
+def plot_performance(reporter, performance_df, evaluation, model_names, model_aucs, selected_features, rf):
+    # Visualization: Performance Dashboard
+    roc_curves = {}
+    for i, model_name in enumerate(model_names):
+        fpr, tpr, _ = evaluation.roc_curve(i)
+        roc_curves[model_name] = (fpr, tpr, model_aucs[model_name])
+
+    reporter.submit('performance_dashboard', plot_performance_dashboard, performance_df,
+                    selected_features.tolist(), rf.feature_importances_,
+                    evaluation.confusion_matrix(model_names.index('Hybrid (RF+DNN)')), roc_curves)
+
 
 # ========================
 # STEP 10: Clinical Insights
 # ========================
-print("\n🔄 STEP 10: Clinical Insights & Recommendations")
-print("=" * 50)
-
-# Feature importance analysis
-feature_importance_df = pd.DataFrame({
-    'Feature': selected_features.tolist(),
-    'Importance': rf.feature_importances_
-}).sort_values('Importance', ascending=False)
-
-print("\n1. TOP CONTRIBUTING FEATURES FOR THYROID ANOMALY DETECTION:")
-print("-" * 60)
-for i, row in feature_importance_df.head(5).iterrows():
-    print(f"{i+1}. {row['Feature']}: {row['Importance']:.4f}")
-
-print("\n2. MODEL PERFORMANCE INSIGHTS:")
-print("-" * 35)
-best_model = performance_df.loc[performance_df['ROC-AUC'].idxmax()]
-print(f"✅ Best Overall Model: {best_model['Model']} (ROC-AUC: {best_model['ROC-AUC']:.4f})")
-print(f"✅ Best Sensitivity: {best_model['Recall']:.2f} ({best_model['Recall']*100:.0f}% of anomalies detected)")
-
-print("\n3. CLINICAL RECOMMENDATIONS:")
-print("-" * 30)
-print("🔬 KEY THYROID INDICATORS TO MONITOR:")
-for i, row in feature_importance_df.head(3).iterrows():
-    print(f"   • {row['Feature']}")
-
-print("\n🎯 DEPLOYMENT RECOMMENDATIONS:")
-print("   • Use Random Forest for primary screening")
-print("   • Implement Hybrid model for critical cases")
-print("   • High sensitivity ensures minimal false negatives")
-print("   • Manual review recommended for borderline cases")
-
-print("\n🎉 ThyroNet-XAI Analysis Complete!")
-print("=" * 60)
+def clinical_insights(X_train, X_test_scaled, var_thresh, selector, scaler, selected_features, rf, dnn,
+                      hybrid_weights, tuned_probs, performance_df):
+    print("\n🔄 STEP 10: Clinical Insights & Recommendations")
+    print("=" * 50)
+
+    # Feature importance analysis
+    feature_importance_df = pd.DataFrame({
+        'Feature': selected_features.tolist(),
+        'Importance': rf.feature_importances_
+    }).sort_values('Importance', ascending=False)
+
+    print("\n1. TOP CONTRIBUTING FEATURES FOR THYROID ANOMALY DETECTION:")
+    print("-" * 60)
+    for i, row in feature_importance_df.head(5).iterrows():
+        print(f"{i+1}. {row['Feature']}: {row['Importance']:.4f}")
+
+    # Per-patient SHAP explanations of the hybrid model on the test set
+    X_train_registry = scaler.transform(selector.transform(var_thresh.transform(X_train.to_numpy())))
+    n_background = min(100, len(X_train_registry))
+    background = X_train_registry[np.random.RandomState(42).choice(len(X_train_registry), n_background,
+                                                                    replace=False)]
+    explainer = HybridExplainer(rf, dnn, selected_features.tolist(), background,
+                                model_version='training-run', hybrid_weights=hybrid_weights, cache_dir=None)
+    test_explanations = explainer.explain(X_test_scaled)
+
+    shap_importance_df = pd.DataFrame({
+        'Feature': selected_features.tolist(),
+        'Mean |SHAP|': np.abs(test_explanations['hybrid']).mean(axis=0)
+    }).sort_values('Mean |SHAP|', ascending=False)
+
+    print("\n   Hybrid model, mean |SHAP| over the test set:")
+    for _, row in shap_importance_df.head(5).iterrows():
+        print(f"   • {row['Feature']}: {row['Mean |SHAP|']:.4f}")
+
+    highest_risk = int(np.argmax(tuned_probs))
+    print(f"\n   Example patient explanation (test row {highest_risk}, risk {tuned_probs[highest_risk]:.2f}):")
+    for feature, value in top_contributions(test_explanations, highest_risk, n=5):
+        print(f"   {'↑' if value > 0 else '↓'} {feature}: {value:+.4f}")
+
+    print("\n2. MODEL PERFORMANCE INSIGHTS:")
+    print("-" * 35)
+    best_model = performance_df.loc[performance_df['ROC-AUC'].idxmax()]
+    print(f"✅ Best Overall Model: {best_model['Model']} (ROC-AUC: {best_model['ROC-AUC']:.4f})")
+    print(f"✅ Best Sensitivity: {best_model['Recall']:.2f} ({best_model['Recall']*100:.0f}% of anomalies detected)")
+
+    print("\n3. CLINICAL RECOMMENDATIONS:")
+    print("-" * 30)
+    print("🔬 KEY THYROID INDICATORS TO MONITOR:")
+    for i, row in feature_importance_df.head(3).iterrows():
+        print(f"   • {row['Feature']}")
+
+    print("\n🎯 DEPLOYMENT RECOMMENDATIONS:")
+    print("   • Use Random Forest for primary screening")
+    print("   • Implement Hybrid model for critical cases")
+    print("   • High sensitivity ensures minimal false negatives")
+    print("   • Manual review recommended for borderline cases")
+    return {'X_train_registry': X_train_registry, 'background': background,
+            'test_explanations': test_explanations}
+
+
+# ========================
+# STEP 11: Persist Model Artifacts
+# ========================
+def persist_bundle(X, X_train, y_train, X_train_registry, var_thresh, selector, scaler, rf, dnn,
+                   selected_features, hybrid_threshold, hybrid_weights, tuned_metrics, hybrid_rule, background):
+    print("\n🔄 STEP 11: Saving Model Bundle")
+    print("=" * 35)
+
+    # Neighbour index over the original (not oversampled) training rows for similar-patient lookup
+    registry_index = NeighborIndex(method='kd_tree').fit(X_train_registry, y_train)
+
+    # Running feature moments and a replay sample let incremental_training.py update this bundle later
+    running_stats = RunningStats.from_data(X_train.to_numpy(), y_train.to_numpy())
+    replay = replay_sample(X_train.to_numpy(), y_train.to_numpy())
+    # Reference histograms of the raw selected features for drift monitoring at scoring time
+    drift_reference = build_reference(X_train[selected_features].to_numpy(), selected_features.tolist())
+
+    bundle_path = save_bundle(
+        var_thresh, selector, scaler, rf, dnn,
+        feature_names=X.columns.tolist(),
+        selected_features=selected_features.tolist(),
+        threshold=hybrid_threshold,
+        hybrid_weights=hybrid_weights,
+        metrics=tuned_metrics,
+        tuning=hybrid_rule,
+        neighbor_index=registry_index,
+        background=background,
+        running_stats=running_stats.to_dict(),
+        replay=replay,
+        drift_reference=drift_reference
+    )
+    print(f"✅ Model bundle saved to {bundle_path}")
+    return {'bundle_path': bundle_path}
+
+
+def collect_figures(reporter):
+    # Waits for the background figure workers
+    figure_paths = reporter.close()
+    for name, paths in figure_paths.items():
+        print(f"🖼️  {name}: {', '.join(paths)}")
+    return {'figure_paths': figure_paths}
+
+
+STAGES = [
+    load_data, split_data, balance_classes, select_features, scale_features, fit_models,
+    evaluate_hybrid, compare_baselines, analyze_performance, tune_hybrid, plot_performance,
+    clinical_insights, persist_bundle, collect_figures,
+]
+
+
+def run_stages(run, stages):
+    """Run `stages` in order on a PipelineRun, also recording per-model fit/predict times"""
+    for stage in stages:
+        run.stage(stage)
+        if stage.__name__ == 'fit_models':
+            # Models are fitted inside pool workers; record each one's own fit and predict time
+            for name, result in run.state['training_results'].items():
+                run.record(f"fit_models/{name}/fit", result['fit_time'], n_threads=result['n_threads'])
+                run.record(f"fit_models/{name}/predict", result['predict_time'], n_threads=result['n_threads'])
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ThyroNet-XAI training and analysis pipeline")
+    parser.add_argument('--no-plots', action='store_true', help="skip figure rendering (also THYRONET_NO_PLOTS=1)")
+    parser.add_argument('--report-dir', default=DEFAULT_REPORT_DIR, help="directory for PNG/SVG figures")
+    parser.add_argument('--run-report-dir', help="directory for the JSON/CSV stage report "
+                                                 "(default: <report-dir>/runs)")
+    parser.add_argument('--profile', action='append', default=[], metavar='STAGE',
+                        choices=[stage.__name__ for stage in STAGES] + ['all'],
+                        help="profile a stage (repeatable, or 'all')")
+    parser.add_argument('--profiler', choices=PROFILERS, default='cprofile')
+    parser.add_argument('--hyperparams', default=os.environ.get("THYRONET_HYPERPARAMS"),
+                        help="JSON of tuned hyperparameters from hyperparameter_search.py (also THYRONET_HYPERPARAMS)")
+    args, _ = parser.parse_known_args()
+    run_report_dir = args.run_report_dir or os.path.join(args.report_dir, 'runs')
+
+    # Figures are rendered headless to files by background workers, off the training path
+    reporter = FigureReporter(args.report_dir, enabled=PLOTS_ENABLED and not args.no_plots)
+
+    print("🚀 ThyroNet-XAI: Thyroid Cancer Prediction System")
+    print("=" * 60)
+
+    run = PipelineRun('thyronet', profile=args.profile, profiler=args.profiler,
+                      profile_dir=run_report_dir,
+                      state={'reporter': reporter, 'hyperparams': load_hyperparams(args.hyperparams)})
+    run_stages(run, STAGES)
+
+    print("\n⏱️  Stage timings:")
+    print(run.summary().round(2).to_string())
+    json_path, csv_path = run.write_report(run_report_dir)
+    print(f"📈 Run report written to {json_path} and {csv_path}")
+
+    print("\n🎉 ThyroNet-XAI Analysis Complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Parallel Model Training for ThyroNet-XAI
+Fits independent models (RF, DNN and the baselines) concurrently in a process
+pool, giving each model a CPU-thread budget so RF n_jobs, BLAS/OpenMP and
+TensorFlow intra-op threads do not oversubscribe the machine.
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sklearn.utils.validation import has_fit_parameter
+from threadpoolctl import threadpool_limits
+
+DEFAULT_WORKERS = int(os.environ.get("THYRONET_TRAIN_WORKERS", 0)) or None
+
+# Hyperparameters of the feature selection and model line-up (see hyperparameter_search.py)
+DEFAULT_HYPERPARAMS = {
+    'k': 10,
+    'rf_n_estimators': 100,
+    'knn_n_neighbors': 5,
+    'dnn_hidden_units': (64, 32, 16),
+    'dnn_dropout': 0.3,
+}
+
+
+def configure_tensorflow_threads(n_threads):
+    """Limit TensorFlow to n_threads intra-op threads; returns False if TF was already initialized
+
+    Thread pools are fixed once the TensorFlow runtime starts (e.g. after the
+    parent restored a DNN fitted in a pool worker); later fits then keep the
+    existing setting instead of failing.
+    """
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(min(2, n_threads))
+    except RuntimeError:
+        return False
+    return True
+
+
+def build_dnn(input_dim, learning_rate=1e-3, jit_compile=False, dtype=None, hidden_units=(64, 32, 16),
+              dropout=0.3):
+    """The ThyroNet DNN: ReLU Dense layers with batch normalization and dropout, sigmoid output
+
+    Every hidden layer but the last is followed by batch normalization.
+    Dropout tapers linearly from `dropout` after the first hidden layer, so
+    the defaults give the 64-32-16 network with 0.3/0.2/0.1 dropout.
+    `dtype` may be a mixed-precision policy such as 'mixed_bfloat16'; the
+    sigmoid output always stays float32.
+    """
+    from tensorflow.keras.layers import BatchNormalization, Dense, Dropout, Input
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.optimizers import Adam
+
+    layers = [Input(shape=(input_dim,))]
+    n_hidden = len(hidden_units)
+    for i, units in enumerate(hidden_units):
+        layers.append(Dense(units, activation='relu', dtype=dtype))
+        if i < n_hidden - 1:
+            layers.append(BatchNormalization(dtype=dtype))
+        layers.append(Dropout(round(dropout * (n_hidden - i) / n_hidden, 4), dtype=dtype))
+    layers.append(Dense(1, activation='sigmoid', dtype='float32'))
+
+    dnn = Sequential(layers)
+    dnn.compile(optimizer=Adam(learning_rate=learning_rate),
+                loss='binary_crossentropy',
+                metrics=['accuracy'],
+                jit_compile=jit_compile)
+    return dnn
+
+
+class DNNSpec:
+    """Picklable description of the DNN training run
+
+    Keras models cannot be shipped to worker processes, so workers build the
+    network from this spec and send back its weights.
+    """
+
+    def __init__(self, epochs=50, batch_size='auto', validation_split=0.2, patience=10, verbose=2,
+                 xla=None, precision=None, hidden_units=(64, 32, 16), dropout=0.3):
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.validation_split = validation_split
+        self.patience = patience
+        self.verbose = verbose
+        self.xla = xla
+        self.precision = precision
+        self.hidden_units = tuple(hidden_units)
+        self.dropout = dropout
+
+    def fit(self, X_train, y_train, sample_weight=None):
+        from dnn_training import DEFAULT_PRECISION, DEFAULT_XLA, train_dnn
+
+        return train_dnn(
+            X_train, y_train,
+            sample_weight=sample_weight,
+            epochs=self.epochs,
+            batch_size=self.batch_size,
+            validation_split=self.validation_split,
+            patience=self.patience,
+            xla=DEFAULT_XLA if self.xla is None else self.xla,
+            precision=self.precision or DEFAULT_PRECISION,
+            verbose=self.verbose,
+            hidden_units=self.hidden_units,
+            dropout=self.dropout
+        )
+
+    @staticmethod
+    def restore(input_dim, weights):
+        # Dense kernels are the only 2-D weights; the last one is the output layer
+        hidden_units = tuple(w.shape[1] for w in weights if w.ndim == 2)[:-1]
+        dnn = build_dnn(input_dim, hidden_units=hidden_units)
+        dnn.set_weights(weights)
+        return dnn
+
+
+def fit_and_predict(name, model, X_train, y_train, X_test, n_threads, sample_weight=None):
+    """Fit one model under a thread budget and score the test set"""
+    start = time.perf_counter()
+    with threadpool_limits(limits=n_threads):
+        if isinstance(model, DNNSpec):
+            configure_tensorflow_threads(n_threads)
+            dnn, history = model.fit(X_train, y_train, sample_weight=sample_weight)
+            fitted = time.perf_counter()
+            probabilities = dnn.predict(X_test, verbose=0).flatten()
+            result = {'weights': dnn.get_weights(), 'history': history}
+        else:
+            if hasattr(model, 'n_jobs'):
+                model.n_jobs = n_threads
+            fit_params = {}
+            if sample_weight is not None:
+                if has_fit_parameter(model, 'sample_weight'):
+                    fit_params['sample_weight'] = sample_weight
+                else:
+                    print(f"⚠️  {name} does not support sample weights; fitting unweighted")
+            model.fit(X_train, y_train, **fit_params)
+            fitted = time.perf_counter()
+            probabilities = model.predict_proba(X_test)[:, 1]
+            result = {'model': model, 'predictions': model.predict(X_test)}
+
+    result['probabilities'] = probabilities
+    result.setdefault('predictions', (probabilities > 0.5).astype(int))
+    result['fit_time'] = fitted - start
+    result['predict_time'] = time.perf_counter() - fitted
+    result['n_threads'] = n_threads
+    return name, result
+
+
+def resolve_hyperparams(params=None):
+    """DEFAULT_HYPERPARAMS updated with `params`, rejecting unknown names"""
+    params = dict(params or {})
+    unknown = sorted(set(params) - set(DEFAULT_HYPERPARAMS))
+    if unknown:
+        raise ValueError(f"Unknown hyperparameters {unknown}; expected {sorted(DEFAULT_HYPERPARAMS)}")
+    resolved = {**DEFAULT_HYPERPARAMS, **params}
+    resolved['dnn_hidden_units'] = tuple(resolved['dnn_hidden_units'])
+    return resolved
+
+
+def build_default_models(n_train_rows, params=None):
+    """The ThyroNet model line-up: RF and DNN for the hybrid, plus the three baselines
+
+    `params` overrides entries of DEFAULT_HYPERPARAMS.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    from dnn_training import DEFAULT_BATCH_SIZE as DEFAULT_DNN_BATCH_SIZE
+    from dnn_training import DEFAULT_EPOCHS as DEFAULT_DNN_EPOCHS
+    from neighbor_index import NeighborIndex
+    from svm_models import build_svm
+
+    params = resolve_hyperparams(params)
+    return {
+        "Random Forest": RandomForestClassifier(n_estimators=params['rf_n_estimators'], random_state=42,
+                                                n_jobs=-1),
+        "DNN": DNNSpec(epochs=DEFAULT_DNN_EPOCHS, batch_size=DEFAULT_DNN_BATCH_SIZE, validation_split=0.2,
+                       patience=10, hidden_units=params['dnn_hidden_units'], dropout=params['dnn_dropout']),
+        "Decision Tree": DecisionTreeClassifier(random_state=42),
+        "KNN": NeighborIndex(n_neighbors=params['knn_n_neighbors'], method='kd_tree'),
+        "SVM": build_svm(n_train_rows)
+    }
+
+
+def effective_workers(max_workers, n_tasks):
+    """Number of pool workers to use, or 1 when a forked pool is not safe here"""
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, n_tasks))
+
+    # Workers are forked so they need neither a re-importable __main__ nor a
+    # TensorFlow runtime inherited from the parent (which is not fork-safe).
+    if max_workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        print("⚠️  Process pool needs the 'fork' start method; running serially")
+        return 1
+    if max_workers > 1 and 'tensorflow' in sys.modules:
+        print("⚠️  TensorFlow already imported in the parent; running serially")
+        return 1
+    return max_workers
+
+
+def _restore_dnn(result, input_dim):
+    if 'weights' in result:
+        result['model'] = DNNSpec.restore(input_dim, result.pop('weights'))
+    return result
+
+
+def train_models(models, X_train, y_train, X_test, max_workers=DEFAULT_WORKERS, threads_per_model=None,
+                 sample_weight=None):
+    """Fit every model in `models` concurrently and return {name: result}
+
+    Each result holds the fitted 'model', 'probabilities' and 'predictions' on
+    X_test, plus 'fit_time' and 'predict_time'. `threads_per_model` overrides the default budget
+    of cpu_count // max_workers threads for individual models, e.g. to give
+    the Random Forest more cores than the Decision Tree. `sample_weight` is
+    passed to every model whose fit accepts it (see balancing.balance).
+    """
+    max_workers = effective_workers(max_workers, len(models))
+    default_threads = max(1, (os.cpu_count() or 1) // max_workers)
+    budgets = {name: (threads_per_model or {}).get(name, default_threads) for name in models}
+
+    results = {}
+    if max_workers == 1:
+        for name, model in models.items():
+            _, results[name] = fit_and_predict(name, model, X_train, y_train, X_test, budgets[name],
+                                               sample_weight)
+    else:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = [
+                executor.submit(fit_and_predict, name, model, X_train, y_train, X_test, budgets[name],
+                                sample_weight)
+                for name, model in models.items()
+            ]
+            for future in futures:
+                name, result = future.result()
+                results[name] = result
+
+    for name, result in results.items():
+        _restore_dnn(result, X_train.shape[1])
+        print(f"⏱️  {name}: fitted in {result['fit_time']:.2f}s, scored in {result['predict_time']:.2f}s "
+              f"with {result['n_threads']} thread(s)")
+
+    # Keep the caller's model order regardless of completion order
+    return {name: results[name] for name in models}
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from balancing import balance
+
+
+def _data(n_minority, n_majority=19):
+    rng = np.random.RandomState(0)
+    X = rng.rand(n_majority + n_minority, 3).astype(np.float32)
+    y = np.array([0] * n_majority + [1] * n_minority)
+    return X, y
+
+
+def test_smote_with_one_minority_row_oversamples():
+    X, y = _data(1)
+    X_res, y_res, _ = balance(X, y, strategy='smote')
+    assert (y_res == 0).sum() == (y_res == 1).sum() == 19
+    assert np.all(X_res[y_res == 1] == X[-1])
+
+
+def test_smote_without_minority_rows_raises():
+    X, y = _data(0)
+    with pytest.raises(ValueError, match="no minority"):
+        balance(X, y, strategy='smote')
+
+
+def test_smote_on_balanced_classes_adds_no_rows():
+    X, y = _data(10, 10)
+    X_res, y_res, _ = balance(X, y, strategy='smote')
+    assert np.array_equal(X_res, X) and np.array_equal(y_res, y)
+
+
+def test_smote_interpolates_between_minority_rows():
+    X, y = _data(3)
+    X_res, y_res, _ = balance(X, y, strategy='smote')
+    assert (y_res == 1).sum() == 19
+    minority = X[y == 1]
+    synthetic = X_res[len(y):]
+    assert np.all(synthetic >= minority.min(axis=0) - 1e-6)
+    assert np.all(synthetic <= minority.max(axis=0) + 1e-6)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from data_profiler import profile_csv
+from schema import FEATURE_COLUMNS, FLAG_COLUMNS, TARGET_COLUMN, SchemaError
+
+
+def _write_csv(path, rows):
+    with open(path, 'w') as f:
+        f.write(';'.join(FEATURE_COLUMNS + [TARGET_COLUMN]) + '\n')
+        for row in rows:
+            f.write(';'.join(str(value) for value in row) + '\n')
+    return str(path)
+
+
+def _row(label='n', flag=0, lab=0.1):
+    return [0.5] + [flag] * len(FLAG_COLUMNS) + [lab] * 5 + [label]
+
+
+def test_profile_matches_statistics_across_chunks(tmp_path):
+    rows = [_row('o' if i % 4 == 0 else 'n', i % 2, i / 100) for i in range(25)]
+    profile = profile_csv(_write_csv(tmp_path / "data.csv", rows), chunk_size=7)
+    assert profile.n_rows == 25
+    assert profile.target_counts == {0: 18, 1: 7}
+    labs = np.array([i / 100 for i in range(25)])
+    summary = profile.summary()
+    assert summary.loc['mean', 'TSH'] == pytest.approx(labs.mean())
+    assert summary.loc['std', 'TSH'] == pytest.approx(labs.std(ddof=1))
+
+
+def test_profile_rejects_rows_outside_the_schema(tmp_path):
+    with pytest.raises(SchemaError):
+        profile_csv(_write_csv(tmp_path / "flags.csv", [_row(), _row(flag=2)]))
+    with pytest.raises(SchemaError):
+        profile_csv(_write_csv(tmp_path / "text.csv", [_row(), _row(flag='x')]))
+    with pytest.raises(SchemaError):
+        profile_csv(_write_csv(tmp_path / "labs.csv", [_row(), _row(lab=-1)]))
+
+
+def test_profile_covers_schema_features_but_not_the_label(tmp_path):
+    # Integer-looking labs in the first chunk would be inferred as int; the schema fixes the columns
+    rows = [_row(lab=0) for _ in range(3)] + [_row(label='o', lab=0.25) for _ in range(3)]
+    profile = profile_csv(_write_csv(tmp_path / "data.csv", rows), chunk_size=3)
+    assert profile.columns == FEATURE_COLUMNS
+    assert TARGET_COLUMN not in profile.correlation().columns
+    assert profile.summary().loc['mean', 'TSH'] == pytest.approx(0.125)
+
+
+def test_profile_rejects_empty_input(tmp_path):
+    empty = tmp_path / "empty.csv"
+    empty.write_text('')
+    with pytest.raises(ValueError, match="empty"):
+        profile_csv(str(empty))
+    with pytest.raises(ValueError, match="no data rows"):
+        profile_csv(_write_csv(tmp_path / "header.csv", []))
@@ -0,0 +1,33 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from explainability import HybridExplainer
+
+
+class LinearDNN:
+    """Stand-in DNN whose output is the first feature"""
+
+    def __call__(self, X, training=False):
+        return X[:, :1]
+
+    def gradient(self, points):
+        gradients = np.zeros_like(points)
+        gradients[:, 0] = 1
+        return gradients
+
+
+def test_tree_explainer_is_built_once_and_matches_shap():
+    import shap
+
+    rng = np.random.RandomState(0)
+    X = rng.rand(300, 4)
+    rf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, (X[:, 0] > 0.5).astype(int))
+    explainer = HybridExplainer(rf, LinearDNN(), ['a', 'b', 'c', 'd'], X[:20], 'test', cache_dir=None)
+
+    first = explainer.explain(X[:5])
+    tree_explainer = explainer.tree_explainer
+    second = explainer.explain(X[5:10])
+
+    assert explainer.tree_explainer is tree_explainer
+    expected = shap.TreeExplainer(rf).shap_values(X[:10])[..., 1]
+    np.testing.assert_allclose(np.vstack([first['random_forest'], second['random_forest']]), expected)
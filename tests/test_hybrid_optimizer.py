@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from conftest import SCRIPTS_DIR
+
+# The pipeline's tune_hybrid stage: models fitted in a pool, then out-of-fold
+# folds fitted in the parent, whose TensorFlow runtime is already initialized.
+# Runs in a fresh interpreter claiming 4 CPUs so the fold thread budget differs.
+FIT_THEN_TUNE = textwrap.dedent("""
+    import os
+    os.cpu_count = lambda: 4
+
+    import numpy as np
+
+    from hybrid_optimizer import out_of_fold_probabilities
+    from training_orchestrator import build_default_models, train_models
+
+    rng = np.random.RandomState(0)
+    X = rng.rand(300, 12).astype(np.float32)
+    y = (X[:, 0] + 0.3 * rng.rand(300) > 0.8).astype(int)
+
+    results = train_models(build_default_models(len(y)), X, y, X, max_workers=2)
+    assert 'model' in results['DNN']
+
+    rf_probs, dnn_probs = out_of_fold_probabilities(X, y, n_splits=2, cache_dir='')
+    assert rf_probs.shape == dnn_probs.shape == (300,)
+""")
+
+
+def test_out_of_fold_tuning_after_pooled_fit():
+    env = {**os.environ, 'THYRONET_DNN_EPOCHS': '2'}
+    completed = subprocess.run([sys.executable, "-c", FIT_THEN_TUNE], cwd=SCRIPTS_DIR, env=env,
+                               capture_output=True, text=True, timeout=900)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+
+def test_stacking_rejects_negative_weights():
+    import numpy as np
+
+    from hybrid_optimizer import optimize_hybrid, optimize_stacking
+
+    # The DNN score carries a signal the labels punish, so the meta-learner weights it negatively
+    rng = np.random.RandomState(0)
+    u, v = rng.rand(500), rng.rand(500)
+    rf_probs, dnn_probs = u, 0.5 * u + 0.5 * v
+    y = (u - 0.3 * v + 0.1 * rng.randn(500) > 0.35).astype(int)
+
+    assert optimize_stacking(y, rf_probs, dnn_probs) is None
+    rf_weight, dnn_weight = optimize_hybrid(y, rf_probs, dnn_probs, stacking=True)['hybrid_weights']
+    assert 0 <= rf_weight <= 1 and 0 <= dnn_weight <= 1
@@ -0,0 +1,40 @@
+import tracemalloc
+
+import numpy as np
+
+from metrics_engine import SortedScores, bootstrap_chunk_size
+
+
+def _scores(n_samples, n_models=2, seed=0):
+    rng = np.random.RandomState(seed)
+    y = (rng.rand(n_samples) < 0.2).astype(int)
+    return y, np.vstack([np.round(0.3 * y + rng.rand(n_samples), 3) for _ in range(n_models)])
+
+
+def test_bootstrap_chunks_shrink_with_the_test_set():
+    assert bootstrap_chunk_size(6, 200_000) < 200
+    assert bootstrap_chunk_size(6, 200_000, budget_mb=1) == 1
+    assert bootstrap_chunk_size(1, 100) >= 200
+
+
+def test_bootstrap_stays_within_memory_budget():
+    y, scores = _scores(200_000)
+    evaluation = SortedScores(y, scores)
+    tracemalloc.start()
+    try:
+        evaluation.bootstrap(n_boot=60)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # The default 256 MB budget plus the per-replicate draws; 200-replicate chunks took ~1.6 GB here
+    assert peak < 400 * 2 ** 20
+
+
+def test_bootstrap_does_not_depend_on_chunking():
+    y, scores = _scores(2_000)
+    evaluation = SortedScores(y, scores)
+    whole = evaluation.bootstrap(n_boot=50, chunk_size=50)
+    chunked = evaluation.bootstrap(n_boot=50, chunk_size=7)
+    for metric, (low, high) in whole.items():
+        np.testing.assert_allclose(chunked[metric][0], low)
+        np.testing.assert_allclose(chunked[metric][1], high)
@@ -0,0 +1,43 @@
+import json
+import os
+import time
+
+from model_bundle import BUNDLE_FORMAT_VERSION, load_bundle, update_decision_rule
+
+
+def _parent_bundle(tmp_path):
+    parent_path = tmp_path / "thyronet-parent"
+    parent_path.mkdir()
+    manifest = {'format_version': BUNDLE_FORMAT_VERSION, 'version': 'parent', 'threshold': 0.5,
+                'hybrid_weights': [0.5, 0.5]}
+    (parent_path / "manifest.json").write_text(json.dumps(manifest))
+    (parent_path / "random_forest.joblib").write_bytes(b"model")
+    return parent_path, manifest
+
+
+def test_update_decision_rule_saves_a_new_version(tmp_path):
+    parent_path, manifest = _parent_bundle(tmp_path)
+
+    path = update_decision_rule(str(parent_path), 0.3, (0.8, 0.2), {'objective': 'f1'}, version='child')
+
+    assert json.loads((parent_path / "manifest.json").read_text()) == manifest
+    child = load_bundle(str(tmp_path))
+    assert child.path == path and child.version == 'child'
+    assert child.threshold == 0.3 and child.hybrid_weights == [0.8, 0.2]
+    assert child.manifest['lineage']['parent'] == 'parent'
+    assert child.manifest['tuning'] == {'objective': 'f1'}
+    assert os.path.exists(os.path.join(path, "random_forest.joblib"))
+
+
+def test_versions_saved_in_the_same_second_do_not_collide(tmp_path, monkeypatch):
+    parent_path, _ = _parent_bundle(tmp_path)
+    second = time.gmtime()
+    monkeypatch.setattr(time, 'gmtime', lambda *args: second)
+
+    paths = [update_decision_rule(str(parent_path), 0.3 + i / 10, (0.5, 0.5)) for i in range(3)]
+
+    versions = [load_bundle(path).version for path in paths]
+    stamp = time.strftime('%Y%m%d-%H%M%S', second)
+    assert versions == [stamp, f"{stamp}-1", f"{stamp}-2"]
+    assert [load_bundle(path).threshold for path in paths] == [0.3, 0.4, 0.5]
+    assert load_bundle(str(tmp_path)).path == paths[-1]
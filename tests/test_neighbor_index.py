@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from neighbor_index import NeighborIndex
+
+
+def _rows(n, seed):
+    rng = np.random.RandomState(seed)
+    return rng.rand(n, 4), (rng.rand(n) < 0.3).astype(int)
+
+
+@pytest.mark.parametrize('n_new', [50, 400])
+@pytest.mark.parametrize('method', ['kd_tree', 'ball_tree'])
+def test_added_rows_match_a_full_fit(method, n_new):
+    X, y = _rows(1000, 0)
+    X_new, y_new = _rows(n_new, 1)
+    Q, _ = _rows(30, 2)
+
+    index = NeighborIndex(n_neighbors=7, method=method).fit(X, y).add(X_new, y_new)
+    full = NeighborIndex(n_neighbors=7, method=method).fit(np.vstack([X, X_new]), np.concatenate([y, y_new]))
+
+    np.testing.assert_array_equal(index.query(Q)[1], full.query(Q)[1])
+    np.testing.assert_allclose(index.query(Q)[0], full.query(Q)[0])
+    np.testing.assert_array_equal(index.neighbor_labels(Q), full.neighbor_labels(Q))
+    np.testing.assert_array_equal(index.indexed_rows(), np.vstack([X, X_new]))
+
+
+def test_ivf_add_keeps_the_cells():
+    X, y = _rows(2000, 0)
+    X_new, y_new = _rows(100, 1)
+    index = NeighborIndex(method='ivf', n_probe=2).fit(X, y)
+    centroids = index.centroids_.copy()
+
+    index.add(X_new, y_new)
+
+    np.testing.assert_array_equal(index.centroids_, centroids)
+    assert index.n_samples_ == 2100 and len(index.labels_) == 2100
+    np.testing.assert_array_equal(index.indexed_rows(), np.vstack([X, X_new]))
+    # Every added row is found in its own cell
+    distances, indices = index.query(X_new, k=1)
+    np.testing.assert_array_equal(indices[:, 0], np.arange(2000, 2100))
+    np.testing.assert_allclose(distances[:, 0], 0, atol=1e-6)
+
+
+@pytest.mark.parametrize('method', ['kd_tree', 'ivf'])
+def test_rescale_moves_rows_into_the_new_space(method):
+    X, y = _rows(500, 0)
+    a, b = np.array([0.5, 1.0, 2.0, 0.8]), np.array([0.1, 0.0, -0.5, 0.2])
+    index = NeighborIndex(method=method).fit(X, y).rescale(a, b)
+
+    np.testing.assert_allclose(index.indexed_rows(), X * a + b)
+    _, indices = index.query(X[:20] * a + b, k=1)
+    np.testing.assert_array_equal(indices[:, 0], np.arange(20))
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_selection import SelectKBest, VarianceThreshold
+from sklearn.preprocessing import MinMaxScaler
+
+from dnn_training import train_dnn
+from model_bundle import load_bundle, save_bundle
+
+
+@pytest.mark.parametrize('precision', ['mixed_bfloat16', 'mixed_float16'])
+def test_mixed_precision_dnn_saves_and_scores(tmp_path, precision):
+    rng = np.random.RandomState(0)
+    X = rng.rand(600, 6).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] > 1).astype(int)
+    var_thresh = VarianceThreshold().fit(X)
+    selector = SelectKBest(k=4).fit(X, y)
+    scaler = MinMaxScaler().fit(X[:, selector.get_support()])
+    X_scaled = scaler.transform(X[:, selector.get_support()])
+    rf = RandomForestClassifier(n_estimators=5, random_state=0).fit(X_scaled, y)
+    dnn, _ = train_dnn(X_scaled, y, epochs=2, precision=precision, verbose=0)
+
+    names = [f"f{i}" for i in range(6)]
+    path = save_bundle(var_thresh, selector, scaler, rf, dnn, names,
+                       [name for name, kept in zip(names, selector.get_support()) if kept],
+                       background=X_scaled[:50], artifact_dir=str(tmp_path))
+
+    exported = load_bundle(path).numpy_dnn(X_scaled)
+    keras = np.asarray(dnn(X_scaled, training=False), dtype=np.float64)
+    # Against the mixed-precision forward pass itself only reduced-precision accuracy holds
+    np.testing.assert_allclose(exported, keras, atol=3e-2)
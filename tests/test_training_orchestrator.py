@@ -0,0 +1,34 @@
+import subprocess
+import sys
+import textwrap
+
+from conftest import SCRIPTS_DIR
+
+# Runs in a fresh interpreter: the pooled fit needs a parent without TensorFlow
+POOLED_THEN_SERIAL = textwrap.dedent("""
+    import numpy as np
+    from sklearn.tree import DecisionTreeClassifier
+
+    from training_orchestrator import DNNSpec, fit_and_predict, train_models
+
+    rng = np.random.RandomState(0)
+    X = rng.rand(200, 5).astype(np.float32)
+    y = (X[:, 0] > 0.5).astype(int)
+
+    pooled = train_models({'DNN': DNNSpec(epochs=2, verbose=0), 'Decision Tree': DecisionTreeClassifier()},
+                          X, y, X, max_workers=2)
+    assert 'model' in pooled['DNN']
+
+    # The parent's TensorFlow runtime is now initialized; serial fits with other budgets must still run
+    for n_threads in (4, 3):
+        _, result = fit_and_predict('DNN', DNNSpec(epochs=2, verbose=0), X, y, X, n_threads)
+        assert result['probabilities'].shape == (200,)
+    serial = train_models({'DNN': DNNSpec(epochs=2, verbose=0)}, X, y, X, threads_per_model={'DNN': 2})
+    assert serial['DNN']['probabilities'].shape == (200,)
+""")
+
+
+def test_serial_dnn_fit_after_pooled_fit():
+    completed = subprocess.run([sys.executable, "-c", POOLED_THEN_SERIAL], cwd=SCRIPTS_DIR,
+                               capture_output=True, text=True, timeout=600)
+    assert completed.returncode == 0, completed.stderr[-2000:]